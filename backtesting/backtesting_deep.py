@@ -1,7 +1,7 @@
 import time
+import numpy as np
 import pandas as pd
 from typing import List
-import os
 from datetime import datetime
 
 from model.model import (
@@ -10,27 +10,20 @@ from model.model import (
     Signal,
     Position,
     TradeLog,
+    TradeLedger,
+    EarlyStopRule,
     Side,
     Role,
-    TradingLogger,
 )
-
-# matplotlib import with fallback
-try:
-    import matplotlib
-
-    matplotlib.use("Agg")  # non-interactive backend 사용
-
-    import matplotlib.pyplot as plt
-    import matplotlib.dates as mdates
-    from matplotlib import rcParams
-
-    MATPLOTLIB_AVAILABLE = True
-    rcParams["font.family"] = "DejaVu Sans"
-    rcParams["axes.unicode_minus"] = False
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
-    print("Warning: matplotlib not available. Balance graphs will not be generated.")
+from backtesting.indicator_cache import IndicatorCache, can_evaluate_signals, get_strategy_columns
+from backtesting.intrabar import IntrabarResolver, to_ns
+from backtesting.profiling import NULL_PROFILER, BacktestProfiler
+from backtesting.trade_replay import replay_trades
+from backtesting.result_cache import (
+    ResultCache,
+    get_data_fingerprint,
+    get_strategy_key,
+)
 
 
 def open_position(data, state: FinancialState, strat: Strategy, side: Side, now):
@@ -107,6 +100,8 @@ def close_position(
 
 
 def get_win_rate(trades):
+    if isinstance(trades, TradeLedger):
+        return trades.win_rate()
     total_trades = len(trades)
     if total_trades == 0:
         return 0.0
@@ -127,146 +122,694 @@ def get_kelly_critation(win_rate, tp_ratio, sl_ratio):
     return kelly
 
 
-def backtest_fast(df, strat, state, side="long"):
-    """승률만 빠르게 계산하는 백테스트"""
-    position = None
-    trades = []
-    df_filtered = df.copy()
+def normalize_df(df):
+    """인덱스를 datetime으로 바꾸고 NaN/중복 제거 후 시간순 정렬 (데이터 로드 시 한 번)
+
+    정리된 DataFrame은 attrs["normalized"]로 표시해 filter_df_by_date가 다시 정리하지 않게 한다.
+    """
+    if df.attrs.get("normalized"):
+        return df
+    df = df.copy()
+    df.index = pd.to_datetime(df.index)
+    df = df[~df.index.isna()]  # NaN 인덱스 제거
+    df = df[~df.index.duplicated(keep="first")]  # 중복 인덱스 제거
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind="stable")
+    df.attrs["normalized"] = True
+    return df
+
+
+def load_dataset(ticker, timeframe, columns=None):
+    """지표 데이터를 읽고 정리까지 끝낸 DataFrame 반환
+
+    columns를 주면 지표 CSV 대신 지표 캐시에서 OHLCV와 그 지표 컬럼만 읽는다 (없는 지표는 계산 후 보관).
+    """
+    if columns is not None:
+        return IndicatorCache(ticker, timeframe).get_frame(columns)
+    df = pd.read_csv(f"backtesting/data/{ticker}_{timeframe}_with_indicators.csv")
+    df.set_index(df.columns[0], inplace=True)
+    return normalize_df(df)
 
+
+def load_strategy_dataset(ticker, timeframe, strategies, lazy_indicators: bool = True):
+    """전략들의 시그널에 필요한 데이터 (lazy_indicators면 참조 컬럼만 지표 캐시에서)
+
+    참조 컬럼 추정이 빠뜨린 컬럼이 있어 시그널 계산이 안 되면 전체 지표 데이터를 다시 읽는다.
+    """
+    columns = get_strategy_columns(strategies) if lazy_indicators else None
+    df = load_dataset(ticker, timeframe, columns=columns)
+    if columns is not None and not can_evaluate_signals(df, strategies):
+        print("  시그널이 지표 캐시에 없는 컬럼을 참조해 전체 지표 데이터를 읽습니다")
+        df = load_dataset(ticker, timeframe)
+    return df
+
+
+def get_date_bounds(df, start_date, end_date):
+    """정리된 DataFrame에서 [start_date, end_date] 기간의 행 위치 범위 (a, b)"""
+    a = df.index.searchsorted(pd.to_datetime(start_date), side="left")
+    b = df.index.searchsorted(pd.to_datetime(end_date), side="right")
+    return int(a), int(b)
+
+
+def filter_df_by_date(df, start_date, end_date):
+    """정리된 인덱스에서 searchsorted로 기간 범위를 찾아 복사 없이 잘라냄
+
+    정리되지 않은 DataFrame이면 먼저 normalize_df로 정리한다.
+    전략마다 부르므로 load_dataset으로 한 번 정리해 두고 넘기는 것이 빠르다.
+    """
     try:
-        start_date = pd.to_datetime(strat.start_date)
-        end_date = pd.to_datetime(strat.end_date)
-        # 인덱스를 datetime으로 변환하고 중복/NaN 제거
-        df_filtered.index = pd.to_datetime(df_filtered.index)
-        df_filtered = df_filtered[~df_filtered.index.isna()]  # NaN 인덱스 제거
-        df_filtered = df_filtered[
-            ~df_filtered.index.duplicated(keep="first")
-        ]  # 중복 인덱스 제거
-
-        df_filtered = df_filtered[df_filtered.index >= start_date]
-        df_filtered = df_filtered[df_filtered.index <= end_date]
+        df = normalize_df(df)
+        a, b = get_date_bounds(df, start_date, end_date)
+        df_filtered = df.iloc[a:b]
 
         print(f"  기간 필터링: {len(df)}개 → {len(df_filtered)}개 행")
-        df = df_filtered
     except Exception as e:
         print(f"  기간 필터링 중 오류: {e}")
+        df_filtered = df
 
-    df = df_filtered
-    for i in range(len(df)):
-        if i == 0:  # 첫 번째 데이터는 건너뛰기 (이전 데이터가 없음)
-            continue
+    return df_filtered
 
-        data_before = df.iloc[i - 1]  # 이전 데이터
-        data = df.iloc[i]
 
-        ## 진입 시도
-        if position is None:
-            if strat.signal.buy_signal_func(data_before):
-                position = open_position(data, state, strat, side, data.name)
+def _get_signal_mask(df, signal_func):
+    """시그널 함수를 DataFrame 전체에 적용해 불리언 마스크 생성"""
+    try:
+        # data["rsi"] < 15 같은 시그널은 컬럼 단위로 그대로 계산된다
+        mask = np.asarray(signal_func(df))
+        if mask.dtype == bool and mask.shape == (len(df),):
+            return mask
+    except Exception:
+        pass
+    # 벡터 연산이 안 되는 시그널은 행 단위로 평가
+    return np.fromiter(
+        (bool(signal_func(row)) for _, row in df.iterrows()),
+        dtype=bool,
+        count=len(df),
+    )
 
-        ## 진입이 되자마자 청산하는 경우도 있으니, 바로 체크
-        if position is not None:
-            if position.side == "long":
-                hit_sl = data["low"] <= position.sl_price
-                hit_tp = data["high"] >= position.tp_price
-            else:
-                hit_sl = data["high"] >= position.sl_price
-                hit_tp = data["low"] <= position.tp_price
 
-            if hit_sl or hit_tp:
-                trade_log = close_position(
-                    data, position, state, strat, data.name, "tp" if hit_tp else "sl"
-                )
-                trades.append(trade_log)
-                position = None
+def get_signal_masks(df, signal: Signal):
+    """매수/매도 시그널 마스크 계산 (전략 파라미터와 무관하므로 한 번만 계산해 공유)"""
+    return (
+        _get_signal_mask(df, signal.buy_signal_func),
+        _get_signal_mask(df, signal.sell_signal_func),
+    )
 
-        if position is not None:
-            if strat.signal.sell_signal_func(data):
-                trade_log = close_position(
-                    data, position, state, strat, data.name, "sell"
-                )
-                trades.append(trade_log)
-                position = None
 
-    return state, trades
+def get_short_signal_masks(df, signal: Signal):
+    """숏 진입/청산 시그널 마스크 (숏 시그널이 없으면 (None, None), 청산 시그널이 없으면 전부 False)"""
+    if signal.short_signal_func is None:
+        return None, None
+    short_mask = _get_signal_mask(df, signal.short_signal_func)
+    if signal.cover_signal_func is None:
+        return short_mask, np.zeros(len(df), dtype=bool)
+    return short_mask, _get_signal_mask(df, signal.cover_signal_func)
+
+
+class MaskBacktester:
+    """시그널 마스크와 가격 배열로 진입/청산이 일어나는 봉만 찾아가는 백테스트
+
+    backtest_fast의 봉 단위 규칙을 그대로 따른다.
+    - 이전 봉의 매수(숏은 숏 진입) 시그널이면 이번 봉 시가에 진입 (같은 봉이면 롱 우선)
+    - flip이면 반대 진입 시그널이 나온 다음 봉 시가에 청산하고 바로 반대로 진입
+    - 진입한 봉부터 TP/SL 도달 여부 확인 (둘 다 닿으면 TP, intrabar가 있으면 1분봉으로 판정)
+    - TP/SL이 없으면 이번 봉의 매도(숏은 숏 청산) 시그널로 이번 봉 시가에 청산
+    방향은 side를 주면 그 방향 하나로 매수/매도 시그널을 쓰고, 없으면 strat.direction을 따른다.
+    포지션이 없는 구간은 다음 진입 시그널로 건너뛰고, 포지션 구간은 넘파이로 한 번에 스캔한다.
+    거래 기록은 TradeLedger에 배열로 쌓는다.
+    early_stop이 있으면 진입/청산 직후 파산·낙폭 기준을 확인하고 걸리면 state.stop_reason을 남기고 멈춘다.
+    """
+
+    # 포지션 구간 스캔 시작 크기 (청산을 못 찾으면 두 배씩 늘림)
+    SCAN_CHUNK = 64
+    MAX_SCAN_CHUNK = 65536
+
+    def __init__(
+        self,
+        df,
+        buy_mask,
+        sell_mask,
+        strat: Strategy,
+        state: FinancialState,
+        side: Side = None,
+        intrabar: IntrabarResolver = None,
+        early_stop: EarlyStopRule = None,
+        short_mask=None,
+        cover_mask=None,
+    ):
+        self.index = df.index
+        self.open = df["open"].to_numpy(dtype=float)
+        self.high = df["high"].to_numpy(dtype=float)
+        self.low = df["low"].to_numpy(dtype=float)
+        # 방향별 진입 위치(이전 봉 시그널 → 이번 봉 진입)와 청산 시그널 위치
+        self.entries = {}
+        self.exits = {}
+        direction = side or strat.direction
+        if side is not None:
+            self.entries[side] = np.flatnonzero(buy_mask[:-1]) + 1
+            self.exits[side] = np.flatnonzero(sell_mask)
+        else:
+            if direction != "short":
+                self.entries["long"] = np.flatnonzero(buy_mask[:-1]) + 1
+                self.exits["long"] = np.flatnonzero(sell_mask)
+            if direction != "long":
+                if short_mask is None:
+                    short_mask, cover_mask = get_short_signal_masks(df, strat.signal)
+                if short_mask is None:
+                    raise ValueError(f"{direction} 전략에는 short_signal_func가 필요합니다")
+                self.entries["short"] = np.flatnonzero(short_mask[:-1]) + 1
+                self.exits["short"] = np.flatnonzero(cover_mask)
+        self.flip = direction == "flip"
+        self.strat = strat
+        self.state = state
+        self.position = None
+        self.entry_index = None
+        self.trades = TradeLedger()
+        self.cursor = 1  # 첫 번째 데이터는 건너뛰기 (이전 데이터가 없음)
+        self.intrabar = intrabar
+        if intrabar is not None and len(df) > 1:
+            self.times = to_ns(df.index)
+            self.bar_ns = int(np.median(np.diff(self.times[:1000])))
+        self.early_stop = early_stop
+        self.peak_balance = state.balance
+
+    def _check_early_stop(self):
+        """조기 종료 기준에 걸리면 사유를 남기고 True"""
+        if self.early_stop is None:
+            return False
+        self.peak_balance = max(self.peak_balance, self.state.balance)
+        reason = self.early_stop.get_stop_reason(
+            self.state.balance, self.state.initial_balance, self.peak_balance
+        )
+        if reason is None:
+            return False
+        self.state.stop_reason = reason
+        self.cursor = len(self.open)
+        return True
+
+    def _find_price_hit(self, start, end, pos: Position):
+        """[start, end) 구간에서 TP 또는 SL에 처음 닿는 봉 위치"""
+        size = self.SCAN_CHUNK
+        a = start
+        while a < end:
+            b = min(end, a + size)
+            if pos.side == "long":
+                hit = (self.low[a:b] <= pos.sl_price) | (self.high[a:b] >= pos.tp_price)
+            else:
+                hit = (self.high[a:b] >= pos.sl_price) | (self.low[a:b] <= pos.tp_price)
+            k = int(hit.argmax())
+            if hit[k]:
+                return a + k
+            a = b
+            size = min(size * 2, self.MAX_SCAN_CHUNK)
+        return None
+
+    def _exit_reason(self, i, pos: Position):
+        """TP/SL에 닿은 봉의 청산 사유 (둘 다 닿은 봉만 1분봉 조회 비용을 냄)"""
+        if pos.side == "long":
+            hit_sl = self.low[i] <= pos.sl_price
+            hit_tp = self.high[i] >= pos.tp_price
+        else:
+            hit_sl = self.high[i] >= pos.sl_price
+            hit_tp = self.low[i] <= pos.tp_price
+        if hit_tp and hit_sl and self.intrabar is not None:
+            start = int(self.times[i])
+            reason = self.intrabar.resolve(start, start + self.bar_ns, pos)
+            if reason is not None:
+                return reason
+        return "tp" if hit_tp else "sl"
+
+    def _open(self, i, side: Side):
+        self.position = open_position(
+            {"open": self.open[i]}, self.state, self.strat, side, self.index[i]
+        )
+        self.entry_index = i
+
+    def _next_entry(self, i):
+        """i번째 봉 이후 첫 진입 (위치, 방향), 없으면 None (같은 봉이면 롱 우선)"""
+        found = None
+        for side, entries in self.entries.items():
+            k = np.searchsorted(entries, i)
+            if k < len(entries) and (found is None or entries[k] < found[0]):
+                found = (int(entries[k]), side)
+        return found
+
+    def _close(self, i, reason):
+        trade_log = close_position(
+            {"open": self.open[i]}, self.position, self.state, self.strat, self.index[i], reason
+        )
+        self.trades.append(trade_log)
+        self.position = None
+
+    def run(self, stop=None):
+        """stop 직전 봉까지 진행 (None이면 끝까지)"""
+        n = len(self.open)
+        stop = n if stop is None else min(stop, n)
+        if self.state.stop_reason is not None:
+            return self.state, self.trades
+        i = self.cursor
+        while i < stop:
+            if self.position is None:
+                entry = self._next_entry(i)
+                if entry is None or entry[0] >= stop:
+                    i = stop
+                    break
+                i, side = entry
+                self._open(i, side)
+                if self._check_early_stop():
+                    return self.state, self.trades
+
+            # 다음 청산 시그널까지 TP/SL 스캔 (같은 봉이면 TP/SL이 먼저)
+            side = self.position.side
+            exits = self.exits[side]
+            k = np.searchsorted(exits, i)
+            sell_at = int(exits[k]) if k < len(exits) else n
+            # flip: 진입 이후 반대 진입 시그널이 나온 봉의 시가 (그 봉의 TP/SL보다 먼저)
+            flip_at = n
+            opposite = "short" if side == "long" else "long"
+            if self.flip and opposite in self.entries:
+                entries = self.entries[opposite]
+                k = np.searchsorted(entries, max(i, self.entry_index + 1))
+                flip_at = int(entries[k]) if k < len(entries) else n
+            hit_at = self._find_price_hit(i, min(sell_at + 1, flip_at, stop), self.position)
+            if hit_at is not None:
+                self._close(hit_at, self._exit_reason(hit_at, self.position))
+                i = hit_at + 1
+            elif flip_at <= sell_at and flip_at < stop:
+                self._close(flip_at, "flip")
+                if self._check_early_stop():
+                    return self.state, self.trades
+                i = flip_at
+                self._open(i, opposite)
+                if self._check_early_stop():
+                    return self.state, self.trades
+                continue
+            elif sell_at < stop:
+                self._close(sell_at, "sell")
+                i = sell_at + 1
+            else:
+                i = stop
+                break
+            if self._check_early_stop():
+                return self.state, self.trades
+        self.cursor = max(i, self.cursor)
+        return self.state, self.trades
+
+    def force_exit(self):
+        """남은 포지션을 마지막 봉에서 강제 청산"""
+        if self.position is not None and len(self.open) > 0:
+            self._close(len(self.open) - 1, "force_exit")
+        return self.state, self.trades
+
+
+def get_direction_masks(df, strat: Strategy, side: Side = None):
+    """전략 방향에 필요한 (매수, 매도, 숏 진입, 숏 청산) 마스크 (롱만 쓰면 숏 마스크는 None)"""
+    buy_mask, sell_mask = get_signal_masks(df, strat.signal)
+    if side is not None or strat.direction == "long":
+        return buy_mask, sell_mask, None, None
+    return (buy_mask, sell_mask, *get_short_signal_masks(df, strat.signal))
+
+
+def backtest_fast(
+    df, strat, state, side: Side = None, intrabar: IntrabarResolver = None, early_stop: EarlyStopRule = None
+):
+    """승률만 빠르게 계산하는 백테스트"""
+    df = filter_df_by_date(df, strat.start_date, strat.end_date)
+    buy_mask, sell_mask, short_mask, cover_mask = get_direction_masks(df, strat, side)
+    return MaskBacktester(
+        df,
+        buy_mask,
+        sell_mask,
+        strat,
+        state,
+        side=side,
+        intrabar=intrabar,
+        early_stop=early_stop,
+        short_mask=short_mask,
+        cover_mask=cover_mask,
+    ).run()
+
+
+def _run_kelly_second_pass(
+    df,
+    buy_mask,
+    sell_mask,
+    strat,
+    state: FinancialState,
+    init_trades,
+    side: Side = None,
+    intrabar: IntrabarResolver = None,
+    early_stop: EarlyStopRule = None,
+    short_mask=None,
+    cover_mask=None,
+    profiler: BacktestProfiler = None,
+):
+    """1차 거래 경로의 승률로 Kelly 비율을 정하고 2차 결과 계산"""
+    profiler = profiler or NULL_PROFILER
+    with profiler.phase("kelly"):
+        init_win_rate = get_win_rate(init_trades) / 100
+
+        # Kelly Criterion 계산
+        kelly_critation = get_kelly_critation(init_win_rate, strat.tp_ratio, strat.sl_ratio)
 
+    # 2차 백테스트: Kelly 적용
+    with profiler.phase("second_pass"):
+        state.initialize()
+        strat.input_amount_ratio = kelly_critation
+        replay = replay_trades(init_trades, strat, state, early_stop=early_stop)
+        if not replay.needs_rerun:
+            return replay.state, replay.trades
+
+        state.initialize()
+        return MaskBacktester(
+            df,
+            buy_mask,
+            sell_mask,
+            strat,
+            state,
+            side=side,
+            intrabar=intrabar,
+            early_stop=early_stop,
+            short_mask=short_mask,
+            cover_mask=cover_mask,
+        ).run()
+
+
+def backtest_kelly_with_masks(
+    df,
+    buy_mask,
+    sell_mask,
+    strat,
+    state: FinancialState,
+    side: Side = None,
+    intrabar: IntrabarResolver = None,
+    early_stop: EarlyStopRule = None,
+    short_mask=None,
+    cover_mask=None,
+):
+    """필터링된 데이터와 시그널 마스크로 Kelly 2단계 백테스트
 
-def backtest_single_strategy(df, strat, state: FinancialState, side="long"):
-    """단일 전략 백테스트"""
+    진입 비율은 진입/청산 봉을 바꾸지 않으므로 2차는 1차 거래 경로를 Kelly 비율로 재계산한다.
+    재계산으로 처리할 수 없는 경로(파산 등)만 봉 단위로 다시 돌린다.
+    1차에서 early_stop 기준에 걸리면 2차 없이 바로 반환한다 (state.stop_reason 참고).
+    """
     # 1차 백테스트: 승률 계산
-    init_state, init_trades = backtest_fast(df, strat, state, side=side)
-    init_win_rate = get_win_rate(init_trades) / 100
+    init_state, init_trades = MaskBacktester(
+        df,
+        buy_mask,
+        sell_mask,
+        strat,
+        state,
+        side=side,
+        intrabar=intrabar,
+        early_stop=early_stop,
+        short_mask=short_mask,
+        cover_mask=cover_mask,
+    ).run()
+    if init_state.stop_reason is not None:
+        return init_state, init_trades
+
+    return _run_kelly_second_pass(
+        df,
+        buy_mask,
+        sell_mask,
+        strat,
+        state,
+        init_trades,
+        side,
+        intrabar,
+        early_stop,
+        short_mask,
+        cover_mask,
+    )
 
-    # Kelly Criterion 계산
-    kelly_critation = get_kelly_critation(init_win_rate, strat.tp_ratio, strat.sl_ratio)
 
-    # 2차 백테스트: Kelly 적용
-    state.initialize()
-    # logger = TradingLogger(file_name=strat.get_filename(), enable_logging=True)
-    strat.input_amount_ratio = kelly_critation
-    final_state, trades = backtest_fast(df, strat, state, side=side)
+def backtest_single_strategy(
+    df,
+    strat,
+    state: FinancialState,
+    side: Side = None,
+    intrabar: IntrabarResolver = None,
+    early_stop: EarlyStopRule = None,
+):
+    """단일 전략 백테스트"""
+    # 기간 필터링과 시그널 계산은 1차/2차 백테스트가 공유
+    df = filter_df_by_date(df, strat.start_date, strat.end_date)
+    buy_mask, sell_mask, short_mask, cover_mask = get_direction_masks(df, strat, side)
+    return backtest_kelly_with_masks(
+        df,
+        buy_mask,
+        sell_mask,
+        strat,
+        state,
+        side=side,
+        intrabar=intrabar,
+        early_stop=early_stop,
+        short_mask=short_mask,
+        cover_mask=cover_mask,
+    )
 
-    return final_state, trades
 
+def run_with_peer_pruning(runners: List[MaskBacktester], early_stop: EarlyStopRule):
+    """여러 전략을 체크포인트까지 나란히 진행하며 동료 잔고 백분위 미만인 전략을 중단
 
-def backtest_multiple_strategies_same_timeframe(df, strategies: List[Strategy]):
-    """같은 타임프레임의 여러 전략을 한 번의 DataFrame 순회로 테스트"""
-    results = []
+    기간을 checkpoints + 1 구간으로 나눠 각 체크포인트에서 살아있는 전략들의 잔고를 비교하고,
+    peer_percentile 백분위 미만인 전략은 stop_reason을 "peer_percentile"로 남기고 더 돌리지 않는다.
+    """
+    parts = early_stop.checkpoints + 1
+    for k in range(1, parts):
+        active = [r for r in runners if r.state.stop_reason is None]
+        for runner in active:
+            runner.run(stop=len(runner.open) * k // parts)
+        active = [r for r in active if r.state.stop_reason is None]
+        if len(active) < 2:
+            continue
+        threshold = np.percentile(
+            [r.state.balance for r in active], early_stop.peer_percentile
+        )
+        for runner in active:
+            if runner.state.balance < threshold:
+                runner.state.stop_reason = "peer_percentile"
+
+    for runner in runners:
+        runner.run()
+    return runners
+
+
+def write_result_line(strategy: Strategy, state: FinancialState):
+    """전략 결과 한 줄을 trading_log/{시그널}_{티커}_result.txt에 추가
+
+    형식은 "전략 파일명, 진입 비율, 잔고, ROI"이고, 조기 종료된 전략은 뒤에 사유를 붙인다.
+    """
+    filename = f"backtesting/trading_log/{strategy.get_result_filename()}_result.txt"
+    line = f"{strategy.get_filename()}, {round(strategy.input_amount_ratio, 2)}, {round(state.balance, 2)}, {state.get_roi()}"
+    if state.stop_reason is not None:
+        line += f", pruned:{state.stop_reason}"
+    with open(filename, "a") as f:
+        f.write(line + "\n")
+
+
+def backtest_multiple_strategies_same_timeframe(
+    df,
+    strategies: List[Strategy],
+    cache: ResultCache = None,
+    intrabar: IntrabarResolver = None,
+    early_stop: EarlyStopRule = None,
+    profiler: BacktestProfiler = None,
+):
+    """같은 타임프레임의 여러 전략을 한 번의 DataFrame 순회로 테스트
+
+    early_stop이 있으면 파산/낙폭 기준에 걸린 전략은 그 시점에 멈추고 결과에 "pruned"로 사유를 남긴다.
+    peer_percentile이 있으면 1차 백테스트를 모든 전략이 나란히 진행하며 체크포인트마다 하위 전략을 걸러낸다.
+    profiler가 있으면 단계별 시간(filter, signals, cache, first_pass, kelly, second_pass, result_write)을 기록한다.
+    """
+    profiler = profiler or NULL_PROFILER
+    results = {}
+    # 기간별 필터링 데이터/지문, (기간, 시그널)별 마스크 (같은 기간/시그널의 전략끼리 공유)
+    periods = {}
+    fingerprints = {}
+    masks = {}
+    mode = intrabar.get_fingerprint() if intrabar else "bar"
+    if early_stop is not None:
+        mode = f"{mode}|{early_stop.get_key()}"
+
+    def get_period_df(strategy):
+        period = (strategy.start_date, strategy.end_date)
+        if period not in periods:
+            with profiler.phase("filter"):
+                periods[period] = filter_df_by_date(df, *period)
+        return periods[period]
+
+    def get_masks(strategy):
+        """(매수, 매도, 숏 진입, 숏 청산) 마스크 (롱/숏/flip 전략이 같은 시그널 계산을 공유)"""
+        key = (strategy.start_date, strategy.end_date, id(strategy.signal))
+        if key not in masks:
+            period_df = get_period_df(strategy)
+            with profiler.phase("signals"):
+                masks[key] = get_signal_masks(period_df, strategy.signal)
+        if strategy.direction == "long":
+            return (*masks[key], None, None)
+        short_key = (*key, "short")
+        if short_key not in masks:
+            period_df = get_period_df(strategy)
+            with profiler.phase("signals"):
+                masks[short_key] = get_short_signal_masks(period_df, strategy.signal)
+        return (*masks[key], *masks[short_key])
+
+    def get_failure(strategy, error):
+        return {
+            "strategy_name": strategy.get_filename(),
+            "error": error,
+            "success": False,
+        }
+
+    pending = []
+    for i, strategy in enumerate(strategies):
+        try:
+            cache_key = None
+            if cache is not None:
+                period = (strategy.start_date, strategy.end_date)
+                period_df = get_period_df(strategy)
+                with profiler.phase("cache"):
+                    if period not in fingerprints:
+                        fingerprints[period] = get_data_fingerprint(period_df)
+                    # Kelly 단계에서 input_amount_ratio가 바뀌므로 실행 전에 키를 만든다
+                    cache_key = get_strategy_key(strategy, fingerprints[period], mode=mode)
+                    cached = cache.get(cache_key)
+                if cached is not None:
+                    print(f"캐시 사용: {strategy.get_filename()}")
+                    if cached["success"]:
+                        strategy.input_amount_ratio = cached["input_amount_ratio"]
+                    results[i] = {**cached, "cached": True}
+                    continue
+            pending.append((i, strategy, cache_key))
+        except Exception as e:
+            results[i] = get_failure(strategy, str(e))
 
-    for strategy in strategies:
+    # 1차 백테스트 (동료 비교가 있으면 모든 전략을 나란히 진행)
+    runners = {}
+    for i, strategy, _ in pending:
         try:
             print(f"백테스트 시작: {strategy.get_filename()}")
             # 각 전략마다 새로운 상태 생성
             state = FinancialState(initial_balance=1000000)
-
-            # 백테스트 실행
-            final_state, trades = backtest_single_strategy(
-                df, strategy, state, side="long"
+            buy_mask, sell_mask, short_mask, cover_mask = get_masks(strategy)
+            runners[i] = MaskBacktester(
+                get_period_df(strategy),
+                buy_mask,
+                sell_mask,
+                strategy,
+                state,
+                intrabar=intrabar,
+                early_stop=early_stop,
+                short_mask=short_mask,
+                cover_mask=cover_mask,
             )
-            if final_state and trades:
-                ## 파일이 없으면 생성
-                filename = f"backtesting/trading_log/{strategy.get_result_filename()}_result.txt"
-                if not os.path.exists(filename):
-                    f = open(filename, "w")
-                else:
-                    f = open(filename, "a")
-                f.write(
-                    f"{strategy.get_filename()}, {round(strategy.input_amount_ratio, 2)}, {round(final_state.balance, 2)}, {final_state.get_roi()}\n"
-                )
-                f.close()
-                results.append(
-                    {
-                        "strategy_name": strategy.get_filename(),
-                        "balance": final_state.balance,
-                        "roi": final_state.get_roi(),
-                        "success": True,
-                    }
-                )
-            else:
-                results.append(
-                    {
-                        "strategy_name": strategy.get_filename(),
-                        "error": "백테스트 결과가 없습니다",
-                        "success": False,
+        except Exception as e:
+            results[i] = get_failure(strategy, str(e))
+
+    if early_stop is not None and early_stop.peer_percentile is not None:
+        try:
+            with profiler.strategy("peer_pruning"), profiler.phase("first_pass"):
+                run_with_peer_pruning(list(runners.values()), early_stop)
+        except Exception as e:
+            for i, strategy, _ in pending:
+                if i in runners:
+                    results[i] = get_failure(strategy, str(e))
+            runners = {}
+    else:
+        for i, strategy, _ in pending:
+            if i not in runners:
+                continue
+            try:
+                with profiler.strategy(strategy.get_filename()), profiler.phase("first_pass"):
+                    runners[i].run()
+            except Exception as e:
+                results[i] = get_failure(strategy, str(e))
+                del runners[i]
+
+    for i, strategy, cache_key in pending:
+        if i not in runners:
+            continue
+        try:
+            with profiler.strategy(strategy.get_filename()):
+                runner = runners[i]
+                if runner.state.stop_reason is not None:
+                    # 1차에서 중단된 전략은 2차(Kelly)를 계산하지 않지만 결과 파일에는 중단 시점 잔고와 사유를 남긴다
+                    print(f"조기 종료 ({runner.state.stop_reason}): {strategy.get_filename()}")
+                    with profiler.phase("result_write"):
+                        write_result_line(strategy, runner.state)
+                    result = {
+                        **get_failure(strategy, f"조기 종료: {runner.state.stop_reason}"),
+                        "input_amount_ratio": strategy.input_amount_ratio,
+                        "balance": runner.state.balance,
+                        "roi": runner.state.get_roi(),
+                        "pruned": runner.state.stop_reason,
                     }
-                )
+                else:
+                    buy_mask, sell_mask, short_mask, cover_mask = get_masks(strategy)
+                    final_state, trades = _run_kelly_second_pass(
+                        get_period_df(strategy),
+                        buy_mask,
+                        sell_mask,
+                        strategy,
+                        runner.state,
+                        runner.trades,
+                        intrabar=intrabar,
+                        early_stop=early_stop,
+                        short_mask=short_mask,
+                        cover_mask=cover_mask,
+                        profiler=profiler,
+                    )
+                    if final_state and trades:
+                        ## 파일이 없으면 생성
+                        with profiler.phase("result_write"):
+                            write_result_line(strategy, final_state)
+                        result = {
+                            "strategy_name": strategy.get_filename(),
+                            "input_amount_ratio": strategy.input_amount_ratio,
+                            "balance": final_state.balance,
+                            "roi": final_state.get_roi(),
+                            "success": True,
+                        }
+                        if final_state.stop_reason is not None:
+                            result["pruned"] = final_state.stop_reason
+                    else:
+                        result = get_failure(strategy, "백테스트 결과가 없습니다")
+                results[i] = result
+                # 1차에서 중단된 전략과 동료 비교 결과(같이 돌린 전략 구성에 따라 달라짐)는 캐시하지 않는다
+                if cache_key is not None and result["success"] and result.get("pruned") != "peer_percentile":
+                    with profiler.phase("cache"):
+                        cache.set(cache_key, result)
 
         except Exception as e:
-            results.append(
-                {
-                    "strategy_name": strategy.get_filename(),
-                    "error": str(e),
-                    "success": False,
-                }
-            )
+            results[i] = get_failure(strategy, str(e))
 
-    return results
+    return [results[i] for i in range(len(strategies))]
 
 
-def run_backtesting_by_timeframe(strategies: list[Strategy]):
-    """타임프레임별로 그룹화하여 백테스트 실행"""
+def run_backtesting_by_timeframe(
+    strategies: list[Strategy],
+    use_cache: bool = True,
+    intrabar: bool = False,
+    early_stop: EarlyStopRule = None,
+    lazy_indicators: bool = True,
+    profiler: BacktestProfiler = None,
+):
+    """타임프레임별로 그룹화하여 백테스트 실행
+
+    use_cache가 True면 전략 파라미터/시그널/데이터가 같은 전략은 다시 계산하지 않는다.
+    intrabar가 True면 TP/SL이 같은 봉에서 모두 닿은 경우 저장된 1분봉으로 순서를 판정한다.
+    early_stop이 있으면 가망 없는 전략은 끝까지 돌리지 않고 결과에 "pruned"로 표시한다.
+    lazy_indicators가 True면 시그널이 참조하는 지표 컬럼만 지표 캐시에서 읽는다.
+    profiler가 있으면 단계별 시간(과 전략별 cProfile 상위 함수)을 trading_log/profile에 요약으로 남긴다.
+    """
     import time
 
+    profiler = profiler or NULL_PROFILER
+
+    cache = ResultCache() if use_cache else None
+    resolvers = {}
+
     # 타임프레임별로 전략 그룹화
     strategies_by_timeframe = {}
     for strategy in strategies:
@@ -279,6 +822,7 @@ def run_backtesting_by_timeframe(strategies: list[Strategy]):
     )
 
     all_results = []
+    total_strategies = len(strategies)
     start_time = time.time()
 
     # 타임프레임별로 순차 처리
@@ -287,15 +831,19 @@ def run_backtesting_by_timeframe(strategies: list[Strategy]):
         ticker = strategies[0].ticker
         try:
             # 데이터 로드 (한 번만)
-            df = pd.read_csv(
-                f"backtesting/data/{ticker}_{timeframe}_with_indicators.csv"
-            )
-            df.set_index(df.columns[0], inplace=True)
+            with profiler.phase("load"):
+                df = load_strategy_dataset(ticker, timeframe, strategies, lazy_indicators)
             print(f"데이터 로드 완료: {len(df)}개 행, {df.index[0]} ~ {df.index[-1]}")
 
+            resolver = None
+            if intrabar and timeframe != "1m":
+                if ticker not in resolvers:
+                    resolvers[ticker] = IntrabarResolver.load(ticker)
+                resolver = resolvers[ticker]
+
             # 해당 타임프레임의 모든 전략을 한 번에 테스트
             timeframe_results = backtest_multiple_strategies_same_timeframe(
-                df, strategies
+                df, strategies, cache=cache, intrabar=resolver, early_stop=early_stop, profiler=profiler
             )
             all_results.extend(timeframe_results)
 
@@ -307,6 +855,10 @@ def run_backtesting_by_timeframe(strategies: list[Strategy]):
 
             print(f"{timeframe} 완료: {successful_count}/{len(strategies)}개 성공")
 
+            if cache is not None:
+                with profiler.phase("cache"):
+                    cache.save()
+
         except Exception as e:
             print(f"{timeframe} 처리 중 오류: {e}")
             # 오류가 발생한 전략들을 실패로 기록
@@ -321,7 +873,6 @@ def run_backtesting_by_timeframe(strategies: list[Strategy]):
 
         # 진행률 표시
         completed_strategies = len([r for r in all_results if r["success"]])
-        total_strategies = len(all_strategies)
         progress = (completed_strategies / total_strategies) * 100
         elapsed = time.time() - start_time
 
@@ -336,6 +887,14 @@ def run_backtesting_by_timeframe(strategies: list[Strategy]):
     print(f"총 소요시간: {total_time/60:.1f}분")
     print(f"성공: {len([r for r in all_results if r['success']])}개")
     print(f"실패: {len([r for r in all_results if not r['success']])}개")
+    if cache is not None:
+        print(f"캐시 사용: {cache.hits}개, 새로 계산: {cache.misses}개")
+    pruned = [r for r in all_results if "pruned" in r]
+    if pruned:
+        print(f"조기 종료: {len(pruned)}개")
+    if profiler.enabled:
+        print(profiler.format_summary())
+        print(f"프로파일 저장: {profiler.save()}")
 
     return all_results
 
@@ -370,6 +929,13 @@ if __name__ == "__main__":
     SL_RATIOS = [0.05, 0.1, 0.2, 0.5]
     START_DATE = "2022-01-01"
     END_DATE = datetime.now().strftime("%Y-%m-%d")
+    # TP/SL이 한 봉에서 모두 닿으면 1분봉 데이터로 순서 판정 (1m 데이터 필요)
+    INTRABAR = False
+    # 조기 종료는 직접 켜야 함: 1차(고정 진입 비율)에서 판정하므로 Kelly 비율로는 살아남을 전략도 걸러진다
+    # 예) EarlyStopRule(bankruptcy_ratio=0.01), 체크포인트마다 하위 20%도 거르려면 peer_percentile=20 추가
+    EARLY_STOP = None
+    # 단계별 시간 측정 (per_strategy=True면 전략마다 cProfile, 끄려면 None)
+    PROFILER = None
 
     print("=== 새로운 데이터 중심 백테스팅 시작 ===")
     print("타임프레임별로 데이터를 한 번만 로드하고 여러 전략을 동시 테스트합니다.")
@@ -405,7 +971,9 @@ if __name__ == "__main__":
                         )
                         all_strategies.append(strategy)
 
-    results = run_backtesting_by_timeframe(all_strategies)
+    results = run_backtesting_by_timeframe(
+        all_strategies, intrabar=INTRABAR, early_stop=EARLY_STOP, profiler=PROFILER
+    )
 
     # 결과 요약
     successful_results = [r for r in results if r["success"]]
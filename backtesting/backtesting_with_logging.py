@@ -3,7 +3,9 @@ import pandas as pd
 import threading
 from datetime import datetime
 
-from backtesting.backtesting_deep import backtest_fast
+from backtesting.backtesting_deep import backtest_fast, filter_df_by_date, load_dataset
+from backtesting.intrabar import IntrabarResolver, to_ns
+from backtesting.profiling import NULL_PROFILER, BacktestProfiler
 from model.model import (
     Signal,
     FinancialState,
@@ -11,29 +13,10 @@ from model.model import (
     Side,
     Strategy,
     TradeLog,
+    TradeLedger,
     TradingLogger,
 )
 
-# matplotlib import with fallback
-try:
-    import matplotlib
-
-    # macOS에서 멀티쓰레드 환경에서 발생하는 NSWindow 에러 방지
-    matplotlib.use("Agg")  # non-interactive backend 사용
-
-    import matplotlib.pyplot as plt
-    import matplotlib.dates as mdates
-    from matplotlib import rcParams
-
-    MATPLOTLIB_AVAILABLE = True
-
-    # 한글 폰트 설정
-    rcParams["font.family"] = "DejaVu Sans"
-    rcParams["axes.unicode_minus"] = False
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
-    print("Warning: matplotlib not available. Balance graphs will not be generated.")
-
 
 def open_position(row, state: FinancialState, strat: Strategy, side: Side, now):
     """포지션 진입"""
@@ -121,12 +104,28 @@ def close_position(
     )
 
 
+def get_signal_funcs(strat: Strategy, side: Side = None):
+    """방향별 (진입 시그널, 청산 시그널) 함수 (side를 주면 그 방향으로 매수/매도 시그널 사용)"""
+    signal = strat.signal
+    if side is not None:
+        return {side: (signal.buy_signal_func, signal.sell_signal_func)}
+    funcs = {}
+    if strat.direction != "short":
+        funcs["long"] = (signal.buy_signal_func, signal.sell_signal_func)
+    if strat.direction != "long":
+        if signal.short_signal_func is None:
+            raise ValueError(f"{strat.direction} 전략에는 short_signal_func가 필요합니다")
+        funcs["short"] = (signal.short_signal_func, signal.cover_signal_func)
+    return funcs
+
+
 def backtest(
     df: pd.DataFrame,
     strat: Strategy,
     state: FinancialState,
-    side: Side = "long",
+    side: Side = None,
     logger: TradingLogger = None,
+    intrabar: IntrabarResolver = None,
 ):
     """메인 백테스트 함수"""
 
@@ -137,28 +136,15 @@ def backtest(
 
     position = None
     trades = []
-    df_filtered = df.copy()
-
+    signal_funcs = get_signal_funcs(strat, side)
+    flip = side is None and strat.direction == "flip"
     # df 필터링하기
-    try:
-        start_date = pd.to_datetime(strat.start_date)
-        end_date = pd.to_datetime(strat.end_date)
-        # 인덱스를 datetime으로 변환하고 중복/NaN 제거
-        df_filtered.index = pd.to_datetime(df_filtered.index)
-        df_filtered = df_filtered[~df_filtered.index.isna()]  # NaN 인덱스 제거
-        df_filtered = df_filtered[
-            ~df_filtered.index.duplicated(keep="first")
-        ]  # 중복 인덱스 제거
-
-        df_filtered = df_filtered[df_filtered.index >= start_date]
-        df_filtered = df_filtered[df_filtered.index <= end_date]
-
-        print(f"  기간 필터링: {len(df)}개 → {len(df_filtered)}개 행")
-        df = df_filtered
-    except Exception as e:
-        print(f"  기간 필터링 중 오류: {e}")
+    df = filter_df_by_date(df, strat.start_date, strat.end_date)
 
-    df = df_filtered
+    # TP/SL이 한 봉에서 모두 닿는 경우 1분봉 판정용 봉 시각
+    if intrabar is not None and len(df) > 1:
+        bar_times = to_ns(df.index)
+        bar_ns = int(pd.Series(bar_times[:1000]).diff().median())
 
     # 거래하기
     for i in range(len(df)):
@@ -171,14 +157,28 @@ def backtest(
         if logger:
             logger.record_balance(data.name, state.balance)
 
-        ## 진입 시도
-        if position is None:
-            if strat.signal.buy_signal_func(data_before):
-                position = open_position(data, state, strat, side, data.name)
-                # trades.append(position)
+        ## flip: 반대 진입 시그널이면 이번 봉 시가에 청산하고 바로 반대로 진입
+        if position is not None and flip:
+            opposite = "short" if position.side == "long" else "long"
+            if signal_funcs[opposite][0](data_before):
+                trade_log = close_position(data, position, state, strat, data.name, "flip")
+                trades.append(trade_log)
+                if logger:
+                    logger.log_position_close(data.name, trade_log, state, "flip")
+                position = open_position(data, state, strat, opposite, data.name)
                 if logger:
                     logger.log_position_open(data.name, position, state)
 
+        ## 진입 시도 (롱과 숏 시그널이 같이 나오면 롱 우선)
+        if position is None:
+            for entry_side, (entry_func, _) in signal_funcs.items():
+                if entry_func(data_before):
+                    position = open_position(data, state, strat, entry_side, data.name)
+                    # trades.append(position)
+                    if logger:
+                        logger.log_position_open(data.name, position, state)
+                    break
+
         ## 진입이 되자마자 청산하는 경우도 있으니, 바로 체크
         if position is not None:
             if position.side == "long":
@@ -189,14 +189,21 @@ def backtest(
                 hit_tp = data["low"] <= position.tp_price
 
             if hit_sl or hit_tp:
+                reason = "tp" if hit_tp else "sl"
+                if hit_sl and hit_tp and intrabar is not None:
+                    reason = (
+                        intrabar.resolve(bar_times[i], bar_times[i] + bar_ns, position)
+                        or reason
+                    )
                 trade_log = close_position(
-                    data, position, state, strat, data.name, "tp" if hit_tp else "sl"
+                    data, position, state, strat, data.name, reason
                 )
                 trades.append(trade_log)
                 position = None
 
         if position is not None:
-            if strat.signal.sell_signal_func(data):
+            exit_func = signal_funcs[position.side][1]
+            if exit_func is not None and exit_func(data):
                 trade_log = close_position(
                     data, position, state, strat, data.name, "sell"
                 )
@@ -207,6 +214,7 @@ def backtest(
 
         # 파산 체크 (잔고가 초기 자본의 1% 미만)
         if state.balance < state.initial_balance * 0.01:
+            state.stop_reason = "bankruptcy"
             if logger:
                 logger.log_bankruptcy(data.name, state)
             print("파산으로 인한 백테스트 중단")
@@ -242,6 +250,8 @@ def backtest(
 
 
 def get_win_rate(trades):
+    if isinstance(trades, TradeLedger):
+        return trades.win_rate()
     total_trades = len(trades)
     if total_trades == 0:
         return 0.0
@@ -254,50 +264,32 @@ def analyze_trades(trades):
     if not trades:
         return "거래 내역이 없습니다."
 
-    total_trades = len(trades)
-    winning_trades = [t for t in trades if t.realized_pnl > 0]
-    losing_trades = [t for t in trades if t.realized_pnl < 0]
-
-    # TP/SL/기타 청산 통계
-    tp_trades = [t for t in trades if t.reason == "tp"]
-    sl_trades = [t for t in trades if t.reason == "sl"]
-    force_exit_trades = [t for t in trades if t.reason == "force_exit"]
-    other_trades = [t for t in trades if t.reason not in ["tp", "sl", "force_exit"]]
-
-    avg_win = (
-        sum(t.realized_pnl for t in winning_trades) / len(winning_trades)
-        if winning_trades
-        else 0
-    )
-    avg_loss = (
-        sum(t.realized_pnl for t in losing_trades) / len(losing_trades)
-        if losing_trades
-        else 0
-    )
+    stats = TradeLedger.from_trades(trades).get_stats()
+    total_trades = stats["total_trades"]
+    reasons = stats["reason_counts"]
+    other_count = total_trades - reasons["tp"] - reasons["sl"] - reasons["force_exit"]
 
     # 손익비 계산
-    if avg_loss != 0 and winning_trades:
-        profit_factor = abs(avg_win / avg_loss)
-        profit_factor_str = f"{profit_factor:.2f}"
+    if stats["payoff_ratio"] is not None:
+        profit_factor_str = f"{stats['payoff_ratio']:.2f}"
     else:
         profit_factor_str = "N/A"
 
-    # 승률 계산
-    win_rate = len(winning_trades) / total_trades * 100 if total_trades > 0 else 0
+    win_rate = stats["win_rate"]
 
     message = f"""
 === 거래 분석 ===
 총 거래 횟수: {total_trades}
-TP 달성: {len(tp_trades)}회 ({len(tp_trades)/total_trades*100:.1f}%)
-SL 달성: {len(sl_trades)}회 ({len(sl_trades)/total_trades*100:.1f}%)
-강제 청산: {len(force_exit_trades)}회 ({len(force_exit_trades)/total_trades*100:.1f}%)
-기타 청산: {len(other_trades)}회 ({len(other_trades)/total_trades*100:.1f}%)
+TP 달성: {reasons['tp']}회 ({reasons['tp']/total_trades*100:.1f}%)
+SL 달성: {reasons['sl']}회 ({reasons['sl']/total_trades*100:.1f}%)
+강제 청산: {reasons['force_exit']}회 ({reasons['force_exit']/total_trades*100:.1f}%)
+기타 청산: {other_count}회 ({other_count/total_trades*100:.1f}%)
 
 승률: {win_rate:.2f}%
-승리 거래: {len(winning_trades)}
-패배 거래: {len(losing_trades)}
-평균 수익: {avg_win:.2f}
-평균 손실: {avg_loss:.2f}
+승리 거래: {stats['win_count']}
+패배 거래: {stats['loss_count']}
+평균 수익: {stats['avg_win']:.2f}
+평균 손실: {stats['avg_loss']:.2f}
 손익비: {profit_factor_str}
 """
     print(message)
@@ -325,23 +317,30 @@ DATA_CACHE = {}
 
 def load_data_once(ticker, timeframe):
     if (ticker, timeframe) not in DATA_CACHE:
-        df = pd.read_csv(f"backtesting/data/{ticker}_{timeframe}_with_indicators.csv")
-        df.set_index(df.columns[0], inplace=True)
-        DATA_CACHE[(ticker, timeframe)] = df
+        DATA_CACHE[(ticker, timeframe)] = load_dataset(ticker, timeframe)
     return DATA_CACHE[(ticker, timeframe)]
 
 
-def get_backtesting_with_kelly_optimization(
-    strategy: Strategy, state: FinancialState, logger: TradingLogger
+def _run_kelly_optimization(
+    strategy: Strategy,
+    state: FinancialState,
+    logger: TradingLogger,
+    intrabar: IntrabarResolver,
+    profiler: BacktestProfiler,
 ):
-    try:
-        print(f"백테스트 시작: {strategy.get_filename()}")
+    """1차(승률) → Kelly 비율 → 2차(상세 로그) 백테스트와 그래프 생성"""
+    print(f"백테스트 시작: {strategy.get_filename()}")
+    with profiler.phase("load"):
         df = load_data_once(strategy.ticker, strategy.timeframe)
 
-        # 1차 백테스트: 최소한의 정보만 수집
-        print(f"1차 백테스트 시작: {strategy.get_filename()}")
-        init_state, init_trades = backtest_fast(df, strategy, state, side="long")
-        print(f"1차 백테스트 완료: {strategy.get_filename()}")
+    # 1차 백테스트: 최소한의 정보만 수집
+    print(f"1차 백테스트 시작: {strategy.get_filename()}")
+    with profiler.phase("first_pass"):
+        init_state, init_trades = backtest_fast(
+            df, strategy, state, intrabar=intrabar
+        )
+    print(f"1차 백테스트 완료: {strategy.get_filename()}")
+    with profiler.phase("kelly"):
         init_win_rate = get_win_rate(init_trades) / 100
         print(f"1차 백테스트 승률: {init_win_rate}")
 
@@ -349,25 +348,42 @@ def get_backtesting_with_kelly_optimization(
         kelly_critation = get_kelly_critation(
             init_win_rate, strategy.tp_ratio, strategy.sl_ratio
         )
-        print(f"Kelly Criterion: {kelly_critation}")
-        state.initialize()
-        # 2차 백테스트: Kelly 적용
-        strategy.input_amount_ratio = kelly_critation
-        print(f"Kelly Criterion 적용 후 백테스트 시작: {strategy.get_filename()}")
-        final_state, trades = backtest(df, strategy, state, side="long", logger=logger)
-
-        print(f"Kelly Criterion 적용 후 백테스트 완료: {strategy.get_filename()}")
-        
-        # 잔고 그래프 생성 확인
-        if logger and logger.balance_history:
-            try:
+    print(f"Kelly Criterion: {kelly_critation}")
+    state.initialize()
+    # 2차 백테스트: Kelly 적용
+    strategy.input_amount_ratio = kelly_critation
+    print(f"Kelly Criterion 적용 후 백테스트 시작: {strategy.get_filename()}")
+    with profiler.phase("second_pass"):
+        final_state, trades = backtest(
+            df, strategy, state, logger=logger, intrabar=intrabar
+        )
+
+    print(f"Kelly Criterion 적용 후 백테스트 완료: {strategy.get_filename()}")
+    
+    # 잔고 그래프 생성 확인
+    if logger and logger.balance_history:
+        try:
+            with profiler.phase("graph"):
                 graph_path = logger.generate_balance_graph(strategy)
-                if graph_path:
-                    print(f"잔고 변화 그래프: {graph_path}")
-            except Exception as e:
-                print(f"그래프 생성 중 오류: {e}")
+            if graph_path:
+                print(f"잔고 변화 그래프: {graph_path}")
+        except Exception as e:
+            print(f"그래프 생성 중 오류: {e}")
+
+    return final_state, trades
+
 
-        return final_state, trades
+def get_backtesting_with_kelly_optimization(
+    strategy: Strategy,
+    state: FinancialState,
+    logger: TradingLogger,
+    intrabar: IntrabarResolver = None,
+    profiler: BacktestProfiler = None,
+):
+    profiler = profiler or NULL_PROFILER
+    try:
+        with profiler.strategy(strategy.get_filename()):
+            return _run_kelly_optimization(strategy, state, logger, intrabar, profiler)
 
     except FileNotFoundError:
         print(
@@ -404,10 +420,15 @@ if __name__ == "__main__":
     # 초기 상태 설정
     state = FinancialState(initial_balance=1000000)
     logger = TradingLogger(file_name=strategy.get_filename(), enable_logging=True)
+    # 단계별 시간과 cProfile 상위 함수를 trading_log/profile에 남기려면 BacktestProfiler(per_strategy=True)
+    profiler = None
 
     final_state, trades = get_backtesting_with_kelly_optimization(
-        strategy, state, logger
+        strategy, state, logger, profiler=profiler
     )
+    if profiler is not None:
+        print(profiler.format_summary())
+        print(f"프로파일 저장: {profiler.save()}")
 
     print("balance", final_state.balance)
     print("roi", final_state.get_roi())
@@ -0,0 +1,307 @@
+import contextlib
+import json
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from backtesting.backtesting_deep import (
+    backtest_fast,
+    backtest_multiple_strategies_same_timeframe,
+    filter_df_by_date,
+    load_dataset,
+    normalize_df,
+)
+from backtesting.backtesting_with_logging import backtest
+from backtesting.collect_data import add_indicators_df
+from backtesting.indicator_cache import IndicatorCache
+from backtesting.synthetic_data import generate_ohlcv, get_indicator_frame
+from model.model import FinancialState, Signal, Strategy, TradingLogger
+from utils.utils import quiet
+
+BENCHMARK_SIZES = [10_000, 500_000, 2_000_000]
+BENCHMARK_RESULT_DIR = "backtesting/benchmark_results"
+# 행 단위 백테스트(backtest)는 느려서 앞부분만 측정하고 봉/초로 환산
+ROW_BACKTEST_MAX_BARS = 50_000
+# 저장된 데이터가 있으면 함께 측정할 (티커, 타임프레임)
+RECORDED_DATASETS = [("BTCUSDT", "15m"), ("BTCUSDT", "1h")]
+
+
+def _filter_with_copy(df, start_date, end_date):
+    """기존 방식: 매 호출마다 복사, 인덱스 파싱, 중복 제거, 불리언 필터링"""
+    df_filtered = df.copy()
+    df_filtered.index = pd.to_datetime(df_filtered.index)
+    df_filtered = df_filtered[~df_filtered.index.isna()]
+    df_filtered = df_filtered[~df_filtered.index.duplicated(keep="first")]
+    df_filtered = df_filtered[df_filtered.index >= pd.to_datetime(start_date)]
+    df_filtered = df_filtered[df_filtered.index <= pd.to_datetime(end_date)]
+    return df_filtered
+
+
+def benchmark_date_filter(df, start_date, end_date, repeat: int = 20):
+    """전략마다 기간 필터링을 반복할 때 호출당 시간 비교 (초)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        expected = _filter_with_copy(df, start_date, end_date)
+    copy_time = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    normalized = normalize_df(df)
+    normalize_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        filtered = filter_df_by_date(normalized, start_date, end_date)
+    slice_time = (time.perf_counter() - start) / repeat
+
+    assert filtered.index.equals(expected.index), "필터링 결과가 기존 방식과 다릅니다"
+    return {
+        "rows": len(df),
+        "filtered_rows": len(filtered),
+        "copy_filter_sec": copy_time,
+        "normalize_once_sec": normalize_time,
+        "slice_filter_sec": slice_time,
+        "speedup": copy_time / slice_time if slice_time > 0 else float("inf"),
+    }
+
+
+def _best_time(func, repeat: int = 3):
+    """repeat번 실행 중 가장 짧은 시간 (초)과 마지막 결과"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with quiet():
+            result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+@contextlib.contextmanager
+def _scratch_root(df: pd.DataFrame = None, ticker: str = "BENCH", timeframe: str = "15m"):
+    """임시 디렉터리에 저장소와 같은 backtesting/ 구조를 만들고 그 안에서 실행
+
+    collect_data, load_dataset, 결과 파일 저장은 작업 디렉터리 기준 경로를 쓰므로
+    저장소의 데이터/캐시/로그를 건드리지 않고 같은 코드 경로를 측정한다.
+    df를 주면 backtesting/raw_data에 원본 OHLCV CSV로 저장해 둔다.
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as root:
+        for folder in ["raw_data", "data", "trading_log"]:
+            os.makedirs(os.path.join(root, "backtesting", folder))
+        if df is not None:
+            raw = df[["open", "high", "low", "close", "volume"]].rename_axis("timestamp")
+            raw.to_csv(os.path.join(root, f"backtesting/raw_data/{ticker}_{timeframe}.csv"))
+        os.chdir(root)
+        try:
+            yield root
+        finally:
+            os.chdir(cwd)
+
+
+def make_benchmark_strategies(df: pd.DataFrame, leverages=(2, 10), tp_ratios=(0.1, 0.5, 1.0), sl_ratios=(0.05, 0.2)):
+    """데이터 전체 기간을 쓰는 RSI 전략 묶음 (거래가 충분히 나오도록 30/70 임계값)"""
+    signal = Signal(
+        buy_signal_func=lambda data: data["rsi"] < 30,
+        sell_signal_func=lambda data: data["rsi"] > 70,
+        description="buy_rsi_below_30_sell_rsi_above_70",
+    )
+    index = normalize_df(df).index
+    return [
+        Strategy(
+            ticker="BENCH",
+            timeframe="15m",
+            leverage=leverage,
+            maker_fee=0.0002,
+            taker_fee=0.0005,
+            tp_ratio=tp_ratio,
+            sl_ratio=sl_ratio,
+            input_amount_ratio=0.3,
+            signal=signal,
+            start_date=str(index[0]),
+            end_date=str(index[-1]),
+        )
+        for leverage in leverages
+        for tp_ratio in tp_ratios
+        for sl_ratio in sl_ratios
+    ]
+
+
+def benchmark_backtesters(df: pd.DataFrame, row_max_bars: int = ROW_BACKTEST_MAX_BARS):
+    """backtest_fast(마스크)와 backtest(행 단위, 로거 유무)의 봉/초"""
+    df = normalize_df(df)
+    strategy = make_benchmark_strategies(df)[0]
+    fast_time, (_, trades) = _best_time(lambda: backtest_fast(df, strategy, FinancialState(1000000)))
+
+    row_df = df.iloc[:row_max_bars]
+    row_strategy = strategy.model_copy(update={"end_date": str(row_df.index[-1])})
+    row_time, _ = _best_time(lambda: backtest(row_df, row_strategy, FinancialState(1000000)), repeat=1)
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = TradingLogger("benchmark", log_dir=log_dir)
+        logged_time, _ = _best_time(
+            lambda: backtest(row_df, row_strategy, FinancialState(1000000), logger=logger), repeat=1
+        )
+    return {
+        "bars": len(df),
+        "trades": len(trades),
+        "backtest_fast_sec": fast_time,
+        "backtest_fast_bars_per_sec": len(df) / fast_time,
+        "row_backtest_bars": len(row_df),
+        "row_backtest_sec": row_time,
+        "row_backtest_bars_per_sec": len(row_df) / row_time,
+        "logger_backtest_sec": logged_time,
+        "logger_overhead_ratio": logged_time / row_time,
+    }
+
+
+def benchmark_grid(df: pd.DataFrame):
+    """backtest_multiple_strategies_same_timeframe의 전략/초 (캐시 없이 Kelly 2차까지)"""
+    df = normalize_df(df)
+    strategies = make_benchmark_strategies(df)
+    with _scratch_root():
+        grid_time, results = _best_time(
+            lambda: backtest_multiple_strategies_same_timeframe(df, [s.model_copy() for s in strategies]), repeat=1
+        )
+    return {
+        "bars": len(df),
+        "strategies": len(strategies),
+        "succeeded": sum(1 for r in results if r.get("success")),
+        "grid_sec": grid_time,
+        "strategies_per_sec": len(strategies) / grid_time,
+        "strategy_bars_per_sec": len(strategies) * len(df) / grid_time,
+    }
+
+
+def benchmark_indicators_and_loading(df: pd.DataFrame, ticker: str = "BENCH", timeframe: str = "15m"):
+    """지표 생성(add_indicators_df, 지표 캐시)과 데이터셋 읽기(CSV, 지표 캐시) 시간"""
+    with _scratch_root(df, ticker, timeframe):
+        build_time, indicators_df = _best_time(lambda: add_indicators_df(f"{ticker}_{timeframe}.csv"), repeat=1)
+        indicators_df.set_index("timestamp").to_csv(f"backtesting/data/{ticker}_{timeframe}_with_indicators.csv")
+
+        csv_load_time, loaded = _best_time(lambda: load_dataset(ticker, timeframe))
+        cache_build_time, _ = _best_time(
+            lambda: IndicatorCache(ticker, timeframe).get_frame(["rsi", "macd", "bb_upper", "sma_20"]), repeat=1
+        )
+        cache_load_time, _ = _best_time(
+            lambda: IndicatorCache(ticker, timeframe).get_frame(["rsi", "macd", "bb_upper", "sma_20"])
+        )
+    return {
+        "bars": len(df),
+        "columns": len(loaded.columns),
+        "add_indicators_sec": build_time,
+        "csv_load_sec": csv_load_time,
+        "indicator_cache_build_sec": cache_build_time,
+        "indicator_cache_load_sec": cache_load_time,
+    }
+
+
+def benchmark_recorded_dataset(ticker: str, timeframe: str, row_max_bars: int = ROW_BACKTEST_MAX_BARS):
+    """저장소에 수집된 데이터로 읽기 시간과 백테스트 처리량 측정"""
+    load_time, df = _best_time(lambda: load_dataset(ticker, timeframe), repeat=1)
+    result = {"load_sec": load_time}
+    result.update(benchmark_backtesters(df, row_max_bars=row_max_bars))
+    result.update(benchmark_grid(df))
+    return result
+
+
+def _get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark_suite(
+    sizes=BENCHMARK_SIZES,
+    recorded_datasets=RECORDED_DATASETS,
+    row_max_bars: int = ROW_BACKTEST_MAX_BARS,
+    output_dir: str = BENCHMARK_RESULT_DIR,
+    seed: int = 0,
+):
+    """크기별 합성 데이터와 저장된 데이터로 전체 벤치마크를 돌리고 JSON으로 저장
+
+    합성 데이터는 synthetic_data로 만든 OHLCV에 collect_data와 같은 지표를 붙인 것이고,
+    같은 seed면 같은 데이터를 만들므로 커밋 사이 결과를 그대로 비교할 수 있다.
+    """
+    results = {
+        "commit": _get_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "seed": seed,
+        "synthetic": {},
+        "recorded": {},
+    }
+    for n_bars in sizes:
+        print(f"합성 데이터 {n_bars}봉 측정 중...")
+        with quiet():
+            df = get_indicator_frame(generate_ohlcv(n_bars, seed=seed)).set_index("timestamp")
+        results["synthetic"][str(n_bars)] = {
+            "date_filter": benchmark_date_filter(df, "2020-03-01", "2099-01-01", repeat=5),
+            "backtesters": benchmark_backtesters(df, row_max_bars=row_max_bars),
+            "grid": benchmark_grid(df),
+            "indicators": benchmark_indicators_and_loading(df),
+        }
+    for ticker, timeframe in recorded_datasets:
+        if not os.path.exists(f"backtesting/data/{ticker}_{timeframe}_with_indicators.csv"):
+            continue
+        print(f"저장된 데이터 {ticker}_{timeframe} 측정 중...")
+        results["recorded"][f"{ticker}_{timeframe}"] = benchmark_recorded_dataset(ticker, timeframe, row_max_bars)
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}_{results['commit'] or 'nocommit'}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"벤치마크 결과 저장: {path}")
+    return results, path
+
+
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare_benchmarks(old_path: str, new_path: str):
+    """두 벤치마크 JSON의 같은 항목을 비교해 (항목, 이전, 이후, 배율) 목록 반환
+
+    *_sec 는 작을수록, *_per_sec 는 클수록 좋다. 배율은 1보다 크면 빨라진 것.
+    """
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = _flatten(json.load(f))
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = _flatten(json.load(f))
+    rows = []
+    for name in old.keys() & new.keys():
+        if not name.endswith("_sec") or old[name] == 0 or new[name] == 0:
+            continue
+        if name.endswith("_per_sec"):
+            ratio = new[name] / old[name]
+        else:
+            ratio = old[name] / new[name]
+        rows.append((name, old[name], new[name], ratio))
+    return sorted(rows)
+
+
+if __name__ == "__main__":
+    results, path = run_benchmark_suite()
+    for n_bars, result in results["synthetic"].items():
+        backtesters = result["backtesters"]
+        print(
+            f"{int(n_bars):>9}봉 | backtest_fast {backtesters['backtest_fast_bars_per_sec']:>12,.0f}봉/초"
+            f" | backtest {backtesters['row_backtest_bars_per_sec']:>9,.0f}봉/초"
+            f" (로거 {backtesters['logger_overhead_ratio']:.2f}배)"
+            f" | 그리드 {result['grid']['strategies_per_sec']:6.1f}전략/초"
+            f" | 지표 {result['indicators']['add_indicators_sec']:6.2f}초"
+            f" | CSV 읽기 {result['indicators']['csv_load_sec']:6.2f}초"
+            f" | 지표 캐시 읽기 {result['indicators']['indicator_cache_load_sec'] * 1000:7.1f}ms"
+            f" | 기간 필터링 {result['date_filter']['speedup']:.0f}배"
+        )
@@ -1,16 +1,30 @@
-from datetime import datetime
-import math
+from datetime import datetime, timezone
 import os
 import pandas as pd
 import talib
-from utils.utils import get_end_time, get_int_for_interval
+from utils.interval_calendar import (
+    MAX_KLINES_LIMIT,
+    count_candles,
+    get_interval_ms,
+    get_last_close_ms,
+    get_next_open_time,
+    plan_pages,
+)
+from utils.utils import get_end_time
 import requests
 
-def get_save_btc_data(symbol: str, interval: str, limit: int, start_time: int):
-    end_time = get_end_time(start_time, interval, limit)
+def get_save_btc_data(symbol: str, interval: str, limit: int, start_time: int, end_time: int = None):
+    """[start_time, end_time] (밀리초) 봉을 받아 raw_data CSV에 이어 쓰고 저장한 행 수 반환
+
+    end_time이 없으면 start_time부터 limit개 봉 구간 (get_end_time)
+    """
+    if end_time is None:
+        end_time = get_end_time(start_time, interval, limit)
     url = f"https://api.binance.com/api/v3/klines?symbol={symbol}&interval={interval}&limit={limit}&startTime={start_time}&endTime={end_time}"
     response = requests.get(url)
     data = response.json()
+    if not isinstance(data, list):
+        raise RuntimeError(f"klines 요청 실패: {data}")
 
     print("================ 데이터 확인 ================")
     print("Total data length: ", len(data))
@@ -49,7 +63,38 @@ def get_save_btc_data(symbol: str, interval: str, limit: int, start_time: int):
     df.to_csv(filename, index=True, mode="a", header=not file_exists)
 
     print("================")
-    return
+    return len(df)
+
+
+def _get_last_saved_ms(filename: str):
+    """raw_data CSV 마지막 행의 timestamp (밀리초), 파일이 없거나 행이 없으면 None"""
+    if not os.path.isfile(filename):
+        return None
+    with open(filename, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        lines = f.read().decode("utf-8", errors="ignore").strip().splitlines()
+    last = lines[-1].split(",")[0] if lines else ""
+    if not last or last == "timestamp":
+        return None
+    return pd.Timestamp(last).value // 10**6
+
+
+def download_klines(symbol: str, interval: str, start_time: int, end_time: int, limit: int = MAX_KLINES_LIMIT):
+    """[start_time, end_time] (밀리초) 봉을 겹치지 않는 최소 횟수의 요청으로 받아 raw_data에 이어 씀
+
+    이미 받은 파일이 있으면 마지막 봉 다음부터 받으므로 다시 실행해도 중복 행이 생기지 않는다.
+    """
+    filename = f"backtesting/raw_data/{symbol}_{interval}.csv"
+    last_saved = _get_last_saved_ms(filename)
+    if last_saved is not None:
+        start_time = max(start_time, get_next_open_time(interval, last_saved))
+    pages = plan_pages(interval, start_time, end_time, limit)
+    print(f"=== {symbol}_{interval}: 봉 {count_candles(interval, start_time, end_time)}개, 요청 {len(pages)}회 ===")
+    saved = 0
+    for page_start, page_end in pages:
+        saved += get_save_btc_data(symbol, interval, limit, page_start, page_end)
+    return saved
 
 def add_indicators_df(filename: str):
     df = pd.read_csv(f"backtesting/raw_data/{filename}")
@@ -69,6 +114,12 @@ def add_indicators_df(filename: str):
     print(f"Close prices dtype: {close_prices.dtype}")
     print(f"Close prices에 NaN 개수: {close_prices.isna().sum()}")
     print("===================")
+    return add_indicators(df)
+
+
+def add_indicators(df: pd.DataFrame):
+    """OHLCV DataFrame(timestamp 컬럼 포함)에 지표/미분값을 추가하고 초기 NaN 구간을 제거"""
+    close_prices = df["close"]
 
     # MACD 계산
     macd, macd_signal, macd_hist = talib.MACD(
@@ -152,6 +203,39 @@ def add_indicators_df(filename: str):
         print("⚠️  경고: 모든 지표가 NaN입니다.")
         return df
 
+
+# backtesting/data/*_with_indicators.csv에 저장하는 컬럼 (순서 그대로)
+INDICATOR_FILE_COLUMNS = [
+    "timestamp",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "rsi",
+    "macd",
+    "macd_signal",
+    "macd_hist",
+    "bb_upper",
+    "bb_middle",
+    "bb_lower",
+    "sma_20",
+    "ema_20",
+    # 미분값들 추가
+    "macd_diff",
+    "macd_signal_diff",
+    "macd_hist_diff",
+    "rsi_diff",
+    "bb_upper_diff",
+    "bb_middle_diff",
+    "bb_lower_diff",
+    "sma_20_diff",
+    "ema_20_diff",
+    "close_diff",
+    "volume_diff",
+]
+
+
 def save_indicators_df(df: pd.DataFrame, filename: str):
     indicators = [
         "macd",
@@ -223,35 +307,7 @@ def save_indicators_df(df: pd.DataFrame, filename: str):
     output_filename = f'backtesting/data/{filename.split(".")[0]}_with_indicators.csv'
     print(f"\n=== CSV 저장 중... ===")
 
-    save_columns = [
-        "timestamp",
-        "open",
-        "high",
-        "low",
-        "close",
-        "volume",
-        "rsi",
-        "macd",
-        "macd_signal",
-        "macd_hist",
-        "bb_upper",
-        "bb_middle",
-        "bb_lower",
-        "sma_20",
-        "ema_20",
-        # 미분값들 추가
-        "macd_diff",
-        "macd_signal_diff",
-        "macd_hist_diff",
-        "rsi_diff",
-        "bb_upper_diff",
-        "bb_middle_diff",
-        "bb_lower_diff",
-        "sma_20_diff",
-        "ema_20_diff",
-        "close_diff",
-        "volume_diff",
-    ]
+    save_columns = INDICATOR_FILE_COLUMNS
 
     # CSV로 저장 (인덱스 제외)
     df[save_columns].to_csv(output_filename, index=False)
@@ -268,27 +324,98 @@ def save_indicators_df(df: pd.DataFrame, filename: str):
     print(df[save_columns].tail(10))
     return
 
+# 1분봉에서 만들어내는 상위 타임프레임
+RESAMPLE_INTERVALS = ["5m", "15m", "1h", "4h", "1d"]
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+def _interval_to_ns(interval: str) -> int:
+    return get_interval_ms(interval) * 10**6
+
+
+def _aggregate_ohlcv(df: pd.DataFrame, interval_ns: int) -> pd.DataFrame:
+    """1분봉을 UTC 기준 interval 구간으로 묶어 OHLCV 집계"""
+    bucket = df["ts"] - df["ts"] % interval_ns
+    return df.groupby(bucket, sort=True).agg(
+        open=("open", "first"),
+        high=("high", "max"),
+        low=("low", "min"),
+        close=("close", "last"),
+        volume=("volume", "sum"),
+    )
+
+
+def _write_ohlcv(df: pd.DataFrame, filename: str, header: bool):
+    out = df.copy()
+    out.index = pd.to_datetime(out.index, unit="ns")
+    out.index.name = "timestamp"
+    out.to_csv(filename, index=True, mode="w" if header else "a", header=header)
+
+
+def resample_from_1m(symbol: str, intervals: list = RESAMPLE_INTERVALS, chunksize: int = 500000):
+    """raw_data의 1분봉을 한 번 순회하면서 상위 타임프레임 원본 데이터를 모두 생성
+
+    각 타임프레임의 마지막(아직 덜 찬) 구간에 속한 1분봉은 다음 청크로 넘겨서 이어 붙인다.
+    중복되거나 시간이 거꾸로 된 1분봉은 버리고, 끝까지 다 차지 않은 마지막 구간은 저장하지 않는다.
+    """
+    source = f"backtesting/raw_data/{symbol}_1m.csv"
+    interval_ns = {interval: _interval_to_ns(interval) for interval in intervals}
+    carry = {interval: None for interval in intervals}
+    written = {interval: 0 for interval in intervals}
+    last_ts = None
+
+    print(f"=== {symbol} 1분봉 → {', '.join(intervals)} 리샘플링 ===")
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        chunk["ts"] = pd.to_datetime(chunk["timestamp"]).values.astype("datetime64[ns]").view("int64")
+        for col in OHLCV_COLUMNS:
+            chunk[col] = pd.to_numeric(chunk[col], errors="coerce")
+        chunk = chunk[["ts"] + OHLCV_COLUMNS].sort_values("ts", kind="stable")
+        chunk = chunk[~chunk["ts"].duplicated(keep="first")]
+        if last_ts is not None:
+            chunk = chunk[chunk["ts"] > last_ts]
+        if chunk.empty:
+            continue
+        last_ts = int(chunk["ts"].iloc[-1])
+
+        for interval, step in interval_ns.items():
+            rows = chunk if carry[interval] is None else pd.concat([carry[interval], chunk])
+            # 마지막 구간은 다음 청크에 이어질 수 있으므로 보류
+            last_bucket = last_ts - last_ts % step
+            carry[interval] = rows[rows["ts"] >= last_bucket]
+            done = rows[rows["ts"] < last_bucket]
+            if done.empty:
+                continue
+            bars = _aggregate_ohlcv(done, step)
+            _write_ohlcv(bars, f"backtesting/raw_data/{symbol}_{interval}.csv", header=written[interval] == 0)
+            written[interval] += len(bars)
+
+    for interval, step in interval_ns.items():
+        rows = carry[interval]
+        if rows is None or rows.empty:
+            continue
+        # 마지막 구간은 끝 1분봉까지 들어온 경우에만 저장 (진행 중인 캔들 제외)
+        last_bucket = last_ts - last_ts % step
+        if last_ts >= last_bucket + step - _interval_to_ns("1m"):
+            bars = _aggregate_ohlcv(rows, step)
+            _write_ohlcv(bars, f"backtesting/raw_data/{symbol}_{interval}.csv", header=written[interval] == 0)
+            written[interval] += len(bars)
+        print(f"{symbol}_{interval}: {written[interval]}개 봉 저장")
+    return written
+
+
 if __name__ == "__main__":
     symbols = ["BTCUSDT", "ETHUSDT"]
     intervals = ["1m", "5m", "15m", "1h", "4h", "1d"]
     for symbol in symbols:
-        for interval in intervals:
-            current_year = datetime.now().year
-            start_time = int(datetime(current_year - 4, 1, 1).timestamp() * 1000)
-            limit = 1000
-
-            now = datetime.now()
-            now_timestamp = int(now.timestamp() * 1000)
-
-            steps = math.floor(
-                (now_timestamp - start_time)
-                / 1000
-                / get_int_for_interval(interval)
-                / limit
-            )
-            for i in range(steps):
-                start_time = get_end_time(start_time, interval, limit)
-                get_save_btc_data(symbol, interval, limit, start_time)
+        # 1분봉만 내려받고 상위 타임프레임은 1분봉에서 만든다 (타임프레임 간 데이터 불일치 방지)
+        interval = "1m"
+        current_year = datetime.now().year
+        start_time = int(datetime(current_year - 4, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+        # 진행 중인 봉은 받지 않는다
+        end_time = get_last_close_ms(interval, datetime.now().timestamp() * 1000) - 1
+        download_klines(symbol, interval, start_time, end_time)
+
+        resample_from_1m(symbol, [i for i in intervals if i != "1m"])
 
     filenames = [
         f"{symbol}_{interval}.csv" for symbol in symbols for interval in intervals
@@ -0,0 +1,325 @@
+import dis
+import json
+import os
+import re
+import shutil
+import tempfile
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import talib
+
+from backtesting.signal_sweep import get_indicator_column
+from model.model import Signal
+
+INDICATOR_CACHE_DIR = "backtesting/cache/indicators"
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# 계산 방식이 바뀌면 올려서 기존 캐시를 무효화
+INDICATOR_CACHE_VERSION = 2
+
+
+def _macd(ohlcv):
+    macd, macd_signal, macd_hist = talib.MACD(ohlcv["close"], fastperiod=12, slowperiod=26, signalperiod=9)
+    return {"macd": macd, "macd_signal": macd_signal, "macd_hist": macd_hist}
+
+
+def _bbands(ohlcv):
+    upper, middle, lower = talib.BBANDS(ohlcv["close"], timeperiod=20, nbdevup=2, nbdevdn=2, matype=0)
+    return {"bb_upper": upper, "bb_middle": middle, "bb_lower": lower}
+
+
+def _stoch(ohlcv):
+    stoch_k, stoch_d = talib.STOCH(
+        ohlcv["high"],
+        ohlcv["low"],
+        ohlcv["close"],
+        fastk_period=14,
+        slowk_period=3,
+        slowk_matype=0,
+        slowd_period=3,
+        slowd_matype=0,
+    )
+    return {"stoch_k": stoch_k, "stoch_d": stoch_d}
+
+
+# 여러 컬럼을 한 번에 만드는 지표 (collect_data.add_indicators_df와 같은 파라미터)
+GROUPED_INDICATORS = {
+    "macd": _macd,
+    "macd_signal": _macd,
+    "macd_hist": _macd,
+    "bb_upper": _bbands,
+    "bb_middle": _bbands,
+    "bb_lower": _bbands,
+    "stoch_k": _stoch,
+    "stoch_d": _stoch,
+}
+
+# 기간을 받는 지표: "rsi" (기본 14), "rsi_21", "sma_50", "ema_20"
+PERIOD_INDICATORS = {
+    "rsi": talib.RSI,
+    "sma": talib.SMA,
+    "ema": talib.EMA,
+}
+DEFAULT_PERIODS = {"rsi": 14}
+_PERIOD_PATTERN = re.compile(r"(?P<name>[a-z]+)(?:_(?P<period>\d+))?")
+
+
+def get_column_builder(column: str):
+    """컬럼 이름으로 계산 함수 (ohlcv 배열 dict → {컬럼: 배열}) 반환, 모르는 컬럼이면 None"""
+    if column.endswith("_diff"):
+        base = column[: -len("_diff")]
+        if base not in OHLCV_COLUMNS and get_column_builder(base) is None:
+            return None
+        return lambda ohlcv, get: {column: np.r_[np.nan, np.diff(get(base))]}
+    if column in GROUPED_INDICATORS:
+        func = GROUPED_INDICATORS[column]
+        return lambda ohlcv, get: func(ohlcv)
+    m = _PERIOD_PATTERN.fullmatch(column)
+    if m is None or m["name"] not in PERIOD_INDICATORS:
+        return None
+    name = m["name"]
+    if m["period"] is None and name not in DEFAULT_PERIODS:
+        return None
+    period = int(m["period"]) if m["period"] else DEFAULT_PERIODS[name]
+    func = PERIOD_INDICATORS[name]
+    return lambda ohlcv, get: {column: func(ohlcv["close"], timeperiod=period)}
+
+
+def _get_code_strings(code) -> set:
+    """함수 바이트코드의 문자열 상수와 속성 이름 (중첩 함수 포함)"""
+    strings = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, str):
+            strings.add(const)
+        elif hasattr(const, "co_consts"):
+            strings |= _get_code_strings(const)
+    return strings
+
+
+def _get_subscript_keys(code, cells: dict) -> set:
+    """바이트코드에서 인덱싱 키로 쓰인 문자열 (data["rsi"], data[column], data[["a", "b"]])
+
+    cells는 클로저 변수 이름 → 값이다. 중첩 함수의 클로저 값은 알 수 없어 건너뛴다.
+    """
+    keys = set()
+    pending = []
+    for ins in dis.get_instructions(code):
+        if ins.opname == "LOAD_CONST" and isinstance(ins.argval, str):
+            pending.append(ins.argval)
+        elif ins.opname == "LOAD_CONST" and isinstance(ins.argval, tuple):
+            pending += [v for v in ins.argval if isinstance(v, str)]
+        elif ins.opname == "LOAD_DEREF" and isinstance(cells.get(ins.argval), str):
+            pending.append(cells[ins.argval])
+        elif ins.opname in ("BUILD_LIST", "LIST_EXTEND"):
+            continue
+        elif ins.opname == "BINARY_SUBSCR" or (ins.opname == "BINARY_OP" and "[]" in ins.argrepr):
+            keys.update(pending)
+            pending = []
+        else:
+            pending = []
+    for const in code.co_consts:
+        if hasattr(const, "co_consts"):
+            keys |= _get_subscript_keys(const, {})
+    return keys
+
+
+def _get_signal_funcs(signal: Signal) -> list:
+    funcs = [signal.buy_signal_func, signal.sell_signal_func]
+    return funcs + [f for f in (signal.short_signal_func, signal.cover_signal_func) if f is not None]
+
+
+def _is_known_column(name: str) -> bool:
+    return name in OHLCV_COLUMNS or get_column_builder(name) is not None
+
+
+def get_signal_columns(signal: Signal) -> Optional[set]:
+    """시그널 함수가 참조하는 컬럼 이름 (바이트코드 문자열 상수와 클로저 값으로 추정)
+
+    data["rsi"] < 15 같은 람다는 "rsi"가 상수로, 반복문에서 만든 람다는 클로저로 들어 있다.
+    인덱싱에 쓴 문자열 중 계산할 수 없는 컬럼(data["funding_rate"] 등)이 있거나
+    참조 컬럼을 하나도 찾지 못한 함수가 있으면 None (전체 컬럼을 읽어야 함).
+    """
+    columns = set()
+    for func in _get_signal_funcs(signal):
+        code = getattr(func, "__code__", None)
+        if code is None:
+            return None
+        cells = {}
+        for name, cell in zip(code.co_freevars, getattr(func, "__closure__", None) or ()):
+            try:
+                cells[name] = cell.cell_contents
+            except ValueError:
+                continue
+        keys = _get_subscript_keys(code, cells)
+        if not all(_is_known_column(key) for key in keys):
+            return None
+        names = keys | _get_code_strings(code) | {v for v in cells.values() if isinstance(v, str)}
+        found = {n for n in names if _is_known_column(n)}
+        if not found:
+            return None
+        columns |= found
+    return columns
+
+
+class IndicatorCache:
+    """지표 CSV(load_dataset과 같은 파일)의 컬럼을 필요할 때 읽거나 계산해 데이터 옆에 .npy로 보관
+
+    처음 요청된 컬럼은 한 번 지표 CSV에서 읽거나(저장된 컬럼) OHLCV로 계산한 뒤 저장하고,
+    이후 실행에서는 np.load(mmap_mode="r")로 메모리 매핑만 한다.
+    행과 저장된 지표 값이 load_dataset과 같고, CSV에 없는 지표(rsi_21 등)만 잘린 OHLCV로 계산한다.
+    원본 파일의 크기/수정 시각이 바뀌면 보관한 배열을 모두 지우고 다시 만든다.
+    """
+
+    def __init__(self, ticker: str, timeframe: str, cache_dir: str = INDICATOR_CACHE_DIR):
+        self.source = f"backtesting/data/{ticker}_{timeframe}_with_indicators.csv"
+        self.path = os.path.join(cache_dir, f"{ticker}_{timeframe}")
+        self.arrays = {}
+        self._prepare()
+
+    def _get_source_meta(self):
+        stat = os.stat(self.source)
+        return {
+            "version": INDICATOR_CACHE_VERSION,
+            "source": self.source,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    @staticmethod
+    def _read_meta(path: str):
+        try:
+            with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _prepare(self):
+        """원본 OHLCV 배열을 준비 (보관한 배열이 원본과 다르면 새로 만들어 통째로 교체)
+
+        포크 풀 워커들이 같은 캐시를 동시에 준비할 수 있으므로 임시 디렉터리에 만든 뒤 교체하고,
+        다른 프로세스가 쓰고 있을 수 있는 디렉터리 안에서는 지우거나 덮어쓰지 않는다.
+        """
+        meta = self._get_source_meta()
+        if self._read_meta(self.path) == meta:
+            return
+        parent = os.path.dirname(self.path)
+        os.makedirs(parent, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix=f"{os.path.basename(self.path)}.", suffix=".tmp", dir=parent)
+        try:
+            # 원본 행 중 정리(NaN/중복 제거, 정렬) 후 남는 위치를 rows로 보관해 원본 컬럼을 같은 순서로 읽는다
+            df = pd.read_csv(self.source, usecols=lambda c: c in ["timestamp"] + OHLCV_COLUMNS)
+            times = pd.to_datetime(df["timestamp"])
+            keep = np.flatnonzero(~times.isna().to_numpy() & ~times.duplicated(keep="first").to_numpy())
+            ns = times.to_numpy(dtype="datetime64[ns]").view("int64")[keep]
+            order = np.argsort(ns, kind="stable")
+            self._save("rows", keep[order], tmp_path)
+            self._save("timestamp", ns[order], tmp_path)
+            for column in OHLCV_COLUMNS:
+                values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+                self._save(column, values[keep[order]], tmp_path)
+            # meta.json은 마지막에 써서 meta가 있는 디렉터리는 항상 완성된 것으로 본다
+            with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            self._install(tmp_path, meta)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _install(self, tmp_path: str, meta: dict):
+        """새로 만든 디렉터리를 self.path로 교체 (그 사이 다른 프로세스가 먼저 교체했으면 그것을 씀)"""
+        stale = None
+        if os.path.exists(self.path):
+            if self._read_meta(self.path) == meta:
+                return
+            # 이전 캐시는 이름을 바꿔 치운 뒤 지운다 (열려 있는 메모리 매핑은 그대로 유효)
+            stale = f"{self.path}.{os.getpid()}.old"
+            try:
+                os.rename(self.path, stale)
+            except OSError:
+                stale = None
+        try:
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if self._read_meta(self.path) != meta:
+                raise
+        if stale is not None:
+            shutil.rmtree(stale, ignore_errors=True)
+
+    def _get_file(self, column: str, path: str = None):
+        return os.path.join(path or self.path, f"{column}.npy")
+
+    def _save(self, column: str, values: np.ndarray, path: str = None):
+        """임시 파일에 쓴 뒤 교체 (여러 프로세스가 같은 컬럼을 만들어도 깨지지 않게)"""
+        target = self._get_file(column, path)
+        tmp_path = f"{target}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, np.ascontiguousarray(values))
+        os.replace(tmp_path, target)
+
+    def has(self, column: str) -> bool:
+        return os.path.exists(self._get_file(column))
+
+    def get(self, column: str) -> np.ndarray:
+        """컬럼 배열 (메모리 매핑), 없으면 계산해서 저장"""
+        if column in self.arrays:
+            return self.arrays[column]
+        if not self.has(column):
+            self._build(column)
+        self.arrays[column] = np.load(self._get_file(column), mmap_mode="r")
+        return self.arrays[column]
+
+    def _build(self, column: str):
+        header = pd.read_csv(self.source, nrows=0).columns
+        if column in header:
+            values = pd.to_numeric(pd.read_csv(self.source, usecols=[column])[column], errors="coerce")
+            self._save(column, values.to_numpy(dtype=float)[self.get("rows")])
+            return
+        builder = get_column_builder(column)
+        if builder is None:
+            raise KeyError(f"계산할 수 없는 지표 컬럼: {column}")
+        ohlcv = {c: np.asarray(self.get(c)) for c in OHLCV_COLUMNS}
+        for name, values in builder(ohlcv, lambda c: np.asarray(self.get(c))).items():
+            self._save(name, values)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.get(column)
+
+    def rsi(self, period: int = 14) -> np.ndarray:
+        return self.get(get_indicator_column("rsi", period))
+
+    def get_frame(self, columns: Iterable[str] = ()) -> pd.DataFrame:
+        """OHLCV와 요청한 지표 컬럼만 담은 정리된 DataFrame (load_dataset과 같은 형태)"""
+        names = OHLCV_COLUMNS + [c for c in dict.fromkeys(columns) if c not in OHLCV_COLUMNS]
+        index = pd.DatetimeIndex(np.asarray(self.get("timestamp")).view("datetime64[ns]"), name="timestamp")
+        df = pd.DataFrame({c: np.asarray(self.get(c)) for c in names}, index=index)
+        df.attrs["normalized"] = True
+        return df
+
+
+def can_evaluate_signals(df: pd.DataFrame, strategies, rows: int = 100) -> bool:
+    """시그널 함수가 df 앞부분에서 컬럼 오류(KeyError/AttributeError) 없이 계산되는지
+
+    get_signal_columns는 추정이라 (data.get("x"), 다른 함수 안의 참조 등) 빠뜨린 컬럼이 있을 수 있어
+    지표 캐시로 읽은 프레임을 쓰기 전에 확인한다.
+    """
+    head = df.iloc[:rows]
+    for signal in {id(s.signal): s.signal for s in strategies}.values():
+        for func in _get_signal_funcs(signal):
+            try:
+                func(head)
+            except (KeyError, AttributeError):
+                return False
+            except Exception:
+                continue
+    return True
+
+
+def get_strategy_columns(strategies) -> Optional[List[str]]:
+    """전략들의 시그널이 참조하는 지표 컬럼 (하나라도 알 수 없으면 None)"""
+    columns = set()
+    for signal in {id(s.signal): s.signal for s in strategies}.values():
+        found = get_signal_columns(signal)
+        if found is None:
+            return None
+        columns |= found
+    return sorted(columns)
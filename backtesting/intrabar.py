@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from model.model import Position
+
+
+def to_ns(index) -> np.ndarray:
+    """DatetimeIndex를 int64 나노초 배열로 변환 (해상도와 무관하게)"""
+    return np.asarray(pd.DatetimeIndex(index).values.astype("datetime64[ns]").view("int64"))
+
+
+class IntrabarResolver:
+    """한 봉에서 TP와 SL이 모두 닿았을 때 1분봉으로 어느 쪽이 먼저인지 판정
+
+    1분봉 시각을 int64 배열로 들고 있다가 애매한 봉의 [시작, 끝) 범위만 searchsorted로 찾아
+    그 구간의 고가/저가만 확인한다. 애매하지 않은 봉은 비용이 들지 않는다.
+    같은 1분봉 안에서 둘 다 닿으면 순서를 알 수 없으므로 보수적으로 SL로 본다.
+    """
+
+    def __init__(self, df_1m: pd.DataFrame):
+        df_1m = df_1m[~pd.DatetimeIndex(pd.to_datetime(df_1m.index)).duplicated(keep="first")]
+        times = to_ns(pd.to_datetime(df_1m.index))
+        order = np.argsort(times, kind="stable")
+        self.times = times[order]
+        self.high = df_1m["high"].to_numpy(dtype=float)[order]
+        self.low = df_1m["low"].to_numpy(dtype=float)[order]
+        self.resolved = 0  # 1분봉으로 판정한 횟수
+        self.missing = 0  # 1분봉이 없어 기본 규칙(TP 우선)을 쓴 횟수
+
+    @classmethod
+    def load(cls, ticker: str):
+        """저장된 1분봉 데이터에서 시각/고가/저가만 읽어 생성"""
+        df = pd.read_csv(
+            f"backtesting/data/{ticker}_1m_with_indicators.csv",
+            usecols=["timestamp", "high", "low"],
+            index_col="timestamp",
+        )
+        return cls(df)
+
+    def get_fingerprint(self):
+        """결과 캐시 키에 넣을 1분봉 데이터 범위"""
+        if len(self.times) == 0:
+            return "intrabar:empty"
+        return f"intrabar:{len(self.times)}:{self.times[0]}:{self.times[-1]}"
+
+    def resolve(self, start_ns: int, end_ns: int, pos: Position):
+        """[start_ns, end_ns) 구간에서 먼저 닿은 쪽("tp"/"sl"), 판정 불가면 None"""
+        a = np.searchsorted(self.times, start_ns, side="left")
+        b = np.searchsorted(self.times, end_ns, side="left")
+        if a >= b:
+            self.missing += 1
+            return None
+        high = self.high[a:b]
+        low = self.low[a:b]
+        if pos.side == "long":
+            hit_sl = low <= pos.sl_price
+            hit_tp = high >= pos.tp_price
+        else:
+            hit_sl = high >= pos.sl_price
+            hit_tp = low <= pos.tp_price
+        hit = hit_sl | hit_tp
+        k = int(hit.argmax())
+        if not hit[k]:
+            # 1분봉 데이터가 상위 봉과 맞지 않는 경우
+            self.missing += 1
+            return None
+        self.resolved += 1
+        return "sl" if hit_sl[k] else "tp"
@@ -0,0 +1,252 @@
+import os
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from backtesting.backtesting_deep import backtest_fast, get_date_bounds, load_dataset, normalize_df
+from backtesting.synthetic_data import generate_ohlcv, get_indicator_frame
+from main import detect_data_and_trade, get_additional_data
+from model.model import TRADE_REASONS, FinancialState, Signal, Strategy, TradeLedger, TradeLog
+from trading.live_state import CANDLE_BUFFER_SIZE
+from trading.market import update_last_price
+from trading.mock_okx import MockOKXConfig, MockOKXExchange, offline_order_path
+from utils.utils import quiet
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# detect_data_and_trade 판단 결과 → 거래 기록의 청산 사유 (스톱 주문 체결은 sl)
+ACTION_REASONS = {"tp": "tp", "exit": "sell", "flip": "flip", "flip_unconfirmed": "flip"}
+
+
+def _get_fill_trades(fills, ct_val: float, leverage: float):
+    """체결 목록을 포지션 단위 거래 기록으로 묶음 (포지션이 0이 될 때 한 거래)
+
+    체결에는 리플레이가 붙인 봉 시각(time)과 그 봉의 판단 결과(action)가 있어야 한다.
+    """
+    trades = TradeLedger()
+    pos = 0.0
+    current = None
+    for fill in fills:
+        signed = fill["sz"] if fill["side"] == "buy" else -fill["sz"]
+        if current is None:
+            current = {
+                "side": "long" if signed > 0 else "short",
+                "entry_time": fill["time"],
+                "entry_price": fill["px"],
+                "entry_fee": fill["fee"],
+            }
+        elif (pos > 0) == (signed > 0):
+            # 같은 방향 추가 체결 (부분 체결 후 재주문): 평균 진입가 갱신
+            current["entry_price"] = (pos * current["entry_price"] + signed * fill["px"]) / (pos + signed)
+            current["entry_fee"] += fill["fee"]
+        pos += signed
+        if abs(pos) < 1e-12:
+            qty = abs(signed) * ct_val
+            direction = 1 if current["side"] == "long" else -1
+            realized = direction * (fill["px"] - current["entry_price"]) * qty
+            margin = current["entry_price"] * qty / leverage
+            reason = "sl" if fill["source"] == "stop" else ACTION_REASONS.get(fill["action"], "unknown")
+            trades.append(
+                TradeLog(
+                    side=current["side"],
+                    entry_time=current["entry_time"],
+                    entry_price=current["entry_price"],
+                    exit_time=fill["time"],
+                    exit_price=fill["px"],
+                    qty=qty,
+                    entry_fee=current["entry_fee"],
+                    exit_fee=fill["fee"],
+                    realized_pnl=realized - current["entry_fee"] - fill["fee"],
+                    roe=realized / margin if margin else 0.0,
+                    reason=reason,
+                )
+            )
+            current = None
+            pos = 0.0
+    return trades
+
+
+def compare_trades(replay_trades: TradeLedger, backtest_trades: TradeLedger, limit: int = 5):
+    """리플레이 거래와 backtest_fast 거래를 진입 시각/방향으로 맞춰 비교"""
+    backtest_keys = {
+        (int(t), int(s)): k for k, (t, s) in enumerate(zip(backtest_trades.entry_time, backtest_trades.side_codes))
+    }
+    matched = []
+    replay_only = []
+    for k, (t, s) in enumerate(zip(replay_trades.entry_time, replay_trades.side_codes)):
+        b = backtest_keys.pop((int(t), int(s)), None)
+        if b is None:
+            replay_only.append(k)
+        else:
+            matched.append((k, b))
+    backtest_only = sorted(backtest_keys.values())
+
+    r_idx = np.array([k for k, _ in matched], dtype=np.int64)
+    b_idx = np.array([b for _, b in matched], dtype=np.int64)
+    same_exit = replay_trades.exit_time[r_idx] == backtest_trades.exit_time[b_idx]
+    exit_diff = np.abs(replay_trades.exit_price[r_idx] / backtest_trades.exit_price[b_idx] - 1) * 100
+    reason_pairs = Counter(
+        f"{TRADE_REASONS[backtest_trades.reason_codes[b]]}→{TRADE_REASONS[replay_trades.reason_codes[k]]}"
+        for k, b in matched
+        if backtest_trades.reason_codes[b] != replay_trades.reason_codes[k]
+    )
+
+    def get_times(trades, indices):
+        return [str(pd.Timestamp(int(trades.entry_time[k]))) for k in indices[:limit]]
+
+    return {
+        "replay_trades": len(replay_trades),
+        "backtest_trades": len(backtest_trades),
+        "matched_entries": len(matched),
+        "entry_match_rate": len(matched) / max(len(replay_trades), len(backtest_trades), 1),
+        "same_exit_time": int(same_exit.sum()),
+        "exit_price_diff_pct": float(exit_diff.mean()) if len(matched) else 0.0,
+        "reason_mismatches": dict(reason_pairs),
+        "replay_only": get_times(replay_trades, replay_only),
+        "backtest_only": get_times(backtest_trades, backtest_only),
+        "replay_win_rate": replay_trades.win_rate(),
+        "backtest_win_rate": backtest_trades.win_rate(),
+    }
+
+
+def replay_live_strategy(
+    strategy: Strategy,
+    df: pd.DataFrame = None,
+    live_window: int = None,
+    exchange_config: MockOKXConfig = None,
+    compare: bool = True,
+):
+    """저장된 봉을 실거래 판단 경로(detect_data_and_trade)에 차례로 넣어 대역 거래소에서 최대 속도로 재생
+
+    봉 i의 시가 시점에 직전 봉(i-1)까지의 데이터로 판단하고 주문한 뒤, 봉 i의 가격 경로를 흘려 스톱 주문을 처리한다.
+    live_window가 없으면 미리 계산된 지표 데이터의 직전 봉을 그대로 쓰고 (backtest_fast와 같은 지표),
+    live_window를 주면 실거래처럼 직전 live_window개 봉으로 get_additional_data를 매번 다시 계산한다
+    (실거래는 CANDLE_BUFFER_SIZE개 봉 버퍼). 기간 앞의 봉도 창에 넣으므로 판단은 기간 첫 봉부터 한다.
+    compare면 같은 기간을 backtest_fast로 돌려 거래를 비교한다.
+    """
+    if df is None:
+        df = load_dataset(strategy.ticker, strategy.timeframe)
+    df = normalize_df(df)
+    a, b = get_date_bounds(df, strategy.start_date, strategy.end_date)
+    # 기간 시작 전 live_window개 봉까지 지표 계산 창으로 쓴다 (offset = 창 앞에 붙은 봉 수)
+    offset = min(a, live_window or 0)
+    ohlcv = df[OHLCV_COLUMNS].iloc[a - offset : b] if live_window else None
+    df = df.iloc[a:b]
+    instId = strategy.get_instId()
+    config = exchange_config or MockOKXConfig(taker_fee=strategy.taker_fee)
+
+    open_ = df["open"].to_numpy(dtype=float)
+    high = df["high"].to_numpy(dtype=float)
+    low = df["low"].to_numpy(dtype=float)
+    close = df["close"].to_numpy(dtype=float)
+    seconds = df.index.asi8 / 1e9
+
+    cursor = [0]
+    exchange = MockOKXExchange(config, prices={instId: float(open_[0])}, clock=lambda: seconds[cursor[0]])
+    actions = Counter()
+    seen = 0
+    start_time = time.perf_counter()
+    with offline_order_path(exchange):
+        for i in range(max(1, (live_window or 0) - offset), len(df)):
+            cursor[0] = i
+            exchange.set_price(instId, open_[i])
+            # 시세 수신으로 현재가를 알고 있는 상태 (진입 때 티커 조회 없이 캐시 사용)
+            update_last_price(instId, open_[i])
+            if live_window:
+                window = get_additional_data(ohlcv.iloc[offset + i - live_window : offset + i].copy())
+            else:
+                window = df.iloc[i - 1 : i]
+            action = detect_data_and_trade(strategy, window)
+            actions[action or "none"] += 1
+            exchange.replay_bar(instId, open_[i], high[i], low[i], close[i])
+            for fill in exchange.fills[seen:]:
+                fill["time"] = df.index[i]
+                fill["action"] = action
+            seen = len(exchange.fills)
+    elapsed = time.perf_counter() - start_time
+
+    decisions = sum(actions.values())
+    trades = _get_fill_trades(exchange.fills, exchange._ct_val(instId), strategy.leverage)
+    result = {
+        "strategy": strategy.signal.description,
+        "bars": len(df),
+        "decisions": decisions,
+        "elapsed_sec": elapsed,
+        "decisions_per_sec": decisions / elapsed if elapsed > 0 else float("inf"),
+        "actions": dict(actions),
+        "api_calls": sum(exchange.calls.values()),
+        "trades": trades,
+        "initial_balance": config.initial_balance,
+        "final_equity": exchange.get_equity(),
+        "open_position": instId in exchange.positions,
+    }
+    if compare:
+        state = FinancialState(config.initial_balance)
+        start_time = time.perf_counter()
+        with quiet():
+            _, backtest_trades = backtest_fast(df, strategy, state)
+        result["backtest_sec"] = time.perf_counter() - start_time
+        result["backtest_balance"] = state.balance
+        result["backtest_trades"] = backtest_trades
+        result["comparison"] = compare_trades(trades, backtest_trades)
+    return result
+
+
+def format_replay_result(result) -> str:
+    lines = [
+        f"=== 실거래 경로 리플레이: {result['strategy']} ===",
+        f"봉 {result['bars']}개, 판단 {result['decisions']}회, {result['elapsed_sec']:.2f}초"
+        f" ({result['decisions_per_sec']:.0f}회/초), API 호출 {result['api_calls']}회",
+        f"판단 결과: {result['actions']}",
+        f"리플레이: 거래 {len(result['trades'])}회, 잔고 {result['initial_balance']:.2f} → {result['final_equity']:.2f}"
+        + (" (포지션 보유 중)" if result["open_position"] else ""),
+    ]
+    if "comparison" in result:
+        c = result["comparison"]
+        lines += [
+            f"backtest_fast: 거래 {c['backtest_trades']}회, 잔고 {result['initial_balance']:.2f} → {result['backtest_balance']:.2f}"
+            f" ({result['backtest_sec'] * 1000:.1f}ms)",
+            f"진입 일치 {c['matched_entries']}회 ({c['entry_match_rate'] * 100:.1f}%), 청산 시각 일치 {c['same_exit_time']}회,"
+            f" 청산가 차이 평균 {c['exit_price_diff_pct']:.3f}%",
+            f"승률: 리플레이 {c['replay_win_rate']:.1f}% / backtest_fast {c['backtest_win_rate']:.1f}%",
+        ]
+        if c["reason_mismatches"]:
+            lines.append(f"청산 사유 차이 (backtest→리플레이): {c['reason_mismatches']}")
+        if c["replay_only"] or c["backtest_only"]:
+            lines.append(f"리플레이에만 있는 진입: {c['replay_only']}")
+            lines.append(f"backtest_fast에만 있는 진입: {c['backtest_only']}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    signal = Signal(
+        buy_signal_func=lambda data: data["rsi"] < 30,
+        sell_signal_func=lambda data: data["rsi"] > 70,
+        description="buy_rsi_below_30_sell_rsi_above_70",
+    )
+    strategy = Strategy(
+        ticker="BTCUSDT",
+        timeframe="4h",
+        leverage=5,
+        maker_fee=0.0002,
+        taker_fee=0.0005,
+        tp_ratio=0.5,
+        sl_ratio=0.25,
+        input_amount_ratio=0.5,
+        signal=signal,
+        start_date="2023-01-01",
+        end_date="2023-12-31",
+    )
+
+    if os.path.exists(f"backtesting/data/{strategy.ticker}_{strategy.timeframe}_with_indicators.csv"):
+        df = load_dataset(strategy.ticker, strategy.timeframe)
+    else:
+        # 수집된 데이터가 없으면 같은 기간의 합성 4시간봉 (지표 준비 구간과 봉 버퍼만큼의 앞 구간 포함)
+        print("수집된 데이터가 없어 합성 데이터로 리플레이합니다")
+        df = get_indicator_frame(generate_ohlcv(6 * 365 + 420, "4h", start="2022-10-25", seed=0))
+        df = normalize_df(df.set_index("timestamp"))
+
+    print(format_replay_result(replay_live_strategy(strategy, df)))
+    print(format_replay_result(replay_live_strategy(strategy, df, live_window=CANDLE_BUFFER_SIZE)))
@@ -0,0 +1,406 @@
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import product
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backtesting.backtesting_deep import (
+    backtest_kelly_with_masks,
+    get_date_bounds,
+    get_direction_masks,
+    get_short_signal_masks,
+    load_dataset,
+    normalize_df,
+)
+from backtesting.robust_testing import get_fork_pool
+from backtesting.signal_sweep import IndicatorStore, ThresholdSignalFamily
+from model.model import FinancialState, Signal, Strategy
+
+INITIAL_BALANCE = 1000000
+
+# fork로 만든 워커가 그대로 물려받는 공유 데이터 (시그널 람다는 pickle이 안 되므로)
+_SHARED = {}
+
+
+@dataclass
+class Trial:
+    params: dict
+    fraction: float  # 평가에 쓴 기간 비율 (기간 끝에서부터)
+    roi: float
+    trades: int
+    input_amount_ratio: float
+
+
+@dataclass
+class SearchResult:
+    method: str
+    # 전체 기간으로 평가한 조합 (ROI 내림차순)
+    ranking: List[Trial]
+    evaluations: int
+    # 전체 그리드를 전체 기간으로 평가할 때 대비 계산한 봉 수 비율
+    cost: float
+    elapsed: float
+    trials: List[Trial] = field(default_factory=list)
+
+    def get_top(self, k: int = 10):
+        return self.ranking[:k]
+
+
+def get_param_grid(**axes) -> List[Dict]:
+    """축별 후보 값의 전체 조합 (예: timeframe=[...], leverage=[...])"""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in product(*axes.values())]
+
+
+def get_configs(family: Optional[ThresholdSignalFamily] = None, **axes) -> List[Dict]:
+    """파라미터 축 조합에 시그널 파라미터 조합을 곱한 전체 조합"""
+    configs = get_param_grid(**axes)
+    if family is None:
+        return configs
+    return [{**signal_params, **c} for signal_params in family.get_param_grid() for c in configs]
+
+
+def _get_param_key(params: dict):
+    return tuple(sorted(params.items()))
+
+
+def get_top_recall(result: SearchResult, exhaustive: SearchResult, k: int = 10) -> float:
+    """전체 그리드 상위 k개 중 탐색 결과 상위 k개에 들어간 비율"""
+    found = {_get_param_key(t.params) for t in result.get_top(k)}
+    expected = {_get_param_key(t.params) for t in exhaustive.get_top(k)}
+    return len(found & expected) / max(1, len(expected))
+
+
+def _get_window(n: int, fraction: float):
+    """기간 끝에서부터 fraction 비율만큼의 봉 범위 시작 위치"""
+    return n - min(n, max(2, math.ceil(n * fraction)))
+
+
+def _evaluate_config(task):
+    """조합 하나를 기간 끝 fraction 구간에서 Kelly 2단계로 평가"""
+    i, fraction = task
+    params = dict(_SHARED["configs"][i])
+    timeframe = params.get("timeframe", _SHARED["strategy"].timeframe)
+    df, buy_mask, sell_mask, short_mask, cover_mask = _SHARED["frames"][timeframe]
+    family = _SHARED["family"]
+    if family is not None:
+        # 시그널 파라미터는 캐시된 지표 배열의 비교로 마스크를 만든다 (숏 시그널은 전략의 것을 그대로)
+        signal_params = {name: params.pop(name) for name in family.PARAM_NAMES}
+        values = _SHARED["indicators"][timeframe][signal_params["period"]]
+        buy_mask, sell_mask = family.get_masks(values, signal_params)
+        base = _SHARED["strategy"].signal
+        params["signal"] = family.make_signal(signal_params).model_copy(
+            update={"short_signal_func": base.short_signal_func, "cover_signal_func": base.cover_signal_func}
+        )
+    a = _get_window(len(df), fraction)
+    strat = _SHARED["strategy"].model_copy(update=params)
+    state = FinancialState(initial_balance=INITIAL_BALANCE)
+    final_state, trades = backtest_kelly_with_masks(
+        df.iloc[a:],
+        buy_mask[a:],
+        sell_mask[a:],
+        strat,
+        state,
+        side=_SHARED["side"],
+        short_mask=None if short_mask is None else short_mask[a:],
+        cover_mask=None if cover_mask is None else cover_mask[a:],
+    )
+    return i, fraction, final_state.get_roi(), len(trades), strat.input_amount_ratio
+
+
+class GridEvaluator:
+    """파라미터 조합을 프로세스 풀로 평가하고 (조합, 기간 비율)별 결과를 기억
+
+    타임프레임별 데이터와 시그널 마스크는 한 번만 만들고, 기간 비율은 끝에서부터 잘라 쓴다.
+    family가 있으면 조합에 시그널 파라미터(period, buy_below, sell_above)가 들어가고,
+    지표는 타임프레임/기간별로 한 번만 계산해 두고 마스크는 조합마다 비교로 만든다.
+    with 블록 안에서 풀을 한 번 만들어 여러 단계의 평가에 재사용한다.
+    """
+
+    def __init__(
+        self,
+        strategy: Strategy,
+        configs: List[Dict],
+        df_by_timeframe: Optional[Dict] = None,
+        side=None,
+        max_workers: Optional[int] = None,
+        family: Optional[ThresholdSignalFamily] = None,
+    ):
+        self.strategy = strategy
+        self.configs = configs
+        self.side = side
+        self.max_workers = max_workers
+        self.family = family
+        self.frames = {}
+        self.indicators = {}
+        for timeframe in sorted({c.get("timeframe", strategy.timeframe) for c in configs}):
+            if df_by_timeframe is not None and timeframe in df_by_timeframe:
+                df = normalize_df(df_by_timeframe[timeframe])
+            else:
+                df = load_dataset(strategy.ticker, timeframe)
+            a, b = get_date_bounds(df, strategy.start_date, strategy.end_date)
+            if family is None:
+                self.frames[timeframe] = (df.iloc[a:b], *get_direction_masks(df.iloc[a:b], strategy, side))
+                continue
+            # 지표는 전체 데이터로 계산한 뒤 기간만큼 잘라 쓴다
+            store = family.precompute(IndicatorStore(df))
+            short_masks = (None, None)
+            if side is None and strategy.direction != "long":
+                short_masks = get_short_signal_masks(df.iloc[a:b], strategy.signal)
+            self.frames[timeframe] = (df.iloc[a:b], None, None, *short_masks)
+            self.indicators[timeframe] = {
+                period: store.get(family.indicator, period)[a:b] for period in family.periods
+            }
+        self.results = {}
+        self.bars = 0
+        self.pool = None
+
+    def __enter__(self):
+        _SHARED.update(
+            configs=self.configs,
+            frames=self.frames,
+            strategy=self.strategy,
+            side=self.side,
+            family=self.family,
+            indicators=self.indicators,
+        )
+        self.pool = get_fork_pool(self.max_workers)
+        return self
+
+    def __exit__(self, *exc):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        _SHARED.clear()
+
+    def get_bars(self, i: int) -> int:
+        return len(self.frames[self.configs[i].get("timeframe", self.strategy.timeframe)][0])
+
+    def get_full_cost(self) -> int:
+        """전체 그리드를 전체 기간으로 평가할 때의 봉 수"""
+        return sum(self.get_bars(i) for i in range(len(self.configs)))
+
+    def evaluate(self, indices, fraction: float = 1.0) -> List[Trial]:
+        tasks = [(i, fraction) for i in indices if (i, fraction) not in self.results]
+        if self.pool is None or len(tasks) < 2:
+            evaluated = map(_evaluate_config, tasks)
+        else:
+            chunksize = max(1, len(tasks) // ((self.max_workers or os.cpu_count()) * 8))
+            evaluated = self.pool.map(_evaluate_config, tasks, chunksize=chunksize)
+        for i, frac, roi, trade_count, ratio in evaluated:
+            n = self.get_bars(i)
+            self.bars += n - _get_window(n, frac)
+            self.results[(i, frac)] = Trial(
+                params=self.configs[i],
+                fraction=frac,
+                roi=roi,
+                trades=trade_count,
+                input_amount_ratio=ratio,
+            )
+        return [self.results[(i, fraction)] for i in indices]
+
+    def get_result(self, method: str, start_time: float) -> SearchResult:
+        trials = list(self.results.values())
+        ranking = sorted((t for t in trials if t.fraction == 1.0), key=lambda t: t.roi, reverse=True)
+        return SearchResult(
+            method=method,
+            ranking=ranking,
+            evaluations=len(trials),
+            cost=self.bars / max(1, self.get_full_cost()),
+            elapsed=time.time() - start_time,
+            trials=trials,
+        )
+
+
+def exhaustive_search(evaluator: GridEvaluator) -> SearchResult:
+    """전체 그리드를 전체 기간으로 평가 (비교 기준)"""
+    start_time = time.time()
+    evaluator.evaluate(range(len(evaluator.configs)))
+    return evaluator.get_result("grid", start_time)
+
+
+def successive_halving(
+    evaluator: GridEvaluator,
+    min_fraction: float = 1 / 27,
+    eta: int = 3,
+    min_survivors: int = 10,
+) -> SearchResult:
+    """짧은 기간에서 많은 조합을 평가하고 상위 1/eta만 더 긴 기간으로 올리는 successive halving
+
+    기간 비율은 min_fraction에서 eta배씩 늘어 마지막 단계는 전체 기간이다.
+    각 단계의 기간은 전체 기간의 끝부분이므로 마지막 단계 결과는 전체 그리드 평가와 같다.
+    """
+    start_time = time.time()
+    rungs = max(0, math.ceil(math.log(1 / min_fraction, eta) - 1e-9))
+    survivors = list(range(len(evaluator.configs)))
+    for r in range(rungs, -1, -1):
+        fraction = 1.0 if r == 0 else eta ** -r
+        trials = evaluator.evaluate(survivors, fraction)
+        print(f"  기간 {fraction * 100:.1f}%: {len(survivors)}개 조합 평가")
+        if r == 0:
+            break
+        keep = max(min_survivors, math.ceil(len(survivors) / eta))
+        order = np.argsort([-t.roi for t in trials], kind="stable")[:keep]
+        survivors = [survivors[k] for k in order]
+    return evaluator.get_result("halving", start_time)
+
+
+class GaussianProcessSurrogate:
+    """RBF 커널 가우시안 프로세스 (파라미터는 축별 순위로 0~1 정규화)
+
+    fit(X, y) / predict(X) -> (평균, 표준편차)만 있으면 다른 대리 모델로 바꿀 수 있다.
+    """
+
+    def __init__(self, length_scale: float = 0.2, noise: float = 1e-3):
+        self.length_scale = length_scale
+        self.noise = noise
+
+    def _kernel(self, a, b):
+        d = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=-1)
+        return np.exp(-0.5 * d / self.length_scale**2)
+
+    def fit(self, X, y):
+        self.X = X
+        self.y_mean = y.mean()
+        self.y_std = y.std() or 1.0
+        k = self._kernel(X, X) + self.noise * np.eye(len(X))
+        self.chol = np.linalg.cholesky(k)
+        self.alpha = np.linalg.solve(self.chol.T, np.linalg.solve(self.chol, (y - self.y_mean) / self.y_std))
+        return self
+
+    def predict(self, X):
+        k = self._kernel(X, self.X)
+        mean = k @ self.alpha
+        v = np.linalg.solve(self.chol, k.T)
+        var = np.clip(1.0 - (v**2).sum(axis=0), 1e-12, None)
+        return mean * self.y_std + self.y_mean, np.sqrt(var) * self.y_std
+
+
+def encode_configs(configs: List[Dict]) -> np.ndarray:
+    """축별 후보 값의 순위를 0~1로 바꾼 행렬 (타임프레임처럼 문자열인 축도 처리)"""
+    names = list(configs[0])
+    columns = []
+    for name in names:
+        values = sorted({c[name] for c in configs}, key=lambda v: (isinstance(v, str), v))
+        rank = {v: k / max(1, len(values) - 1) for k, v in enumerate(values)}
+        columns.append([rank[c[name]] for c in configs])
+    return np.array(columns, dtype=float).T
+
+
+def surrogate_search(
+    evaluator: GridEvaluator,
+    surrogate=None,
+    n_initial: int = 64,
+    n_iter: int = 20,
+    batch_size: int = 16,
+    kappa: float = 2.0,
+    fraction: float = 1.0,
+    seed: Optional[int] = None,
+) -> SearchResult:
+    """대리 모델로 ROI를 예측해 유망한 조합만 평가하는 탐색
+
+    무작위 n_initial개로 시작해 매 반복마다 평균 + kappa x 표준편차(UCB)가 큰 조합을
+    batch_size개씩 골라 프로세스 풀로 한 번에 평가한다.
+    """
+    start_time = time.time()
+    surrogate = surrogate or GaussianProcessSurrogate()
+    rng = np.random.default_rng(seed)
+    X = encode_configs(evaluator.configs)
+    n = len(evaluator.configs)
+
+    evaluated = list(rng.choice(n, size=min(n_initial, n), replace=False))
+    rois = [t.roi for t in evaluator.evaluate(evaluated, fraction)]
+    for _ in range(n_iter):
+        remaining = np.setdiff1d(np.arange(n), evaluated)
+        if len(remaining) == 0:
+            break
+        surrogate.fit(X[evaluated], np.array(rois, dtype=float))
+        mean, std = surrogate.predict(X[remaining])
+        picks = remaining[np.argsort(-(mean + kappa * std), kind="stable")[:batch_size]]
+        rois.extend(t.roi for t in evaluator.evaluate(list(picks), fraction))
+        evaluated.extend(picks.tolist())
+    return evaluator.get_result("surrogate", start_time)
+
+
+def optimize(
+    strategy: Strategy,
+    method: str = "halving",
+    df_by_timeframe: Optional[Dict] = None,
+    side=None,
+    max_workers: Optional[int] = None,
+    family: Optional[ThresholdSignalFamily] = None,
+    **axes,
+):
+    """전략의 파라미터 축(timeframe, leverage, tp_ratio, sl_ratio 등)을 탐색
+
+    method: "grid" (전체 그리드), "halving" (successive halving), "surrogate" (대리 모델 탐색)
+    family를 주면 시그널 파라미터 조합도 함께 탐색한다.
+    side가 없으면 strategy.direction을 따른다 (숏/양방향이면 숏 마스크도 사용).
+    """
+    configs = get_configs(family, **axes)
+    with GridEvaluator(strategy, configs, df_by_timeframe, side, max_workers, family) as evaluator:
+        if method == "grid":
+            return exhaustive_search(evaluator)
+        if method == "halving":
+            return successive_halving(evaluator)
+        if method == "surrogate":
+            return surrogate_search(evaluator)
+    raise ValueError(f"Invalid method: {method}")
+
+
+if __name__ == "__main__":
+    signal = Signal(
+        buy_signal_func=lambda data: data["rsi"] < 15,
+        sell_signal_func=lambda data: data["rsi"] > 85,
+        description="buy_rsi_below_15_sell_rsi_above_85",
+    )
+    strategy = Strategy(
+        ticker="BTCUSDT",
+        timeframe="15m",
+        leverage=10,
+        maker_fee=0.0002,
+        taker_fee=0.0005,
+        tp_ratio=1.0,
+        sl_ratio=0.1,
+        input_amount_ratio=0.1,
+        entry_role="taker",
+        exit_role="taker",
+        signal=signal,
+        start_date="2022-01-01",
+        end_date=datetime.now().strftime("%Y-%m-%d"),
+    )
+    axes = dict(
+        timeframe=["5m", "15m", "1h", "4h", "1d"],
+        leverage=[2, 4, 6, 8, 10, 20, 30, 50, 100],
+        tp_ratio=[0.05, 0.1, 0.2, 0.4, 0.5, 0.8, 0.9, 1.0, 1.2, 1.4, 1.6, 1.8, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0],
+        sl_ratio=[0.05, 0.1, 0.2, 0.5],
+    )
+
+    configs = get_param_grid(**axes)
+    with GridEvaluator(strategy, configs) as evaluator:
+        exhaustive = exhaustive_search(evaluator)
+    print(f"전체 그리드: {exhaustive.evaluations}회, {exhaustive.elapsed:.1f}초")
+
+    for method in ["halving", "surrogate"]:
+        result = optimize(strategy, method=method, **axes)
+        print(
+            f"{method}: {result.evaluations}회 평가, 계산량 {result.cost * 100:.1f}%, "
+            f"{result.elapsed:.1f}초, 상위 10개 재현율 {get_top_recall(result, exhaustive) * 100:.0f}%"
+        )
+        for i, trial in enumerate(result.get_top(5), 1):
+            print(f"  {i}. {trial.params}: ROI {trial.roi:.2f}%")
+
+    # RSI 기간/임계값도 함께 탐색 (지표는 기간별로 한 번만 계산)
+    family = ThresholdSignalFamily(
+        periods=[7, 14, 21],
+        buy_below=[10, 15, 20, 25, 30],
+        sell_above=[70, 75, 80, 85, 90],
+    )
+    result = optimize(strategy, method="halving", family=family, **axes)
+    print(f"시그널 포함 탐색: {result.evaluations}회 평가, 계산량 {result.cost * 100:.1f}%")
+    for i, trial in enumerate(result.get_top(5), 1):
+        print(f"  {i}. {trial.params}: ROI {trial.roi:.2f}%")
@@ -0,0 +1,231 @@
+import heapq
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtesting.backtesting_deep import (
+    close_position,
+    filter_df_by_date,
+    get_short_signal_masks,
+    get_signal_masks,
+    load_strategy_dataset,
+    open_position,
+)
+from backtesting.intrabar import to_ns
+from model.model import FinancialState, Position, Side, Signal, Strategy, TradeLedger
+
+# 같은 시각이면 앞 봉의 마감(TP/SL 청산)을 다음 봉의 시작(진입/매도 청산)보다 먼저 처리
+_BAR_CLOSE = 0
+_BAR_OPEN = 1
+
+
+class PortfolioLeg:
+    """포트폴리오 안의 전략 하나 (티커, 타임프레임, 시그널): 가격/시그널 배열과 현재 포지션"""
+
+    def __init__(self, strategy: Strategy, df: pd.DataFrame, side: Side = None):
+        self.strategy = strategy
+        self.name = f"{strategy.ticker}_{strategy.timeframe}_{strategy.signal.description}"
+        # side를 주면 그 방향으로 매수/매도 시그널을 쓰고, 없으면 전략 방향 (숏이면 숏 진입/청산 시그널)
+        if side is None and strategy.direction not in ("long", "short"):
+            raise ValueError(f"포트폴리오 백테스트는 {strategy.direction} 전략을 지원하지 않습니다 (long/short만)")
+        self.side = side or strategy.direction
+        self.index = df.index
+        self.times = to_ns(df.index)
+        self.open = df["open"].to_numpy(dtype=float)
+        self.high = df["high"].to_numpy(dtype=float)
+        self.low = df["low"].to_numpy(dtype=float)
+        self.close = df["close"].to_numpy(dtype=float)
+        if side is None and strategy.direction == "short":
+            self.buy_mask, self.sell_mask = get_short_signal_masks(df, strategy.signal)
+        else:
+            self.buy_mask, self.sell_mask = get_signal_masks(df, strategy.signal)
+        self.bar_ns = int(np.median(np.diff(self.times[:1000]))) if len(df) > 1 else 0
+        self.position: Optional[Position] = None
+        self.pending_exit: Optional[str] = None  # 봉 마감에 처리할 TP/SL 청산
+        self.last_close = None
+        self.trades = TradeLedger()
+        self.skipped = 0  # 증거금 부족으로 건너뛴 진입
+
+    def iter_events(self, leg_id: int):
+        """(시각, 단계, 레그, 봉 위치) 를 시간순으로 생성 (봉마다 시작/마감 두 번)"""
+        for i, t in enumerate(self.times.tolist()):
+            yield t, _BAR_OPEN, leg_id, i
+            yield t + self.bar_ns, _BAR_CLOSE, leg_id, i
+
+    def get_hit(self, i: int):
+        """i번째 봉에서 TP/SL에 닿았으면 사유 (둘 다 닿으면 TP, backtest_fast와 같은 규칙)"""
+        pos = self.position
+        if pos.side == "long":
+            hit_tp = self.high[i] >= pos.tp_price
+            hit_sl = self.low[i] <= pos.sl_price
+        else:
+            hit_tp = self.low[i] <= pos.tp_price
+            hit_sl = self.high[i] >= pos.sl_price
+        if hit_tp:
+            return "tp"
+        if hit_sl:
+            return "sl"
+        return None
+
+    def get_unrealized_pnl(self):
+        if self.position is None or self.last_close is None:
+            return 0.0
+        return self.position.unrealized_pnl(self.last_close)
+
+    def get_margin(self):
+        if self.position is None:
+            return 0.0
+        return self.position.notional / self.position.leverage
+
+
+@dataclass
+class PortfolioResult:
+    state: FinancialState
+    trades: Dict[str, TradeLedger] = field(default_factory=dict)
+    skipped: Dict[str, int] = field(default_factory=dict)
+
+    def get_stats(self):
+        return {name: ledger.get_stats() for name, ledger in self.trades.items()}
+
+
+class PortfolioBacktester:
+    """여러 (티커, 타임프레임)을 하나의 FinancialState(공유 증거금)로 함께 돌리는 백테스트
+
+    레그마다 정렬된 봉 시각 배열을 heapq.merge로 k-way 병합해 시간순으로 처리하므로
+    데이터를 합친 DataFrame을 만들지 않고 메모리는 전체 봉 수에 비례한다.
+    레그별 규칙은 backtest_fast와 같다 (이전 봉 매수 시그널 → 이번 봉 시가 진입,
+    TP/SL 우선, 없으면 이번 봉 매도 시그널로 시가 청산). TP/SL 청산은 봉 마감 시각에 반영한다.
+    진입 금액은 공유 에쿼티(잔고 + 열린 포지션의 미실현 손익) 기준이고,
+    필요한 증거금이 남은 증거금보다 크면 진입하지 않는다.
+    """
+
+    def __init__(self, legs: List[PortfolioLeg], state: FinancialState):
+        self.legs = legs
+        self.state = state
+        # 결과는 레그 이름으로 모으므로 같은 (티커, 타임프레임, 시그널) 레그는 번호를 붙여 구분
+        seen = {}
+        for leg in legs:
+            count = seen.get(leg.name, 0) + 1
+            seen[leg.name] = count
+            if count > 1:
+                leg.name = f"{leg.name}#{count}"
+
+    def _update_equity(self):
+        self.state.update_equity(sum(leg.get_unrealized_pnl() for leg in self.legs))
+
+    def _open(self, leg: PortfolioLeg, i: int):
+        self._update_equity()
+        margin = self.state.equity * leg.strategy.input_amount_ratio
+        free_margin = self.state.equity - sum(other.get_margin() for other in self.legs)
+        if margin > free_margin:
+            leg.skipped += 1
+            return
+        leg.position = open_position(
+            {"open": leg.open[i]}, self.state, leg.strategy, leg.side, leg.index[i]
+        )
+
+    def _close(self, leg: PortfolioLeg, i: int, reason: str):
+        trade_log = close_position(
+            {"open": leg.open[i]}, leg.position, self.state, leg.strategy, leg.index[i], reason
+        )
+        leg.trades.append(trade_log)
+        leg.position = None
+        leg.pending_exit = None
+        self._update_equity()
+
+    def run(self):
+        events = heapq.merge(*(leg.iter_events(k) for k, leg in enumerate(self.legs)))
+        for _, phase, k, i in events:
+            leg = self.legs[k]
+            if phase == _BAR_CLOSE:
+                leg.last_close = leg.close[i]
+                if leg.pending_exit is not None:
+                    self._close(leg, i, leg.pending_exit)
+                continue
+
+            # 봉 시작: 진입 → 이번 봉 TP/SL(마감에 청산) 또는 매도 시그널(시가 청산)
+            if leg.position is None:
+                if i == 0 or not leg.buy_mask[i - 1]:
+                    continue
+                self._open(leg, i)
+                if leg.position is None:
+                    continue
+            reason = leg.get_hit(i)
+            if reason is not None:
+                leg.pending_exit = reason
+            elif leg.sell_mask[i]:
+                self._close(leg, i, "sell")
+
+        # 데이터가 끝날 때까지 남은 포지션은 각 레그의 마지막 봉 시가로 청산
+        for leg in self.legs:
+            if leg.position is not None and len(leg.open) > 0:
+                self._close(leg, len(leg.open) - 1, "force_exit")
+
+        return PortfolioResult(
+            state=self.state,
+            trades={leg.name: leg.trades for leg in self.legs},
+            skipped={leg.name: leg.skipped for leg in self.legs},
+        )
+
+
+def run_portfolio_backtest(
+    strategies: List[Strategy],
+    initial_balance: float = 1000000,
+    side: Side = None,
+    df_by_strategy: Optional[List[pd.DataFrame]] = None,
+):
+    """전략(티커, 타임프레임)들을 공유 증거금 하나로 백테스트
+
+    side가 없으면 전략마다 strategy.direction을 따른다 (both/flip 전략은 ValueError).
+    """
+    legs = []
+    for k, strategy in enumerate(strategies):
+        if df_by_strategy is not None:
+            df = df_by_strategy[k]
+        else:
+            df = load_strategy_dataset(strategy.ticker, strategy.timeframe, [strategy])
+        df = filter_df_by_date(df, strategy.start_date, strategy.end_date)
+        legs.append(PortfolioLeg(strategy, df, side=side))
+
+    state = FinancialState(initial_balance=initial_balance)
+    return PortfolioBacktester(legs, state).run()
+
+
+if __name__ == "__main__":
+    signal = Signal(
+        buy_signal_func=lambda data: data["rsi"] < 15,
+        sell_signal_func=lambda data: data["rsi"] > 85,
+        description="buy_rsi_below_15_sell_rsi_above_85",
+    )
+    strategies = [
+        Strategy(
+            ticker=ticker,
+            timeframe=timeframe,
+            leverage=10,
+            maker_fee=0.0002,
+            taker_fee=0.0005,
+            tp_ratio=1.0,
+            sl_ratio=0.1,
+            input_amount_ratio=0.3,
+            entry_role="taker",
+            exit_role="taker",
+            signal=signal,
+            start_date="2022-01-01",
+            end_date=datetime.now().strftime("%Y-%m-%d"),
+        )
+        for ticker, timeframe in [("BTCUSDT", "15m"), ("ETHUSDT", "15m"), ("BTCUSDT", "1h")]
+    ]
+
+    start_time = time.time()
+    result = run_portfolio_backtest(strategies)
+    print(f"포트폴리오 백테스트 완료: {time.time() - start_time:.1f}초")
+    print(f"최종 잔고: {result.state.balance:.2f}, ROI {result.state.get_roi()}%")
+    for name, stats in result.get_stats().items():
+        print(
+            f"  {name}: 거래 {stats['total_trades']}회, 승률 {stats['win_rate']:.2f}%, "
+            f"증거금 부족으로 건너뛴 진입 {result.skipped[name]}회"
+        )
@@ -0,0 +1,183 @@
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+PROFILE_DIR = "backtesting/trading_log/profile"
+
+# 꺼져 있을 때 쓰는 재사용 가능한 빈 컨텍스트 (호출마다 객체를 만들지 않음)
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+def _short_path(filename: str) -> str:
+    """프로젝트 파일은 상대 경로, 설치된 패키지는 site-packages 아래 경로만"""
+    if "site-packages/" in filename:
+        return filename.split("site-packages/", 1)[1]
+    if filename.startswith(os.getcwd() + os.sep):
+        return os.path.relpath(filename)
+    return filename
+
+
+class BacktestProfiler:
+    """백테스트 단계별 벽시계 시간과 (선택) 전략별 cProfile 수집
+
+    단계 이름은 load, filter, cache, signals, first_pass, kelly, second_pass, result_write, graph 등을 쓴다.
+    per_strategy가 True면 전략마다 cProfile을 켜서 전체/전략별 상위 함수(hotspot)를 요약에 남긴다.
+    여러 쓰레드에서 같이 써도 되도록 집계는 잠금 안에서 한다.
+    """
+
+    enabled = True
+
+    def __init__(self, per_strategy: bool = False, top_n: int = 20):
+        self.per_strategy = per_strategy
+        self.top_n = top_n
+        self.phase_times = defaultdict(float)
+        self.phase_counts = defaultdict(int)
+        self.strategy_times = defaultdict(float)
+        self.profiles = {}
+        self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.started_at = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phase_times[name] += elapsed
+                self.phase_counts[name] += 1
+
+    @contextlib.contextmanager
+    def strategy(self, name: str):
+        """전략 하나의 작업 구간 (per_strategy면 이 구간만 cProfile로 기록, 중첩되면 바깥 구간에 포함)"""
+        if getattr(self._local, "active", False):
+            yield
+            return
+        self._local.active = True
+        profile = cProfile.Profile() if self.per_strategy else None
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            elapsed = time.perf_counter() - start
+            self._local.active = False
+            with self._lock:
+                self.strategy_times[name] += elapsed
+                if profile is not None:
+                    if name in self.profiles:
+                        self.profiles[name].add(profile)
+                    else:
+                        self.profiles[name] = pstats.Stats(profile)
+
+    def _get_hotspots(self, stats: pstats.Stats, limit: int):
+        """tottime 기준 상위 함수 목록"""
+        rows = []
+        for (filename, line, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            rows.append(
+                {
+                    "function": f"{_short_path(filename)}:{line}({func})",
+                    "ncalls": ncalls,
+                    "tottime": tottime,
+                    "cumtime": cumtime,
+                }
+            )
+        rows.sort(key=lambda r: r["tottime"], reverse=True)
+        return rows[:limit]
+
+    def get_summary(self):
+        total = time.perf_counter() - self.started_at
+        summary = {
+            "session_id": self.session_id,
+            "total_sec": total,
+            "phases": {
+                name: {
+                    "sec": sec,
+                    "count": self.phase_counts[name],
+                    "share": sec / total if total > 0 else 0.0,
+                }
+                for name, sec in sorted(self.phase_times.items(), key=lambda x: x[1], reverse=True)
+            },
+            "strategies": len(self.strategy_times),
+        }
+        if self.profiles:
+            combined = pstats.Stats().add(*self.profiles.values())
+            summary["hotspots"] = self._get_hotspots(combined, self.top_n)
+            slowest = sorted(self.strategy_times.items(), key=lambda x: x[1], reverse=True)[: self.top_n]
+            summary["slowest_strategies"] = [
+                {"strategy": name, "sec": sec, "hotspots": self._get_hotspots(self.profiles[name], 3)}
+                for name, sec in slowest
+                if name in self.profiles
+            ]
+        return summary
+
+    def format_summary(self, summary=None):
+        summary = summary or self.get_summary()
+        lines = [f"=== 백테스트 프로파일 ({summary['session_id']}) ===", f"전체 시간: {summary['total_sec']:.2f}초"]
+        lines.append("단계별 시간:")
+        for name, phase in summary["phases"].items():
+            lines.append(
+                f"  {name:<14} {phase['sec']:10.3f}초 ({phase['share'] * 100:5.1f}%) {phase['count']:>8}회"
+            )
+        if "hotspots" in summary:
+            lines.append(f"상위 {len(summary['hotspots'])}개 함수 (자체 시간 기준, 전략 {summary['strategies']}개 합계):")
+            for row in summary["hotspots"]:
+                lines.append(
+                    f"  {row['tottime']:9.3f}초 누적 {row['cumtime']:9.3f}초 {row['ncalls']:>10}회  {row['function']}"
+                )
+            lines.append("느린 전략:")
+            for row in summary["slowest_strategies"][:5]:
+                top = row["hotspots"][0]["function"] if row["hotspots"] else "-"
+                lines.append(f"  {row['sec']:8.3f}초  {row['strategy']}  (최대: {top})")
+        return "\n".join(lines)
+
+    def save(self, log_dir: str = PROFILE_DIR):
+        """요약을 txt/json으로 저장하고 txt 경로 반환"""
+        os.makedirs(log_dir, exist_ok=True)
+        summary = self.get_summary()
+        base = os.path.join(log_dir, f"{self.session_id}_profile")
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        with open(f"{base}.txt", "w", encoding="utf-8") as f:
+            f.write(self.format_summary(summary) + "\n")
+            if self.profiles:
+                # pstats 원본 표도 함께 남겨 호출 관계를 확인할 수 있게 한다
+                stream = io.StringIO()
+                combined = pstats.Stats(stream=stream).add(*self.profiles.values())
+                combined.sort_stats("cumulative").print_stats(self.top_n * 2)
+                f.write("\n" + stream.getvalue())
+        return f"{base}.txt"
+
+
+class NullProfiler(BacktestProfiler):
+    """프로파일링을 끈 상태: 모든 구간이 같은 빈 컨텍스트라 호출 비용만 남는다"""
+
+    enabled = False
+
+    def __init__(self):
+        pass
+
+    def phase(self, name: str):
+        return _NULL_CONTEXT
+
+    def strategy(self, name: str):
+        return _NULL_CONTEXT
+
+    def save(self, log_dir: str = PROFILE_DIR):
+        return None
+
+
+NULL_PROFILER = NullProfiler()
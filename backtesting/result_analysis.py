@@ -2,8 +2,9 @@ def show_top_results(filename: str, count: int):
     result = []
     with open(filename, "r") as f:
         for line in f:
+            # 전략, 진입 비율, 잔고, ROI (조기 종료된 전략은 뒤에 pruned:사유)
             data = line.replace("\n", "").replace(" ", "").split(",")
-            result.append([data[0], float(data[1]), float(data[-1])])
+            result.append([data[0], float(data[1]), float(data[3]), *data[4:]])
     result.sort(key=lambda x: x[2], reverse=True)
     for i in result[:count]:
         print(i)
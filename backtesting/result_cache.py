@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+from typing import Optional
+
+import pandas as pd
+
+from model.model import Signal, Strategy
+
+RESULT_CACHE_PATH = "backtesting/cache/result_cache.json"
+
+# 백테스트 엔진의 계산 방식이 바뀌면 올려서 기존 캐시를 무효화
+CACHE_VERSION = 2
+
+
+def _hash_value(h, value, module: str, seen: set):
+    """상수/클로저/기본값 하나를 실행마다 같은 바이트로 해시에 반영 (메모리 주소가 들어간 repr은 쓰지 않음)"""
+    if hasattr(value, "co_code"):
+        _hash_code(h, value, {}, module, seen)
+    elif callable(value) and hasattr(value, "__code__"):
+        _hash_func(h, value, seen)
+    elif isinstance(value, (tuple, list)):
+        h.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _hash_value(h, item, module, seen)
+    elif isinstance(value, (set, frozenset)):
+        h.update(repr(sorted(repr(item) for item in value)).encode())
+    else:
+        text = repr(value)
+        h.update((type(value).__qualname__ if " at 0x" in text else text).encode())
+
+
+def _hash_code(h, code, globals_: dict, module: str, seen: set):
+    """바이트코드와 상수(중첩 코드 포함), 이름, 같은 모듈의 전역 도우미 함수 본문을 해시에 반영"""
+    if id(code) in seen:
+        return
+    seen.add(id(code))
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        _hash_value(h, const, module, seen)
+    # 시그널이 부르는 같은 모듈의 도우미 함수는 본문이 바뀌면 다른 시그널로 본다
+    for name in code.co_names:
+        helper = globals_.get(name)
+        if callable(helper) and hasattr(helper, "__code__") and getattr(helper, "__module__", None) == module:
+            _hash_func(h, helper, seen)
+
+
+def _hash_func(h, func, seen: set = None):
+    """시그널 함수의 바이트코드/상수/클로저 값/기본값을 해시에 반영
+
+    중첩 코드(제너레이터 식, 안쪽 람다)와 클로저·기본값으로 잡은 함수는 재귀로 내용을 해시하고,
+    전역 도우미 함수는 시그널과 같은 모듈에 정의된 것만 본문까지 반영한다 (다른 모듈은 이름만).
+    """
+    seen = set() if seen is None else seen
+    code = getattr(func, "__code__", None)
+    if code is None:
+        h.update(getattr(func, "__qualname__", type(func).__name__).encode())
+        return
+    module = getattr(func, "__module__", None)
+    _hash_code(h, code, getattr(func, "__globals__", {}), module, seen)
+    _hash_value(h, getattr(func, "__defaults__", None), module, seen)
+    # 반복문 안에서 만든 람다처럼 클로저로 임계값을 캡처한 경우
+    for cell in getattr(func, "__closure__", None) or ():
+        try:
+            _hash_value(h, cell.cell_contents, module, seen)
+        except ValueError:
+            continue
+
+
+def get_signal_identity(signal: Signal) -> str:
+    """시그널 설명과 함수 내용으로 시그널 식별자 생성"""
+    h = hashlib.sha256(signal.description.encode())
+    _hash_func(h, signal.buy_signal_func)
+    _hash_func(h, signal.sell_signal_func)
+    # 숏 시그널이 없는 시그널은 기존 캐시 키를 그대로 유지
+    for func in (signal.short_signal_func, signal.cover_signal_func):
+        if func is not None:
+            _hash_func(h, func)
+    return h.hexdigest()
+
+
+def get_data_fingerprint(df: pd.DataFrame) -> str:
+    """필터링된 데이터의 행 범위와 내용으로 지문 생성"""
+    h = hashlib.sha256()
+    h.update(repr(list(df.columns)).encode())
+    h.update(str(len(df)).encode())
+    if len(df) > 0:
+        h.update(f"{df.index[0]}~{df.index[-1]}".encode())
+        h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def get_strategy_key(strategy: Strategy, data_fingerprint: str, mode: str = "bar") -> str:
+    """전략 파라미터 + 시그널 + 데이터 지문으로 캐시 키 생성
+
+    기간(start_date, end_date)은 데이터 지문에 실제 행 범위로 반영되므로
+    키에 직접 넣지 않는다. 데이터가 늘어도 기간 안의 행이 같으면 캐시가 유지된다.
+    mode는 봉 단위/1분봉 판정 등 같은 데이터라도 결과가 달라지는 실행 방식을 구분한다.
+    """
+    params = {
+        "version": CACHE_VERSION,
+        "ticker": strategy.ticker,
+        "timeframe": strategy.timeframe,
+        "leverage": strategy.leverage,
+        "maker_fee": strategy.maker_fee,
+        "taker_fee": strategy.taker_fee,
+        "tp_ratio": strategy.tp_ratio,
+        "sl_ratio": strategy.sl_ratio,
+        "input_amount_ratio": strategy.input_amount_ratio,
+        "entry_role": strategy.entry_role,
+        "exit_role": strategy.exit_role,
+        "signal": get_signal_identity(strategy.signal),
+        "data": data_fingerprint,
+        "mode": mode,
+    }
+    if strategy.direction != "long":
+        params["direction"] = strategy.direction
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """전략별 백테스트 결과를 디스크에 보관하는 캐시"""
+
+    def __init__(self, path: str = RESULT_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"결과 캐시 로드 실패, 새로 시작합니다: {e}")
+                self.entries = {}
+
+    def get(self, key: str) -> Optional[dict]:
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def set(self, key: str, result: dict):
+        self.entries[key] = result
+        self._dirty = True
+
+    def save(self):
+        """임시 파일에 쓴 뒤 교체하여 중간에 끊겨도 캐시가 깨지지 않게 저장"""
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
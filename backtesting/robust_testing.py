@@ -0,0 +1,382 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import product
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtesting.backtesting_deep import (
+    MaskBacktester,
+    backtest_kelly_with_masks,
+    backtest_single_strategy,
+    filter_df_by_date,
+    get_direction_masks,
+    load_dataset,
+)
+from model.model import FinancialState, Signal, Strategy, TradeLedger
+
+INITIAL_BALANCE = 1000000
+
+# fork로 만든 워커가 그대로 물려받는 공유 데이터 (시그널 람다는 pickle이 안 되므로)
+_SHARED = {}
+
+
+@dataclass
+class WalkForwardWindow:
+    train_start: Any
+    train_end: Any
+    test_start: Any
+    test_end: Any
+    leverage: int
+    tp_ratio: float
+    sl_ratio: float
+    input_amount_ratio: float
+    train_roi: float
+    test_roi: float
+    test_trades: int
+    balance_after: float
+
+
+@dataclass
+class WalkForwardResult:
+    initial_balance: float
+    final_balance: float
+    windows: List[WalkForwardWindow] = field(default_factory=list)
+    # 아웃오브샘플 잔고 곡선 (청산 시각 기준)
+    equity_curve: Optional[pd.Series] = None
+
+    def get_roi(self):
+        return round((self.final_balance - self.initial_balance) / self.initial_balance * 100, 2)
+
+
+def load_backtest_data(ticker: str, timeframe: str, start_date=None, end_date=None):
+    """지표 데이터를 한 번 읽고 기간 필터링까지 끝낸 DataFrame 반환"""
+    df = load_dataset(ticker, timeframe)
+    return filter_df_by_date(df, start_date or "1970-01-01", end_date or datetime.now().strftime("%Y-%m-%d"))
+
+
+def get_bars_for_days(df: pd.DataFrame, days: float) -> int:
+    """데이터의 봉 간격으로 일수를 봉 개수로 환산"""
+    step = pd.Series(df.index[:1000]).diff().median()
+    return max(1, int(pd.Timedelta(days=days) / step))
+
+
+def get_fork_pool(max_workers):
+    """공유 데이터를 물려줄 수 있도록 fork 방식 프로세스 풀 생성 (불가하면 None)"""
+    if max_workers == 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context("fork"),
+    )
+
+
+def slice_masks(masks, start: int, end: int):
+    """(매수, 매도, 숏 진입, 숏 청산) 마스크를 [start, end) 위치로 자름 (없는 숏 마스크는 None 그대로)"""
+    return tuple(None if mask is None else mask[start:end] for mask in masks)
+
+
+def _evaluate_train_window(task):
+    """학습 구간 하나에서 (레버리지, TP, SL) 조합 하나를 Kelly 2단계로 평가"""
+    start, end, leverage, tp_ratio, sl_ratio = task
+    df = _SHARED["df"].iloc[start:end]
+    buy_mask, sell_mask, short_mask, cover_mask = slice_masks(_SHARED["masks"], start, end)
+    strat = _SHARED["strategy"].model_copy(
+        update={"leverage": leverage, "tp_ratio": tp_ratio, "sl_ratio": sl_ratio}
+    )
+    state = FinancialState(initial_balance=INITIAL_BALANCE)
+    final_state, trades = backtest_kelly_with_masks(
+        df,
+        buy_mask,
+        sell_mask,
+        strat,
+        state,
+        side=_SHARED["side"],
+        short_mask=short_mask,
+        cover_mask=cover_mask,
+    )
+    return start, leverage, tp_ratio, sl_ratio, final_state.get_roi(), strat.input_amount_ratio, len(trades)
+
+
+def walk_forward(
+    strategy: Strategy,
+    leverages: List[int],
+    tp_ratios: List[float],
+    sl_ratios: List[float],
+    train_days: float,
+    test_days: float,
+    df: pd.DataFrame = None,
+    side=None,
+    min_trades: int = 1,
+    max_workers: Optional[int] = None,
+):
+    """롤링 학습/검증 구간으로 파라미터를 고르고 아웃오브샘플 성과를 이어붙이는 워크포워드
+
+    - 학습 구간마다 (레버리지, TP, SL) 그리드를 Kelly 2단계로 평가해 ROI 최고 조합을 선택
+    - 선택한 조합과 학습 구간의 Kelly 비율을 바로 다음 검증 구간에 적용
+    - 검증 구간 잔고를 다음 구간으로 이어가며 아웃오브샘플 잔고 곡선을 만든다
+    데이터와 시그널 마스크는 한 번만 만들고 구간은 인덱스 위치로 잘라 쓴다.
+    모든 학습 구간의 그리드는 서로 독립이므로 한 번에 프로세스 풀로 병렬 처리한다.
+    side가 없으면 backtest_fast처럼 strategy.direction을 따른다 (숏/양방향이면 숏 마스크도 사용).
+    """
+    if df is None:
+        df = load_backtest_data(strategy.ticker, strategy.timeframe, strategy.start_date, strategy.end_date)
+    masks = get_direction_masks(df, strategy, side)
+
+    n = len(df)
+    train_bars = get_bars_for_days(df, train_days)
+    test_bars = get_bars_for_days(df, test_days)
+    starts = list(range(0, n - train_bars, test_bars))
+    grid = list(product(leverages, tp_ratios, sl_ratios))
+    print(
+        f"워크포워드: {n}개 봉, 학습 {train_bars}봉 / 검증 {test_bars}봉, "
+        f"{len(starts)}개 구간 x {len(grid)}개 조합"
+    )
+
+    _SHARED.update(df=df, masks=masks, strategy=strategy, side=side)
+    tasks = [(s, s + train_bars, lev, tp, sl) for s in starts for lev, tp, sl in grid]
+
+    start_time = time.time()
+    pool = get_fork_pool(max_workers)
+    try:
+        if pool is None:
+            evaluated = list(map(_evaluate_train_window, tasks))
+        else:
+            chunksize = max(1, len(tasks) // ((max_workers or os.cpu_count()) * 8))
+            evaluated = list(pool.map(_evaluate_train_window, tasks, chunksize=chunksize))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        _SHARED.clear()
+    print(f"학습 구간 그리드 평가 완료: {len(tasks)}회, {time.time() - start_time:.1f}초")
+
+    # 구간별 ROI 최고 조합 선택
+    best = {}
+    for start, leverage, tp_ratio, sl_ratio, roi, ratio, trade_count in evaluated:
+        if trade_count < min_trades:
+            continue
+        if start not in best or roi > best[start][3]:
+            best[start] = (leverage, tp_ratio, sl_ratio, roi, ratio)
+
+    result = WalkForwardResult(initial_balance=INITIAL_BALANCE, final_balance=INITIAL_BALANCE)
+    curve_times, curve_values = [], []
+    balance = INITIAL_BALANCE
+    for start in starts:
+        if start not in best:
+            continue
+        leverage, tp_ratio, sl_ratio, train_roi, ratio = best[start]
+        test_start = start + train_bars
+        test_end = min(test_start + test_bars, n)
+        # 학습 마지막 봉의 시그널로 검증 첫 봉에 진입할 수 있도록 한 봉 앞부터 자른다
+        lo = test_start - 1
+        strat = strategy.model_copy(
+            update={
+                "leverage": leverage,
+                "tp_ratio": tp_ratio,
+                "sl_ratio": sl_ratio,
+                "input_amount_ratio": ratio,
+            }
+        )
+        state = FinancialState(initial_balance=balance)
+        buy_mask, sell_mask, short_mask, cover_mask = slice_masks(masks, lo, test_end)
+        tester = MaskBacktester(
+            df.iloc[lo:test_end],
+            buy_mask,
+            sell_mask,
+            strat,
+            state,
+            side=side,
+            short_mask=short_mask,
+            cover_mask=cover_mask,
+        )
+        tester.run()
+        final_state, trades = tester.force_exit()
+
+        curve_times.append(trades.exit_time)
+        curve_values.append(balance + np.cumsum(trades.realized_pnl))
+
+        result.windows.append(
+            WalkForwardWindow(
+                train_start=df.index[start],
+                train_end=df.index[test_start - 1],
+                test_start=df.index[test_start],
+                test_end=df.index[test_end - 1],
+                leverage=leverage,
+                tp_ratio=tp_ratio,
+                sl_ratio=sl_ratio,
+                input_amount_ratio=ratio,
+                train_roi=train_roi,
+                test_roi=final_state.get_roi(),
+                test_trades=len(trades),
+                balance_after=final_state.balance,
+            )
+        )
+        balance = final_state.balance
+
+    result.final_balance = balance
+    result.equity_curve = pd.Series(
+        np.concatenate(curve_values) if curve_values else [],
+        index=pd.to_datetime(np.concatenate(curve_times) if curve_times else [], unit="ns"),
+        name="balance",
+    )
+    print(f"워크포워드 완료: {time.time() - start_time:.1f}초, 아웃오브샘플 ROI {result.get_roi()}%")
+    return result
+
+
+@dataclass
+class MonteCarloResult:
+    method: str
+    input_amount_ratio: float
+    initial_balance: float
+    # 시뮬레이션별 최종 잔고 / 최대 낙폭(고점 대비, 0~1) / 파산 여부
+    final_balances: np.ndarray
+    max_drawdowns: np.ndarray
+    ruined: np.ndarray
+
+    def get_ruin_probability(self):
+        return float(self.ruined.mean()) if len(self.ruined) else 0.0
+
+    def summary(self, percentiles=(5, 25, 50, 75, 95)):
+        """최종 잔고, 최대 낙폭의 분위수와 파산 확률"""
+        return {
+            "simulations": len(self.final_balances),
+            "method": self.method,
+            "input_amount_ratio": self.input_amount_ratio,
+            "final_balance": dict(zip(percentiles, np.percentile(self.final_balances, percentiles).tolist())),
+            "max_drawdown": dict(zip(percentiles, np.percentile(self.max_drawdowns, percentiles).tolist())),
+            "ruin_probability": self.get_ruin_probability(),
+        }
+
+
+def get_trade_returns(trades, leverage: int) -> np.ndarray:
+    """거래별 증거금 대비 순손익률 (수수료 포함)
+
+    증거금 = 진입 시 에쿼티 x 진입 비율 이므로, 진입 비율 f에서 거래 한 번의 잔고 배수는 1 + f x 손익률이다.
+    """
+    ledger = TradeLedger.from_trades(trades)
+    entry_price, qty, pnl = ledger.entry_price, ledger.qty, ledger.realized_pnl
+    margin = entry_price * qty / leverage
+    return np.divide(pnl, margin, out=np.zeros_like(pnl), where=margin != 0)
+
+
+def _simulate_trade_paths(task):
+    """거래 순서를 재표본/섞은 잔고 경로 n_sims개를 한 번에 계산 (초기 잔고 1 기준)"""
+    returns, ratio, n_sims, method, seed, ruin_ratio = task
+    rng = np.random.default_rng(seed)
+    n_trades = len(returns)
+    if method == "bootstrap":
+        sampled = returns[rng.integers(0, n_trades, size=(n_sims, n_trades))]
+    else:
+        sampled = rng.permuted(np.tile(returns, (n_sims, 1)), axis=1)
+
+    # 잔고 배수가 0 아래로 내려가면 파산 (잔고를 모두 잃음)
+    growth = np.maximum(1.0 + ratio * sampled, 0.0, out=sampled)
+    paths = np.cumprod(growth, axis=1, out=growth)
+    peaks = np.maximum.accumulate(paths, axis=1)
+    np.maximum(peaks, 1.0, out=peaks)
+    drawdowns = 1.0 - paths / peaks
+    return paths[:, -1].copy(), drawdowns.max(axis=1), paths.min(axis=1) <= ruin_ratio
+
+
+def monte_carlo(
+    trades,
+    strategy: Strategy,
+    n_sims: int = 10000,
+    method: str = "bootstrap",
+    input_amount_ratio: Optional[float] = None,
+    initial_balance: float = INITIAL_BALANCE,
+    ruin_ratio: float = 0.01,
+    seed: Optional[int] = None,
+    chunk_size: int = 2000,
+    max_workers: Optional[int] = None,
+):
+    """거래 목록(TradeLog 리스트 또는 TradeLedger)을 재표본(bootstrap)하거나 순서를 섞어(shuffle) 전략의 취약성을 측정
+
+    input_amount_ratio를 주지 않으면 전략의 진입 비율(Kelly 적용 후라면 Kelly 비율)을 사용한다.
+    잔고가 초기 자본의 ruin_ratio 이하로 떨어진 경로는 파산으로 본다.
+    시뮬레이션은 chunk_size 단위로 나눠 넘파이로 한 번에 계산하고, 여러 묶음이면 코어에 분산한다.
+    """
+    if method not in ("bootstrap", "shuffle"):
+        raise ValueError(f"Invalid method: {method}")
+    ratio = strategy.input_amount_ratio if input_amount_ratio is None else input_amount_ratio
+    returns = get_trade_returns(trades, strategy.leverage)
+    if len(returns) == 0:
+        raise ValueError("거래 내역이 없습니다")
+
+    chunks = [min(chunk_size, n_sims - i) for i in range(0, n_sims, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    tasks = [(returns, ratio, n, method, s, ruin_ratio) for n, s in zip(chunks, seeds)]
+
+    pool = get_fork_pool(max_workers) if len(tasks) > 1 and (max_workers or os.cpu_count()) > 1 else None
+    try:
+        outputs = list(map(_simulate_trade_paths, tasks)) if pool is None else list(pool.map(_simulate_trade_paths, tasks))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return MonteCarloResult(
+        method=method,
+        input_amount_ratio=ratio,
+        initial_balance=initial_balance,
+        final_balances=np.concatenate([o[0] for o in outputs]) * initial_balance,
+        max_drawdowns=np.concatenate([o[1] for o in outputs]),
+        ruined=np.concatenate([o[2] for o in outputs]),
+    )
+
+
+if __name__ == "__main__":
+    signal = Signal(
+        buy_signal_func=lambda data: data["rsi"] < 15,
+        sell_signal_func=lambda data: data["rsi"] > 85,
+        description="buy_rsi_below_15_sell_rsi_above_85",
+    )
+    strategy = Strategy(
+        ticker="BTCUSDT",
+        timeframe="15m",
+        leverage=10,
+        maker_fee=0.0002,
+        taker_fee=0.0005,
+        tp_ratio=1.0,
+        sl_ratio=0.1,
+        input_amount_ratio=0.1,
+        entry_role="taker",
+        exit_role="taker",
+        signal=signal,
+        start_date="2021-01-01",
+        end_date=datetime.now().strftime("%Y-%m-%d"),
+    )
+
+    result = walk_forward(
+        strategy,
+        leverages=[2, 4, 6, 8, 10, 20, 30, 50, 100],
+        tp_ratios=[0.05, 0.1, 0.2, 0.4, 0.5, 0.8, 0.9, 1.0, 1.2, 1.4, 1.6, 1.8, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0],
+        sl_ratios=[0.05, 0.1, 0.2, 0.5],
+        train_days=180,
+        test_days=30,
+    )
+
+    print("\n=== 구간별 결과 ===")
+    for w in result.windows:
+        print(
+            f"{w.test_start} ~ {w.test_end}: leverage {w.leverage}, tp {w.tp_ratio}, sl {w.sl_ratio}, "
+            f"ratio {round(w.input_amount_ratio, 2)} / 학습 ROI {w.train_roi}% → 검증 ROI {w.test_roi}% ({w.test_trades}회)"
+        )
+    print(f"\n최종 잔고: {round(result.final_balance, 2)} (ROI {result.get_roi()}%)")
+
+    if result.windows:
+        # 마지막 구간에서 고른 파라미터의 전체 기간 거래로 몬테카를로 검증 (Kelly 비율 기준)
+        last = result.windows[-1]
+        mc_strategy = strategy.model_copy(
+            update={"leverage": last.leverage, "tp_ratio": last.tp_ratio, "sl_ratio": last.sl_ratio}
+        )
+        df = load_backtest_data(strategy.ticker, strategy.timeframe, strategy.start_date, strategy.end_date)
+        _, trades = backtest_single_strategy(df, mc_strategy, FinancialState(initial_balance=INITIAL_BALANCE))
+        if trades:
+            mc = monte_carlo(trades, mc_strategy, n_sims=10000)
+            print("\n=== 몬테카를로 (bootstrap) ===")
+            print(mc.summary())
@@ -0,0 +1,103 @@
+from itertools import product
+from typing import ClassVar, Dict, List
+
+import numpy as np
+import pandas as pd
+import talib
+from pydantic import BaseModel, Field
+
+from model.model import Signal
+
+# 지표 이름 → (DataFrame, 기간) 으로 지표 배열을 계산하는 함수
+INDICATOR_FUNCS = {
+    "rsi": lambda df, period: talib.RSI(df["close"].to_numpy(dtype=float), timeperiod=period),
+}
+
+# collect_data가 기본으로 저장하는 지표 기간 (이 기간은 기존 컬럼 이름을 그대로 사용)
+DEFAULT_PERIODS = {"rsi": 14}
+
+
+def get_indicator_column(indicator: str, period: int) -> str:
+    """지표 컬럼 이름 (기본 기간이면 "rsi", 아니면 "rsi_21" 형태)"""
+    if DEFAULT_PERIODS.get(indicator) == period:
+        return indicator
+    return f"{indicator}_{period}"
+
+
+class IndicatorStore:
+    """(지표, 기간)별 지표 배열을 한 번만 계산해 보관
+
+    df에 이미 있는 지표 컬럼(기본 기간의 "rsi" 등)은 다시 계산하지 않고 그대로 쓴다.
+    collect_data는 앞부분을 자르기 전의 원본 전체로 지표를 계산해 저장하므로,
+    잘린 데이터로 다시 계산하면 RSI처럼 이전 값을 이어 쓰는 지표는 앞부분 값이 달라진다.
+    df에 없는 기간은 df 전체로 계산하므로 앞 period개 봉은 NaN이고,
+    기간 필터링은 계산해 둔 배열을 위치로 잘라 쓴다.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.arrays = {}
+
+    def get(self, indicator: str, period: int) -> np.ndarray:
+        key = (indicator, period)
+        if key not in self.arrays:
+            column = get_indicator_column(indicator, period)
+            if column in self.df.columns:
+                self.arrays[key] = self.df[column].to_numpy(dtype=float)
+            else:
+                self.arrays[key] = INDICATOR_FUNCS[indicator](self.df, period)
+        return self.arrays[key]
+
+
+class ThresholdSignalFamily(BaseModel):
+    """지표 기간과 매수/매도 임계값으로 만드는 시그널 묶음
+
+    buy: 지표 < buy_below, sell: 지표 > sell_above
+    지표는 기간별로 한 번만 계산하고, 임계값 조합은 캐시된 배열의 비교로만 마스크를 만든다.
+    """
+
+    indicator: str = Field(default="rsi", description="INDICATOR_FUNCS의 지표 이름")
+    periods: List[int] = Field(default=[14], description="지표 기간 후보")
+    buy_below: List[float] = Field(description="매수 임계값 후보 (지표가 이 값 미만이면 매수)")
+    sell_above: List[float] = Field(description="매도 임계값 후보 (지표가 이 값 초과면 매도)")
+
+    # 최적화 그리드에 들어가는 시그널 파라미터 이름
+    PARAM_NAMES: ClassVar[tuple] = ("period", "buy_below", "sell_above")
+
+    def get_param_grid(self) -> List[Dict]:
+        """매수 임계값이 매도 임계값보다 작은 조합만"""
+        return [
+            {"period": p, "buy_below": b, "sell_above": s}
+            for p, b, s in product(self.periods, self.buy_below, self.sell_above)
+            if b < s
+        ]
+
+    def precompute(self, store: IndicatorStore):
+        for period in self.periods:
+            store.get(self.indicator, period)
+        return store
+
+    def get_masks(self, values: np.ndarray, params: Dict):
+        """캐시된 지표 배열로 (매수 마스크, 매도 마스크) 생성 (NaN은 False)"""
+        return values < params["buy_below"], values > params["sell_above"]
+
+    def make_signal(self, params: Dict) -> Signal:
+        """파라미터 조합을 일반 Signal로 변환 (지표 컬럼이 있는 DataFrame에서 사용)"""
+        column = get_indicator_column(self.indicator, params["period"])
+        buy_below = params["buy_below"]
+        sell_above = params["sell_above"]
+        return Signal(
+            buy_signal_func=lambda data: data[column] < buy_below,
+            sell_signal_func=lambda data: data[column] > sell_above,
+            description=f"buy_{column}_below_{buy_below}_sell_{column}_above_{sell_above}",
+        )
+
+    def add_indicator_columns(self, df: pd.DataFrame, store: IndicatorStore = None):
+        """make_signal로 만든 Signal을 쓸 수 있도록 없는 지표 컬럼을 추가한 DataFrame 반환"""
+        store = store or IndicatorStore(df)
+        columns = {}
+        for period in self.periods:
+            column = get_indicator_column(self.indicator, period)
+            if column not in df.columns:
+                columns[column] = store.get(self.indicator, period)
+        return df.assign(**columns) if columns else df
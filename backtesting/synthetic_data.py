@@ -0,0 +1,164 @@
+import os
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field
+
+from backtesting.collect_data import (
+    INDICATOR_FILE_COLUMNS,
+    OHLCV_COLUMNS,
+    add_indicators,
+    resample_from_1m,
+)
+from utils.interval_calendar import get_interval_ms
+
+YEAR_NS = 365 * 24 * 3600 * 10**9
+
+
+class SyntheticMarket(BaseModel):
+    """합성 시세 파라미터 (연율 기준): 변동성 국면이 바뀌는 GBM + 점프 확산
+
+    국면은 평균 regime_days일 동안 유지되다가 다른 국면으로 바뀌고,
+    점프는 연 jump_intensity회 포아송으로 일어나 로그 수익률에 정규분포 크기로 더해진다.
+    """
+
+    initial_price: float = Field(default=30000.0, description="첫 봉 시가")
+    drift: float = Field(default=0.0, description="연 기대 로그 수익률")
+    volatilities: List[float] = Field(default=[0.4, 0.8, 1.6], description="국면별 연 변동성")
+    regime_days: float = Field(default=30.0, description="국면 평균 유지 기간 (일)")
+    jump_intensity: float = Field(default=20.0, description="연 평균 점프 횟수")
+    jump_mean: float = Field(default=0.0, description="점프 로그 수익률 평균")
+    jump_std: float = Field(default=0.03, description="점프 로그 수익률 표준편차")
+    base_volume: float = Field(default=100.0, description="평균 변동성 국면의 봉당 거래량")
+
+
+def _draw_regimes(rng: np.random.Generator, n_bars: int, n_regimes: int, mean_bars: float):
+    """봉마다 변동성 국면 번호 (기하분포 길이로 이어 붙이고, 바뀔 때는 다른 국면으로)"""
+    if n_regimes == 1:
+        return np.zeros(n_bars, dtype=np.int64)
+    p = min(1.0, 1.0 / max(mean_bars, 1.0))
+    lengths = rng.geometric(p, size=int(n_bars * p * 1.5) + 16)
+    while lengths.sum() < n_bars:
+        lengths = np.r_[lengths, rng.geometric(p, size=len(lengths))]
+    k = int(np.searchsorted(np.cumsum(lengths), n_bars)) + 1
+    lengths = lengths[:k]
+    # 이전 국면을 제외한 나머지 중에서 고르도록 1..n-1 만큼 이동
+    steps = rng.integers(1, n_regimes, size=k)
+    steps[0] = rng.integers(0, n_regimes)
+    regimes = np.cumsum(steps) % n_regimes
+    return np.repeat(regimes, lengths)[:n_bars]
+
+
+def generate_ohlcv(
+    n_bars: int,
+    timeframe: str = "15m",
+    start: str = "2020-01-01",
+    seed: int = 0,
+    market: SyntheticMarket = None,
+) -> pd.DataFrame:
+    """seed가 같으면 항상 같은 합성 OHLCV (timestamp 인덱스, collect_data 원본 형식)
+
+    봉 단위로 한 번에 벡터 계산하므로 수천만 봉도 수 초 안에 만든다.
+    시가는 직전 종가, 고가/저가는 시가→종가 브라운 브리지의 최대/최소 분포에서 뽑는다.
+    """
+    market = market or SyntheticMarket()
+    rng = np.random.default_rng(seed)
+    bar_ns = get_interval_ms(timeframe) * 10**6
+    dt = bar_ns / YEAR_NS
+
+    vols = np.asarray(market.volatilities, dtype=float)
+    regimes = _draw_regimes(rng, n_bars, len(vols), market.regime_days * 24 * 3600 * 10**9 / bar_ns)
+    sigma = vols[regimes] * np.sqrt(dt)
+
+    log_ret = market.drift * dt + sigma * rng.standard_normal(n_bars)
+    # 점프: 봉 안의 점프 횟수만큼 정규분포 합 (N개 합 = 평균 N*m, 표준편차 sqrt(N)*s)
+    jumps = rng.poisson(market.jump_intensity * dt, size=n_bars)
+    has_jump = jumps > 0
+    n_jumps = jumps[has_jump]
+    log_ret[has_jump] += n_jumps * market.jump_mean + np.sqrt(n_jumps) * market.jump_std * rng.standard_normal(len(n_jumps))
+
+    log_close = np.log(market.initial_price) + np.cumsum(log_ret)
+    log_open = np.r_[np.log(market.initial_price), log_close[:-1]]
+
+    # 브라운 브리지 (0 → b, 분산 v) 의 최댓값: (b + sqrt(b² - 2v·ln U)) / 2, 최솟값은 대칭
+    variance = sigma**2
+    spread_up = np.sqrt(log_ret**2 - 2 * variance * np.log(rng.random(n_bars)))
+    spread_down = np.sqrt(log_ret**2 - 2 * variance * np.log(rng.random(n_bars)))
+    log_high = log_open + (log_ret + spread_up) / 2
+    log_low = log_open + (log_ret - spread_down) / 2
+
+    # 거래량: 국면 변동성과 봉 수익률 크기에 비례하는 로그정규
+    intensity = vols[regimes] / vols.mean() * (1 + np.abs(log_ret) / sigma)
+    volume = market.base_volume * intensity * rng.lognormal(-0.125, 0.5, n_bars)
+
+    index = pd.DatetimeIndex(
+        (pd.Timestamp(start).value + np.arange(n_bars, dtype=np.int64) * bar_ns).view("datetime64[ns]"),
+        name="timestamp",
+    )
+    return pd.DataFrame(
+        {
+            "open": np.exp(log_open),
+            "high": np.exp(log_high),
+            "low": np.exp(log_low),
+            "close": np.exp(log_close),
+            "volume": volume,
+        },
+        index=index,
+    )
+
+
+def get_indicator_frame(ohlcv: pd.DataFrame) -> pd.DataFrame:
+    """collect_data.add_indicators로 지표를 붙여 *_with_indicators.csv와 같은 컬럼 구성으로 반환"""
+    df = ohlcv.reset_index()
+    df["timestamp"] = df["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return add_indicators(df)[INDICATOR_FILE_COLUMNS]
+
+
+def save_synthetic_dataset(
+    ticker: str,
+    timeframe: str,
+    n_bars: int,
+    start: str = "2020-01-01",
+    seed: int = 0,
+    market: SyntheticMarket = None,
+    with_indicators: bool = True,
+    overwrite: bool = False,
+    chunksize: int = 1_000_000,
+):
+    """합성 데이터를 backtesting/raw_data, backtesting/data에 collect_data와 같은 형식으로 저장
+
+    내려받은 데이터를 덮어쓰지 않도록 파일이 있으면 overwrite=True일 때만 쓴다.
+    """
+    raw_path = f"backtesting/raw_data/{ticker}_{timeframe}.csv"
+    data_path = f"backtesting/data/{ticker}_{timeframe}_with_indicators.csv"
+    for path in [raw_path, data_path] if with_indicators else [raw_path]:
+        if os.path.exists(path) and not overwrite:
+            raise FileExistsError(f"이미 있는 데이터입니다 (overwrite=True로 덮어쓰기): {path}")
+
+    ohlcv = generate_ohlcv(n_bars, timeframe, start=start, seed=seed, market=market)
+    os.makedirs(os.path.dirname(raw_path), exist_ok=True)
+    ohlcv[OHLCV_COLUMNS].to_csv(raw_path, index=True, chunksize=chunksize)
+    print(f"✅ 원본 저장 완료: {raw_path} ({len(ohlcv)} 행)")
+    if with_indicators:
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        get_indicator_frame(ohlcv).to_csv(data_path, index=False, chunksize=chunksize)
+        print(f"✅ 지표 저장 완료: {data_path}")
+    return ohlcv
+
+
+if __name__ == "__main__":
+    ticker = "SYNTHUSDT"
+    market = SyntheticMarket()
+
+    start_time = time.time()
+    ohlcv = generate_ohlcv(20_000_000, "1m", seed=0, market=market)
+    print(f"1분봉 {len(ohlcv)}개 생성: {time.time() - start_time:.2f}초")
+
+    # 1분봉을 저장하고 상위 타임프레임은 collect_data와 같이 1분봉에서 만든다
+    save_synthetic_dataset(ticker, "1m", 4 * 365 * 24 * 60, seed=0, market=market, overwrite=True)
+    resample_from_1m(ticker, ["5m", "15m", "1h", "4h", "1d"])
+    for timeframe in ["5m", "15m", "1h", "4h", "1d"]:
+        df = add_indicators(pd.read_csv(f"backtesting/raw_data/{ticker}_{timeframe}.csv"))
+        df[INDICATOR_FILE_COLUMNS].to_csv(f"backtesting/data/{ticker}_{timeframe}_with_indicators.csv", index=False)
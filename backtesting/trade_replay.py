@@ -0,0 +1,209 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from model.model import (
+    TRADE_REASONS,
+    TRADE_SIDES,
+    EarlyStopRule,
+    FinancialState,
+    Strategy,
+    TradeLedger,
+)
+
+# 잔고가 초기 자본의 1% 미만이면 파산 (backtest의 파산 체크와 동일)
+BANKRUPTCY_RATIO = 0.01
+
+
+@dataclass
+class ReplayResult:
+    state: FinancialState
+    trades: TradeLedger
+    # 기록된 거래 경로를 그대로 쓸 수 없어 봉 단위 백테스트를 다시 돌려야 하는 경우
+    needs_rerun: bool = False
+    rerun_reason: Optional[str] = None
+
+
+def _get_fee_rates(strat: Strategy):
+    entry_fee_rate = strat.maker_fee if strat.entry_role == "maker" else strat.taker_fee
+    exit_fee_rate = strat.maker_fee if strat.exit_role == "maker" else strat.taker_fee
+    return entry_fee_rate, exit_fee_rate
+
+
+def replay_trades(
+    trades,
+    strat: Strategy,
+    state: FinancialState,
+    input_amount_ratio: Optional[float] = None,
+    leverage: Optional[int] = None,
+    bankruptcy_ratio: Optional[float] = BANKRUPTCY_RATIO,
+    early_stop: EarlyStopRule = None,
+):
+    """기록된 거래 경로(진입/청산 가격, 사유)로 다른 진입 비율/레버리지의 잔고를 O(거래 수)로 재계산
+
+    진입 비율은 어느 봉에서 진입/청산하는지에 영향을 주지 않으므로 봉을 다시 돌 필요가 없다.
+    open_position/close_position과 같은 순서로 계산하므로 봉 단위 백테스트와 결과가 같다.
+    다음 경우는 경로 자체가 달라질 수 있어 needs_rerun으로 알린다.
+    - 잔고가 파산 기준 아래로 내려감 (파산 체크가 있는 백테스트는 그 시점에 멈춤)
+    - 레버리지가 바뀌었는데 TP/SL 청산이 있음 (TP/SL 가격이 레버리지에 따라 바뀜)
+    early_stop을 주면 MaskBacktester와 같은 시점(진입/청산 직후)에 같은 기준으로 확인하므로
+    다시 돌릴 필요 없이 그 거래에서 멈추고 state.stop_reason을 남긴다.
+    """
+    ledger = TradeLedger.from_trades(trades)
+    ratio = strat.input_amount_ratio if input_amount_ratio is None else input_amount_ratio
+    lev = strat.leverage if leverage is None else leverage
+    entry_fee_rate, exit_fee_rate = _get_fee_rates(strat)
+
+    reasons = ledger.reason_codes
+    price_exits = (TRADE_REASONS.index("tp"), TRADE_REASONS.index("sl"))
+    if lev != strat.leverage and np.isin(reasons, price_exits).any():
+        return ReplayResult(state=state, trades=ledger, needs_rerun=True, rerun_reason="leverage")
+
+    n = len(ledger)
+    out = {name: np.empty(n) for name in TradeLedger.FLOAT_FIELDS}
+    is_long = (ledger.side_codes == TRADE_SIDES.index("long")).tolist()
+    entry_prices = ledger.entry_price.tolist()
+    exit_prices = ledger.exit_price.tolist()
+    floor = state.initial_balance * bankruptcy_ratio if bankruptcy_ratio is not None else None
+    peak_balance = state.balance
+    size = n
+
+    for i in range(n):
+        price = entry_prices[i]
+        exit_price = exit_prices[i]
+
+        # open_position
+        notional = state.equity * ratio * lev
+        qty = notional / price
+        entry_fee = notional * entry_fee_rate
+        state.balance -= entry_fee
+        if early_stop is not None:
+            peak_balance = max(peak_balance, state.balance)
+            state.stop_reason = early_stop.get_stop_reason(state.balance, state.initial_balance, peak_balance)
+            if state.stop_reason is not None:
+                size = i
+                break
+        elif floor is not None and state.balance < floor:
+            return ReplayResult(state=state, trades=ledger, needs_rerun=True, rerun_reason="bankruptcy")
+
+        # close_position
+        exit_fee = exit_price * qty * exit_fee_rate
+        if is_long[i]:
+            realized = (exit_price - price) * qty
+        else:
+            realized = (price - exit_price) * qty
+        state.balance += realized - exit_fee
+        state.accumulated_pnl += realized - (entry_fee + exit_fee)
+        state.update_equity(0.0)
+
+        out["entry_price"][i] = price
+        out["exit_price"][i] = exit_price
+        out["qty"][i] = qty
+        out["entry_fee"][i] = entry_fee
+        out["exit_fee"][i] = exit_fee
+        out["realized_pnl"][i] = realized - (entry_fee + exit_fee)
+        out["roe"][i] = (realized / (notional / lev)) if lev else 0.0
+
+        if early_stop is not None:
+            peak_balance = max(peak_balance, state.balance)
+            state.stop_reason = early_stop.get_stop_reason(state.balance, state.initial_balance, peak_balance)
+            if state.stop_reason is not None:
+                size = i + 1
+                break
+        elif floor is not None and state.balance < floor:
+            return ReplayResult(state=state, trades=ledger, needs_rerun=True, rerun_reason="bankruptcy")
+
+    replayed = TradeLedger.from_arrays(
+        side_codes=ledger.side_codes[:size],
+        reason_codes=reasons[:size],
+        entry_time=ledger.entry_time[:size],
+        exit_time=ledger.exit_time[:size],
+        **{name: values[:size] for name, values in out.items()},
+    )
+    return ReplayResult(state=state, trades=replayed)
+
+
+@dataclass
+class SizingCurve:
+    fractions: np.ndarray
+    final_balance: np.ndarray
+    roi: np.ndarray  # %
+    max_drawdown: np.ndarray  # 고점 대비 최대 낙폭 (0~1)
+    ruined: np.ndarray  # 파산 기준 아래로 내려간 적이 있는지
+
+    def get_optimal_fraction(self):
+        """파산하지 않은 비율 중 ROI가 가장 높은 비율 (optimal f)"""
+        candidates = np.flatnonzero(~self.ruined)
+        if len(candidates) == 0:
+            return None
+        return float(self.fractions[candidates[np.argmax(self.roi[candidates])]])
+
+    def to_frame(self):
+        return pd.DataFrame(
+            {
+                "input_amount_ratio": self.fractions,
+                "final_balance": self.final_balance,
+                "roi": self.roi,
+                "max_drawdown": self.max_drawdown,
+                "ruined": self.ruined,
+            }
+        )
+
+
+def get_notional_returns(trades, strat: Strategy) -> np.ndarray:
+    """거래별 포지션 명목가 대비 순손익률 (진입/청산 수수료 포함)
+
+    진입 시 에쿼티 E, 진입 비율 f, 레버리지 L이면 명목가는 E x f x L 이므로
+    거래 한 번의 잔고 배수는 1 + f x L x 반환값이다.
+    """
+    ledger = TradeLedger.from_trades(trades)
+    entry_fee_rate, exit_fee_rate = _get_fee_rates(strat)
+    x = ledger.exit_price / ledger.entry_price
+    sign = np.where(ledger.side_codes == TRADE_SIDES.index("long"), 1.0, -1.0)
+    return sign * (x - 1.0) - entry_fee_rate - x * exit_fee_rate
+
+
+def evaluate_sizing_curve(
+    trades,
+    strat: Strategy,
+    fractions=None,
+    initial_balance: float = 1000000,
+    bankruptcy_ratio: float = BANKRUPTCY_RATIO,
+    max_cells: int = 20_000_000,
+):
+    """한 번의 백테스트 거래 경로로 여러 진입 비율의 ROI/최대 낙폭/파산 여부를 한 번에 계산
+
+    (비율 x 거래) 행렬의 누적곱으로 잔고 경로를 만들고, 파산 기준 아래로 처음 내려간 시점에서
+    경로를 멈춘 것으로 본다. 메모리를 위해 max_cells 단위로 비율을 나눠 계산한다.
+    """
+    fractions = np.linspace(0.01, 1.0, 100) if fractions is None else np.asarray(fractions, dtype=float)
+    m = get_notional_returns(trades, strat) * strat.leverage
+    n = len(m)
+    k = len(fractions)
+    final = np.ones(k)
+    mdd = np.zeros(k)
+    ruined = np.zeros(k, dtype=bool)
+    if n == 0:
+        return SizingCurve(fractions, final * initial_balance, np.zeros(k), mdd, ruined)
+
+    rows = max(1, max_cells // n)
+    for a in range(0, k, rows):
+        f = fractions[a : a + rows, None]
+        paths = np.cumprod(1.0 + f * m[None, :], axis=1)
+        below = paths < bankruptcy_ratio
+        hit = below.any(axis=1)
+        first = np.where(hit, below.argmax(axis=1), n - 1)
+        # 파산 이후 구간은 낙폭 계산에서 제외
+        alive = np.arange(n)[None, :] <= first[:, None]
+        peaks = np.maximum(np.maximum.accumulate(np.where(alive, paths, -np.inf), axis=1), 1.0)
+        drawdowns = np.where(alive, 1.0 - paths / peaks, 0.0)
+
+        final[a : a + rows] = paths[np.arange(len(first)), first]
+        mdd[a : a + rows] = drawdowns.max(axis=1)
+        ruined[a : a + rows] = hit
+
+    final_balance = final * initial_balance
+    roi = (final_balance - initial_balance) / initial_balance * 100
+    return SizingCurve(fractions, final_balance, roi, np.minimum(mdd, 1.0), ruined)
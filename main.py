@@ -1,36 +1,65 @@
-from math import floor
-from apscheduler.schedulers.blocking import BlockingScheduler
-from datetime import datetime
+import time
 import pandas as pd
 import requests
 import talib
 
 from model.model import Signal, Strategy
-from utils.utils import get_int_for_interval
+from utils.candle_clock import (
+    CLOSE_DELAY_MS,
+    CandleCloseScheduler,
+    ExchangeClock,
+    format_ms,
+)
+from utils.interval_calendar import count_candles, floor_open_time, get_last_close_ms
 from trading.account import (
     get_account_balance,
+    get_applied_config,
     get_max_available_size,
     get_positions,
     has_any_position,
+    restore_applied_config,
     set_account_level_to_margin,
 )
+from trading.live_state import SNAPSHOT_DIR, LiveState
 from trading.trade import close_position, open_position_with_ratio
 
 
-def my_task():
-    print(f"4시간마다 실행: {datetime.now()}")
-
-
-def get_basic_data(symbol: str, interval: str):
-    # data 가져오기
-    limit = 30
-    now = datetime.now()
-    now_timestamp = now.timestamp() * 1000
-    interval_ms = get_int_for_interval(interval) * 1000
-    one_tick_before = floor(now_timestamp - interval_ms)
-    url = f"https://api.binance.com/api/v3/klines?symbol={symbol}&interval={interval}&limit={limit}&endTime={one_tick_before}"
-    response = requests.get(url)
-    data = response.json()
+# 바이낸스 서버 시각 (봉 마감 판단과 스케줄에 공통으로 사용)
+exchange_clock = ExchangeClock()
+
+# 마감된 봉이 아직 안 보일 때 다시 요청하는 간격/횟수
+CANDLE_RETRY_SEC = 0.2
+CANDLE_MAX_RETRIES = 25
+
+
+def get_basic_data(
+    symbol: str, interval: str, close_time: int = None, limit: int = 30, start_time: int = None
+):
+    """close_time(밀리초)에 마감된 봉까지 최근 limit개 (없으면 거래소 시각 기준 마지막 마감 봉)
+
+    start_time을 주면 그 시각부터 받는다 (빈 구간만 받을 때).
+    마지막 행이 방금 마감된 봉이 아니면 (거래소 반영 지연) CANDLE_RETRY_SEC 간격으로 다시 요청한다.
+    """
+    if close_time is None:
+        close_time = get_last_close_ms(interval, exchange_clock.now_ms())
+    expected_open = floor_open_time(interval, close_time - 1)
+    # endTime은 봉 시작 시각 기준이라 close_time - 1이면 진행 중인 봉은 빠진다
+    url = f"https://api.binance.com/api/v3/klines?symbol={symbol}&interval={interval}&limit={limit}&endTime={close_time - 1}"
+    if start_time is not None:
+        url += f"&startTime={start_time}"
+    for attempt in range(CANDLE_MAX_RETRIES + 1):
+        response = requests.get(url, timeout=5)
+        data = response.json()
+        if not isinstance(data, list):
+            print(f"⚠️  봉 조회 오류: {data}")
+            data = []
+        if data and int(data[-1][0]) >= expected_open:
+            break
+        if attempt < CANDLE_MAX_RETRIES:
+            time.sleep(CANDLE_RETRY_SEC)
+    else:
+        last_open = format_ms(int(data[-1][0])) if data else "-"
+        raise RuntimeError(f"{symbol} {interval} 봉({format_ms(expected_open)})이 아직 없습니다 (마지막: {last_open})")
 
     print("================ 데이터 확인 ================")
     print("Total data length: ", len(data))
@@ -150,58 +179,170 @@ def get_additional_data(df: pd.DataFrame):
         return df
 
 
-def detect_data_and_trade(strategy: Strategy):
-    df = get_basic_data(strategy.ticker, strategy.timeframe)
-    df = get_additional_data(df)
+# flip에서 청산 주문 후 포지션이 0으로 조회될 때까지 확인하는 횟수와 간격 (초)
+FLAT_POLL_COUNT = 10
+FLAT_POLL_SEC = 0.5
+
+
+def _wait_until_flat(instId: str) -> bool:
+    """포지션이 0으로 조회되면 True, FLAT_POLL_COUNT번 확인해도 남아 있으면 False"""
+    for k in range(FLAT_POLL_COUNT):
+        if not has_any_position(instId):
+            return True
+        if k < FLAT_POLL_COUNT - 1:
+            time.sleep(FLAT_POLL_SEC)
+    return False
+
+
+def _open_live_position(strategy: Strategy, side: str):
+    """진입 주문 결과 (이미 포지션이 있거나 주문하지 못했으면 None)"""
+    return open_position_with_ratio(
+        leverage=strategy.leverage,
+        ratio=strategy.input_amount_ratio,
+        sl=strategy.sl_ratio,
+        instId=strategy.get_instId(),
+        side="buy" if side == "long" else "sell",
+    )
+
+
+def detect_data_and_trade(strategy: Strategy, df: pd.DataFrame = None, close_time: int = None):
+    """마지막 봉으로 진입/청산 판단 후 주문
+
+    df를 주면 (리플레이) 바이낸스에서 받지 않고 그 지표 데이터의 마지막 봉으로 판단한다.
+    close_time(밀리초)을 주면 그 시각에 마감된 봉까지 받아 판단한다.
+    반환값은 이번 판단 결과 (long, short, tp, exit, flip, flip_unconfirmed, 아무것도 안 했으면 None)
+    진입 주문이 되지 않으면 None, flip에서 반대 진입을 못 하고 청산만 했으면 exit이다.
+    flip에서 청산 주문 뒤 포지션이 0으로 확인되지 않으면 반대 진입 없이 flip_unconfirmed를 돌려준다
+    (포지션이 남아 있을 수 있으니 호출한 쪽에서 거래소 포지션을 다시 확인해야 함).
+    """
+    if df is None:
+        df = get_basic_data(strategy.ticker, strategy.timeframe, close_time)
+        df = get_additional_data(df)
     last_data = df.iloc[-1]
+    signal = strategy.signal
+    can_long = strategy.direction != "short"
+    can_short = strategy.direction != "long"
 
+    action = None
     has_position = has_any_position(strategy.get_instId())
     if not has_position:
-        if strategy.signal.buy_signal_func(last_data):
+        if can_long and signal.buy_signal_func(last_data):
             print("🔍 매수 신호 포착")
-            open_position_with_ratio(
-                leverage=strategy.leverage,
-                ratio=strategy.input_amount_ratio,
-                sl=strategy.sl_ratio,
-                instId=strategy.get_instId(),
-            )
+            if _open_live_position(strategy, "long") is not None:
+                action = "long"
+        elif can_short and signal.short_signal_func is not None and signal.short_signal_func(last_data):
+            print("🔍 숏 진입 신호 포착")
+            if _open_live_position(strategy, "short") is not None:
+                action = "short"
         else:
             print("🔍 매수 신호 없음")
     else:
         current_positions = get_positions(strategy.get_instId())
+        # net 모드에서 숏 포지션은 수량이 음수
+        is_short = float(current_positions[0]["pos"]) < 0
         breakeven_price = float(current_positions[0]["bePx"])
-        tp_price = breakeven_price * (1 + (strategy.tp_ratio / strategy.leverage))
-        if last_data["high"] >= tp_price:
+        if is_short:
+            tp_price = breakeven_price * (1 - (strategy.tp_ratio / strategy.leverage))
+            hit_tp = last_data["low"] <= tp_price
+            exit_func = signal.cover_signal_func
+            flip_func = signal.buy_signal_func
+        else:
+            tp_price = breakeven_price * (1 + (strategy.tp_ratio / strategy.leverage))
+            hit_tp = last_data["high"] >= tp_price
+            exit_func = signal.sell_signal_func
+            flip_func = signal.short_signal_func
+        if hit_tp or (exit_func is not None and exit_func(last_data)):
             close_position(instId=strategy.get_instId())
-        if strategy.signal.sell_signal_func(last_data):
+            action = "tp" if hit_tp else "exit"
+        elif strategy.direction == "flip" and flip_func is not None and flip_func(last_data):
+            print("🔍 반대 진입 신호 포착 (flip)")
             close_position(instId=strategy.get_instId())
-    return
-
-
-def start_detecting(strategy: Strategy):
-    scheduler = BlockingScheduler()
-    timeframe = strategy.timeframe
-    if timeframe == "1m":
-        scheduler.add_job(lambda: detect_data_and_trade(strategy), "cron", minute="*/1")
-    if timeframe == "5m":
-        scheduler.add_job(lambda: detect_data_and_trade(strategy), "cron", minute="*/5")
-    if timeframe == "15m":
-        scheduler.add_job(
-            lambda: detect_data_and_trade(strategy), "cron", minute="*/15"
-        )
-    if timeframe == "30m":
-        scheduler.add_job(
-            lambda: detect_data_and_trade(strategy), "cron", minute="*/30"
+            # 청산이 반영되기 전에 진입하면 기존 포지션이 있다고 보고 주문하지 않는다
+            if not _wait_until_flat(strategy.get_instId()):
+                print("⚠️  청산이 확인되지 않아 반대 진입을 하지 않습니다")
+                action = "flip_unconfirmed"
+            elif _open_live_position(strategy, "long" if is_short else "short") is None:
+                print("⚠️  반대 진입 주문이 되지 않아 청산만 했습니다")
+                action = "exit"
+            else:
+                action = "flip"
+    return action
+
+
+def update_live_candles(strategy: Strategy, state: LiveState, close_time: int):
+    """상태의 봉 버퍼에 close_time까지 빠진 봉만 받아 붙이고 받은 봉 수 반환
+
+    버퍼가 비었거나 빠진 구간이 버퍼보다 길면 버퍼 크기만큼 새로 받는다.
+    """
+    if state.last_close_ms is not None and state.last_close_ms >= close_time:
+        return 0
+    if state.last_close_ms is None:
+        gap = None
+    else:
+        gap = count_candles(strategy.timeframe, state.last_close_ms, close_time - 1)
+    if gap is None or gap >= state.capacity:
+        df = get_basic_data(strategy.ticker, strategy.timeframe, close_time, limit=state.capacity)
+    else:
+        df = get_basic_data(
+            strategy.ticker, strategy.timeframe, close_time, limit=gap, start_time=state.last_close_ms
         )
-    if timeframe == "1h":
-        scheduler.add_job(lambda: detect_data_and_trade(strategy), "cron", hour="*/1")
-    if timeframe == "4h":
-        scheduler.add_job(lambda: detect_data_and_trade(strategy), "cron", hour="*/4")
-    if timeframe == "1d":
-        scheduler.add_job(lambda: detect_data_and_trade(strategy), "cron", hour="*/24")
-
+    return state.append_candles(df)
+
+
+def get_position_side(instId: str):
+    """거래소에서 조회한 포지션 방향 (long, short, 없으면 None)"""
+    positions = get_positions(instId)
+    if positions and float(positions[0]["pos"]) != 0:
+        return "long" if float(positions[0]["pos"]) > 0 else "short"
+    return None
+
+
+def restore_live_state(strategy: Strategy, snapshot_dir: str = SNAPSHOT_DIR) -> LiveState:
+    """스냅샷에서 봉 버퍼/계정 설정/포지션을 복원하고 빠진 봉만 받아 바로 판단할 수 있는 상태로"""
+    start = time.perf_counter()
+    state = LiveState.load(strategy.ticker, strategy.timeframe, snapshot_dir)
+    restored = state is not None
+    if state is None:
+        state = LiveState(strategy.ticker, strategy.timeframe)
+    # 저장된 계정 설정은 거래소에서 확인된 값만 적용된 것으로 본다 (종목마다 get_leverage 한 번)
+    restore_applied_config(state.account_config)
+    fetched = update_live_candles(strategy, state, get_last_close_ms(strategy.timeframe, exchange_clock.now_ms()))
+
+    # 꺼져 있는 동안 스톱로스 등으로 포지션이 바뀌었을 수 있으니 거래소와 한 번 맞춘다
+    side = get_position_side(strategy.get_instId())
+    if restored and side != state.position_side:
+        print(f"⚠️  저장된 포지션({state.position_side})과 거래소 포지션({side})이 달라 거래소 기준으로 맞춥니다")
+    state.position_side = side
+
+    elapsed = (time.perf_counter() - start) * 1000
+    source = "스냅샷 복원" if restored else "새로 시작"
+    print(f"♻️  {source}: 봉 {len(state)}개 (새로 받은 봉 {fetched}개), 포지션 {side}, {elapsed:.0f}ms")
+    return state
+
+
+def run_live_step(strategy: Strategy, state: LiveState, close_time: int, snapshot_dir: str = SNAPSHOT_DIR):
+    """봉 마감마다: 빠진 봉만 받아 지표 계산 → 판단/주문 → 상태 스냅샷 저장"""
+    update_live_candles(strategy, state, close_time)
+    action = detect_data_and_trade(strategy, get_additional_data(state.get_candles()))
+    state.update_position(action)
+    if action == "flip_unconfirmed":
+        # 청산이 반영됐는지 모르니 저장 전에 거래소 포지션으로 맞춘다
+        state.position_side = get_position_side(strategy.get_instId())
+    state.account_config = get_applied_config()
+    state.save(snapshot_dir)
+    return action
+
+
+def start_detecting(strategy: Strategy, delay_ms: float = CLOSE_DELAY_MS, snapshot_dir: str = SNAPSHOT_DIR):
+    """바이낸스 서버 시각으로 봉이 마감될 때마다 (delay_ms 뒤) 마감된 봉으로 판단
+
+    시작할 때 snapshot_dir의 상태를 복원하고, 판단할 때마다 상태를 저장한다.
+    """
+    state = restore_live_state(strategy, snapshot_dir)
+    scheduler = CandleCloseScheduler(exchange_clock, delay_ms)
     scheduler.add_job(
-        lambda: print(f"스케줄러 실행 중.. {datetime.now()}"), "interval", seconds=30
+        strategy.timeframe,
+        lambda close_time: run_live_step(strategy, state, close_time, snapshot_dir),
     )
     scheduler.start()
 
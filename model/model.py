@@ -1,19 +1,23 @@
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 import os
 import json
+import numpy as np
+import pandas as pd
 from dataclasses import dataclass
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Callable, Literal, Optional, Any
 from datetime import datetime
 
 Side = Literal["long", "short"]
 Role = Literal["maker", "taker"]
+# long/short: 한 방향만, both: 시그널에 따라 롱/숏 진입, flip: 반대 진입 시그널이면 청산 후 반대로 진입
+Direction = Literal["long", "short", "both", "flip"]
 
 class Signal(BaseModel):
     buy_signal_func: Callable = Field(description="Function that generates buy signals")
     sell_signal_func: Callable = Field(description="Function that generates sell signals")
     description: str = Field(description="Description of the signal strategy")
+    short_signal_func: Optional[Callable] = Field(default=None, description="Function that generates short entry signals")
+    cover_signal_func: Optional[Callable] = Field(default=None, description="Function that generates short exit signals")
     
     class Config:
         arbitrary_types_allowed = True
@@ -32,6 +36,14 @@ class Strategy(BaseModel):
     exit_role: Role = "taker"
     start_date: Optional[str] = "2021-01-01"
     end_date: Optional[str] = datetime.now().strftime("%Y-%m-%d")
+    direction: Direction = "long"
+
+    @model_validator(mode="after")
+    def check_short_signal(self):
+        # short/both/flip은 숏 진입(flip은 롱 → 숏 전환) 판단에 short_signal_func를 쓴다
+        if self.direction != "long" and self.signal.short_signal_func is None:
+            raise ValueError(f"{self.direction} 전략에는 short_signal_func가 필요합니다")
+        return self
 
     def get_instId(self):
         if self.ticker == "BTCUSDT":
@@ -42,7 +54,8 @@ class Strategy(BaseModel):
             raise ValueError(f"Invalid ticker: {self.ticker}")
     
     def get_filename(self):
-        return f"{self.signal.description}_{self.ticker}_{self.timeframe}_{self.start_date}_{self.end_date}_leverage_{self.leverage}_tp_{self.tp_ratio*100}_sl_{self.sl_ratio*100}.txt"
+        direction = "" if self.direction == "long" else f"_{self.direction}"
+        return f"{self.signal.description}_{self.ticker}_{self.timeframe}_{self.start_date}_{self.end_date}_leverage_{self.leverage}_tp_{self.tp_ratio*100}_sl_{self.sl_ratio*100}{direction}.txt"
     def get_result_filename(self):
         return f"{self.signal.description}_{self.ticker}"
     def get_info(self):
@@ -55,11 +68,42 @@ Taker fee: {self.taker_fee * 100}%
 TP ROE: {self.tp_ratio * 100}%
 SL ROE: -{self.sl_ratio * 100}%
 Input amount ratio: {self.input_amount_ratio * 100}%
+Direction: {self.direction}
 Period: {self.start_date} ~ {self.end_date}
 """
 
 
 
+class EarlyStopRule(BaseModel):
+    """스윕에서 가망 없는 전략의 계산을 중단하는 규칙"""
+
+    bankruptcy_ratio: Optional[float] = Field(
+        default=0.01, description="잔고가 초기 자본의 이 비율 미만이면 중단"
+    )
+    max_drawdown: Optional[float] = Field(
+        default=None, description="잔고가 고점 대비 이 비율(0~1)보다 많이 빠지면 중단"
+    )
+    peer_percentile: Optional[float] = Field(
+        default=None, description="체크포인트에서 같은 스윕 전략들 잔고의 이 백분위 미만이면 중단"
+    )
+    checkpoints: int = Field(default=4, description="기간을 균등하게 나눈 동료 비교 체크포인트 수")
+
+    def get_stop_reason(self, balance: float, initial_balance: float, peak_balance: float):
+        """파산/낙폭 기준에 걸리면 사유, 아니면 None"""
+        if self.bankruptcy_ratio is not None and balance < initial_balance * self.bankruptcy_ratio:
+            return "bankruptcy"
+        if (
+            self.max_drawdown is not None
+            and peak_balance > 0
+            and 1 - balance / peak_balance > self.max_drawdown
+        ):
+            return "max_drawdown"
+        return None
+
+    def get_key(self):
+        return f"early_stop:{self.bankruptcy_ratio}:{self.max_drawdown}:{self.peer_percentile}:{self.checkpoints}"
+
+
 class FinancialState:
     def __init__(self, initial_balance: float):
         self.initial_balance = initial_balance
@@ -67,12 +111,15 @@ class FinancialState:
         self.equity = initial_balance
         self.accumulated_pnl = 0.0
         self.max_drawdown = 0.0
+        # 백테스트가 조기 종료된 사유 (bankruptcy, max_drawdown, peer_percentile)
+        self.stop_reason = None
 
     def initialize(self):
         self.balance = self.initial_balance
         self.equity = self.initial_balance
         self.accumulated_pnl = 0.0
         self.max_drawdown = 0.0
+        self.stop_reason = None
 
     def update_equity(self, unrealized_pnl: float):
         self.equity = self.balance + unrealized_pnl
@@ -84,7 +131,7 @@ class FinancialState:
         return round(((self.balance - self.initial_balance) / self.initial_balance * 100), 2)
 
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     side: Side
     entry_price: float
@@ -107,7 +154,7 @@ class Position:
         return self.unrealized_pnl(price) / margin if margin > 0 else 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class TradeLog:
     side: Side
     entry_time: any
@@ -122,6 +169,215 @@ class TradeLog:
     reason: str = "unknown"
 
 
+# TradeLedger의 범주형 코드 (순서가 곧 코드 값)
+TRADE_SIDES = ("long", "short")
+TRADE_REASONS = ("tp", "sl", "sell", "force_exit", "unknown", "flip")
+
+
+class TradeLedger:
+    """거래 기록을 열 단위 넘파이 배열로 보관하는 장부
+
+    시각은 int64 나노초, 가격/수량/손익은 float64, 사이드와 청산 사유는 int8 코드로 저장한다.
+    len()/반복/인덱싱을 지원해 TradeLog 리스트 대신 그대로 쓸 수 있고,
+    승률·손익비·청산 사유 통계는 get_stats()에서 배열 연산 한 번으로 계산한다.
+    """
+
+    FLOAT_FIELDS = ("entry_price", "exit_price", "qty", "entry_fee", "exit_fee", "realized_pnl", "roe")
+
+    def __init__(self, capacity: int = 64):
+        self._size = 0
+        self._side = np.empty(capacity, dtype=np.int8)
+        self._reason = np.empty(capacity, dtype=np.int8)
+        self._entry_time = np.empty(capacity, dtype=np.int64)
+        self._exit_time = np.empty(capacity, dtype=np.int64)
+        self._floats = np.empty((len(self.FLOAT_FIELDS), capacity), dtype=np.float64)
+
+    @staticmethod
+    def _to_ns(value) -> int:
+        return pd.Timestamp(value).as_unit("ns").value
+
+    @staticmethod
+    def _reason_code(reason: str) -> int:
+        return TRADE_REASONS.index(reason) if reason in TRADE_REASONS else TRADE_REASONS.index("unknown")
+
+    def _grow(self, needed: int):
+        capacity = max(needed, len(self._side) * 2, 64)
+        self._side = np.resize(self._side, capacity)
+        self._reason = np.resize(self._reason, capacity)
+        self._entry_time = np.resize(self._entry_time, capacity)
+        self._exit_time = np.resize(self._exit_time, capacity)
+        floats = np.empty((len(self.FLOAT_FIELDS), capacity), dtype=np.float64)
+        floats[:, : self._size] = self._floats[:, : self._size]
+        self._floats = floats
+
+    def append(self, trade: TradeLog):
+        i = self._size
+        if i == len(self._side):
+            self._grow(i + 1)
+        self._side[i] = TRADE_SIDES.index(trade.side)
+        self._reason[i] = self._reason_code(trade.reason)
+        self._entry_time[i] = self._to_ns(trade.entry_time)
+        self._exit_time[i] = self._to_ns(trade.exit_time)
+        self._floats[:, i] = (
+            trade.entry_price,
+            trade.exit_price,
+            trade.qty,
+            trade.entry_fee,
+            trade.exit_fee,
+            trade.realized_pnl,
+            trade.roe,
+        )
+        self._size += 1
+
+    @classmethod
+    def from_trades(cls, trades):
+        """TradeLog 리스트를 한 번에 장부로 변환"""
+        if isinstance(trades, TradeLedger):
+            return trades
+        ledger = cls(capacity=max(len(trades), 1))
+        n = len(trades)
+        ledger._side[:n] = [TRADE_SIDES.index(t.side) for t in trades]
+        ledger._reason[:n] = [cls._reason_code(t.reason) for t in trades]
+        ledger._entry_time[:n] = [cls._to_ns(t.entry_time) for t in trades]
+        ledger._exit_time[:n] = [cls._to_ns(t.exit_time) for t in trades]
+        for k, name in enumerate(cls.FLOAT_FIELDS):
+            ledger._floats[k, :n] = [getattr(t, name) for t in trades]
+        ledger._size = n
+        return ledger
+
+    @classmethod
+    def from_arrays(cls, side_codes, reason_codes, entry_time, exit_time, **floats):
+        """열 배열로 장부 생성 (floats는 FLOAT_FIELDS 이름의 배열)"""
+        n = len(side_codes)
+        ledger = cls(capacity=max(n, 1))
+        ledger._side[:n] = side_codes
+        ledger._reason[:n] = reason_codes
+        ledger._entry_time[:n] = entry_time
+        ledger._exit_time[:n] = exit_time
+        for k, name in enumerate(cls.FLOAT_FIELDS):
+            ledger._floats[k, :n] = floats[name]
+        ledger._size = n
+        return ledger
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        values = dict(zip(self.FLOAT_FIELDS, self._floats[:, i].tolist()))
+        return TradeLog(
+            side=TRADE_SIDES[self._side[i]],
+            entry_time=pd.Timestamp(int(self._entry_time[i])),
+            exit_time=pd.Timestamp(int(self._exit_time[i])),
+            reason=TRADE_REASONS[self._reason[i]],
+            **values,
+        )
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    def to_trades(self):
+        return list(self)
+
+    # 열 단위 배열 (복사 없는 뷰)
+    @property
+    def side_codes(self):
+        return self._side[: self._size]
+
+    @property
+    def reason_codes(self):
+        return self._reason[: self._size]
+
+    @property
+    def entry_time(self):
+        return self._entry_time[: self._size]
+
+    @property
+    def exit_time(self):
+        return self._exit_time[: self._size]
+
+    @property
+    def entry_price(self):
+        return self._floats[0, : self._size]
+
+    @property
+    def exit_price(self):
+        return self._floats[1, : self._size]
+
+    @property
+    def qty(self):
+        return self._floats[2, : self._size]
+
+    @property
+    def entry_fee(self):
+        return self._floats[3, : self._size]
+
+    @property
+    def exit_fee(self):
+        return self._floats[4, : self._size]
+
+    @property
+    def realized_pnl(self):
+        return self._floats[5, : self._size]
+
+    @property
+    def roe(self):
+        return self._floats[6, : self._size]
+
+    def win_rate(self):
+        if self._size == 0:
+            return 0.0
+        return float((self.realized_pnl > 0).mean() * 100)
+
+    def get_stats(self):
+        """승률, 평균 손익, 손익비, 청산 사유별 횟수"""
+        pnl = self.realized_pnl
+        total = self._size
+        wins = pnl > 0
+        losses = pnl < 0
+        win_count = int(wins.sum())
+        loss_count = int(losses.sum())
+        gross_profit = float(pnl[wins].sum())
+        gross_loss = float(pnl[losses].sum())
+        avg_win = gross_profit / win_count if win_count else 0.0
+        avg_loss = gross_loss / loss_count if loss_count else 0.0
+        reason_counts = np.bincount(self.reason_codes, minlength=len(TRADE_REASONS))
+        return {
+            "total_trades": total,
+            "win_count": win_count,
+            "loss_count": loss_count,
+            "win_rate": win_count / total * 100 if total else 0.0,
+            "gross_profit": gross_profit,
+            "gross_loss": gross_loss,
+            "avg_win": avg_win,
+            "avg_loss": avg_loss,
+            # 총이익 / 총손실
+            "profit_factor": gross_profit / abs(gross_loss) if gross_loss else None,
+            # 평균 이익 / 평균 손실 (로그의 "손익비")
+            "payoff_ratio": abs(avg_win / avg_loss) if avg_loss and win_count else None,
+            "reason_counts": dict(zip(TRADE_REASONS, reason_counts.tolist())),
+        }
+
+
+def _load_pyplot():
+    """그래프를 처음 그릴 때만 matplotlib을 불러온다 (실거래/백테스트 워커는 import 비용을 내지 않음)"""
+    import matplotlib
+
+    # macOS에서 멀티쓰레드 환경에서 발생하는 NSWindow 에러 방지
+    matplotlib.use("Agg")  # non-interactive backend 사용
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+
+    # 한글 폰트 설정
+    matplotlib.rcParams["font.family"] = "DejaVu Sans"
+    matplotlib.rcParams["axes.unicode_minus"] = False
+    return plt, mdates
+
+
 class TradingLogger:
     """거래 로그를 기록하는 클래스"""
 
@@ -202,6 +458,12 @@ class TradingLogger:
                 f"graph/balance_{strategy.get_filename()}.png",
             )
 
+        try:
+            plt, mdates = _load_pyplot()
+        except ImportError:
+            print("Warning: matplotlib not available. Balance graphs will not be generated.")
+            return None
+
         try:
             plt.figure(figsize=(12, 6))
 
@@ -337,48 +599,35 @@ class TradingLogger:
 
         # 거래 분석 추가
         if trades:
-            tp_trades = [t for t in trades if t.reason == "tp"]
-            sl_trades = [t for t in trades if t.reason == "sl"]
-            force_exit_trades = [t for t in trades if t.reason == "force_exit"]
-            other_trades = [
-                t for t in trades if t.reason not in ["tp", "sl", "force_exit"]
-            ]
-
-            winning_trades = [t for t in trades if t.realized_pnl > 0]
-            losing_trades = [t for t in trades if t.realized_pnl < 0]
-            win_rate = len(winning_trades) / len(trades) * 100
+            stats = TradeLedger.from_trades(trades).get_stats()
+            total = stats["total_trades"]
+            reasons = stats["reason_counts"]
+            other_count = total - reasons["tp"] - reasons["sl"] - reasons["force_exit"]
 
             self._write_log(f"\n=== 거래 분석 ===")
             self._write_log(
-                f"TP 달성: {len(tp_trades)}회 ({len(tp_trades)/len(trades)*100:.1f}%)"
+                f"TP 달성: {reasons['tp']}회 ({reasons['tp']/total*100:.1f}%)"
             )
             self._write_log(
-                f"SL 달성: {len(sl_trades)}회 ({len(sl_trades)/len(trades)*100:.1f}%)"
+                f"SL 달성: {reasons['sl']}회 ({reasons['sl']/total*100:.1f}%)"
             )
             self._write_log(
-                f"강제 청산: {len(force_exit_trades)}회 ({len(force_exit_trades)/len(trades)*100:.1f}%)"
+                f"강제 청산: {reasons['force_exit']}회 ({reasons['force_exit']/total*100:.1f}%)"
             )
             self._write_log(
-                f"기타 청산: {len(other_trades)}회 ({len(other_trades)/len(trades)*100:.1f}%)"
+                f"기타 청산: {other_count}회 ({other_count/total*100:.1f}%)"
             )
             self._write_log(
-                f"승률: {win_rate:.2f}% (승리: {len(winning_trades)}회, 패배: {len(losing_trades)}회)"
+                f"승률: {stats['win_rate']:.2f}% (승리: {stats['win_count']}회, 패배: {stats['loss_count']}회)"
             )
 
-            if winning_trades:
-                avg_win = sum(t.realized_pnl for t in winning_trades) / len(
-                    winning_trades
-                )
-                self._write_log(f"평균 수익: {avg_win:,.2f}")
-            if losing_trades:
-                avg_loss = sum(t.realized_pnl for t in losing_trades) / len(
-                    losing_trades
-                )
-                self._write_log(f"평균 손실: {avg_loss:,.2f}")
-                if winning_trades and avg_loss != 0:
-                    profit_factor = abs(avg_win / avg_loss)
-                    self._write_log(f"손익비: {profit_factor:.2f}")
-                elif winning_trades:
+            if stats["win_count"]:
+                self._write_log(f"평균 수익: {stats['avg_win']:,.2f}")
+            if stats["loss_count"]:
+                self._write_log(f"평균 손실: {stats['avg_loss']:,.2f}")
+                if stats["payoff_ratio"] is not None:
+                    self._write_log(f"손익비: {stats['payoff_ratio']:.2f}")
+                elif stats["win_count"]:
                     self._write_log(f"손익비: N/A (손실 없음)")
 
         # 잔고 그래프 생성
@@ -2,30 +2,92 @@ import os
 from dotenv import load_dotenv
 
 load_dotenv()
-import okx.Account as Account
-from .config import config
+from .clients import get_account_api
+from .instruments import get_instrument
+
+
+def __getattr__(name):
+    # 기존 trading.account.accountAPI 접근 호환 (처음 접근할 때 생성)
+    if name == "accountAPI":
+        return get_account_api()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# 이미 적용한 계정 설정 (계정 레벨, instId:mgnMode별 레버리지), 같은 설정이면 다시 요청하지 않는다
+# 설정을 적용한 클라이언트가 바뀌면 (다른 거래소/대역) 처음부터 다시 적용한다
+_applied_config = {"client": None, "acctLv": None, "leverage": {}}
+
+
+def _get_applied_config():
+    client = get_account_api()
+    if _applied_config["client"] is not client:
+        _applied_config.update(client=client, acctLv=None, leverage={})
+    return _applied_config
+
+
+def get_applied_config():
+    """적용한 계정 설정 (라이브 상태 스냅샷 저장용)"""
+    applied = _get_applied_config()
+    return {"acctLv": applied["acctLv"], "leverage": dict(applied["leverage"])}
+
+
+def restore_applied_config(config: dict):
+    """스냅샷의 계정 설정 중 거래소에서 확인된 값만 이미 적용한 것으로 복원
+
+    꺼져 있는 동안 설정이 바뀌었을 수 있으므로 계정 레벨은 계정 설정 조회 한 번,
+    레버리지는 종목(instId:mgnMode)마다 get_leverage 한 번으로 확인한다.
+    다르거나 확인하지 못한 값은 버려 다음 주문 때 다시 설정하게 한다.
+    """
+    applied = _get_applied_config()
+    applied["acctLv"] = None
+    applied["leverage"] = {}
+    acct_lv = config.get("acctLv")
+    if acct_lv is not None:
+        try:
+            data = get_account_api().get_account_config()["data"]
+            if data and str(data[0].get("acctLv")) == str(acct_lv):
+                applied["acctLv"] = str(acct_lv)
+            else:
+                print(f"⚠️  저장된 계정 레벨({acct_lv})이 거래소와 달라 다음 주문 때 다시 설정합니다")
+        except Exception as e:
+            print(f"계정 설정 확인 중 오류 발생 (다음 주문 때 다시 설정): {e}")
+    for key, lever in config.get("leverage", {}).items():
+        instId, mgnMode = key.rsplit(":", 1)
+        try:
+            data = get_account_api().get_leverage(instId=instId, mgnMode=mgnMode)["data"]
+        except Exception as e:
+            print(f"레버리지 확인 중 오류 발생 ({key}, 다음 주문 때 다시 설정): {e}")
+            continue
+        # long/short 모드면 posSide별로 여러 줄이라 모두 같아야 적용된 것으로 본다
+        levers = {float(row["lever"]) for row in data}
+        if levers == {float(lever)}:
+            applied["leverage"][key] = str(lever)
+        else:
+            print(f"⚠️  저장된 레버리지 {lever}배가 거래소 설정({sorted(levers)})과 달라 다음 주문 때 다시 설정합니다 ({key})")
 
-accountAPI = Account.AccountAPI(
-    config["api_key"], config["secret_key"], config["passphrase"], False, config["flag"]
-)
 
 def get_account_config():
-    account_info = accountAPI.get_account_config()
+    account_info = get_account_api().get_account_config()
     print(f"현재 계정 모드: {account_info['data']}")
     return account_info['data']
     
 def set_account_level_to_margin():
-    accountAPI.set_account_level(acctLv="3")
+    applied = _get_applied_config()
+    if applied["acctLv"] == "3":
+        return
+    result = get_account_api().set_account_level(acctLv="3")
     get_account_config()
+    if result.get("code") == "0":
+        applied["acctLv"] = "3"
     return
 
 def get_account_balance():
-    balance = accountAPI.get_account_balance()
+    balance = get_account_api().get_account_balance()
     print("BALANCE IS:", balance)
     return balance['data'][0]
 
 def get_current_account():
-    account_info = accountAPI.get_account_config()
+    account_info = get_account_api().get_account_config()
     print(f"현재 계정 모드: {account_info['data']}")
     return
 
@@ -42,7 +104,7 @@ def get_max_leverage(instId="BTC-USDT-SWAP"):
     try:
         # OKX API에서 최대 레버리지 정보 조회
         # 선물 마켓에서는 격리 마진 모드로 조회
-        result = accountAPI.get_leverage(instId=instId, mgnMode="isolated")
+        result = get_account_api().get_leverage(instId=instId, mgnMode="isolated")
         print(f"레버리지 정보 조회 결과: {result}")
         return result
     except Exception as e:
@@ -59,18 +121,24 @@ def set_leverage(instId="BTC-USDT-SWAP", lever="5", mgnMode="isolated"):
         lever (str): 레버리지 배수
         mgnMode (str): 마진 모드 (isolated: 격리, cross: 크로스)
     """
+    applied = _get_applied_config()
+    key = f"{instId}:{mgnMode}"
+    if applied["leverage"].get(key) == str(lever):
+        print(f"레버리지 {lever}배는 이미 설정되어 있습니다 ({key})")
+        return None
     try:
-        # 먼저 최대 레버리지 확인
-        max_leverage_info = get_max_leverage(instId)
-        print(f"마켓 {instId}의 최대 레버리지 정보: {max_leverage_info}")
-        
+        # 최대 레버리지는 계약 정보 캐시에서 확인
+        print(f"마켓 {instId}의 최대 레버리지: {get_instrument(instId).max_lever}")
+
         # 레버리지 설정
-        result = accountAPI.set_leverage(
+        result = get_account_api().set_leverage(
             instId=instId,
             lever=lever,
             mgnMode=mgnMode
         )
         print(f"레버리지 설정 결과: {result}")
+        if result.get("code") == "0":
+            applied["leverage"][key] = str(lever)
         return result
     except Exception as e:
         print(f"레버리지 설정 중 오류 발생: {e}")
@@ -84,7 +152,7 @@ def get_positions(instId="BTC-USDT-SWAP"):
         instId (str): 마켓 ID (예: BTC-USDT-SWAP)
     """
     try:
-        result = accountAPI.get_positions(instId=instId)
+        result = get_account_api().get_positions(instId=instId)
         print(f"포지션 조회 결과: {result}")
         return result['data']
     except Exception as e:
@@ -104,7 +172,7 @@ def get_account_position_risk():
     계정의 포지션 리스크 정보를 조회하는 함수
     """
     try:
-        result = accountAPI.get_account_position_risk()
+        result = get_account_api().get_account_position_risk()
         print(f"포지션 리스크 정보: {result}")
         return result
     except Exception as e:
@@ -112,7 +180,7 @@ def get_account_position_risk():
         return None
 
 def get_max_available_size(instId="BTC-USDT-SWAP", tdMode="isolated"):
-    result = accountAPI.get_max_avail_size(  
+    result = get_account_api().get_max_avail_size(  
         instId=instId,  
         tdMode=tdMode  
     )
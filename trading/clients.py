@@ -0,0 +1,91 @@
+import threading
+from contextlib import contextmanager
+
+from .config import config
+
+# 거래 모듈이 쓰는 클라이언트 종류 (account, trade, market, public)
+CLIENT_KINDS = ("account", "trade", "market", "public")
+
+
+def okx_client_factory(kind: str):
+    """실제 OKX SDK 클라이언트 생성 (config의 API 키 사용)
+
+    OKX SDK는 httpx 등을 함께 불러와 무거우므로 클라이언트를 처음 쓸 때 import한다.
+    """
+    if kind == "account":
+        import okx.Account as Account
+
+        return Account.AccountAPI(
+            config["api_key"], config["secret_key"], config["passphrase"], False, config["flag"]
+        )
+    if kind == "trade":
+        import okx.Trade as Trade
+
+        return Trade.TradeAPI(
+            config["api_key"], config["secret_key"], config["passphrase"], False, config["flag"]
+        )
+    if kind == "market":
+        import okx.MarketData as MarketData
+
+        return MarketData.MarketAPI(flag=config["flag"])
+    if kind == "public":
+        from okx.PublicData import PublicAPI
+
+        return PublicAPI(
+            config["api_key"], config["secret_key"], config["passphrase"], False, config["flag"]
+        )
+    raise ValueError(f"Invalid client kind: {kind}")
+
+
+_factory = okx_client_factory
+_clients = {}
+_lock = threading.Lock()
+
+
+def set_client_factory(factory=None):
+    """클라이언트 생성 함수 교체 (None이면 실제 OKX), 이미 만든 클라이언트는 버린다
+
+    factory는 종류 이름(CLIENT_KINDS)을 받아 OKX SDK와 같은 메서드를 가진 객체를 반환한다.
+    """
+    global _factory
+    with _lock:
+        _factory = factory or okx_client_factory
+        _clients.clear()
+
+
+@contextmanager
+def use_client_factory(factory):
+    """with 블록 안에서만 factory의 클라이언트를 쓰고 끝나면 이전 factory로 복구"""
+    previous = _factory
+    set_client_factory(factory)
+    try:
+        yield
+    finally:
+        set_client_factory(previous)
+
+
+def get_client(kind: str):
+    """종류별 클라이언트 (factory당 한 번만 생성)"""
+    client = _clients.get(kind)
+    if client is None:
+        with _lock:
+            if kind not in _clients:
+                _clients[kind] = _factory(kind)
+            client = _clients[kind]
+    return client
+
+
+def get_account_api():
+    return get_client("account")
+
+
+def get_trade_api():
+    return get_client("trade")
+
+
+def get_market_api():
+    return get_client("market")
+
+
+def get_public_api():
+    return get_client("public")
@@ -0,0 +1,95 @@
+import threading
+import time
+from dataclasses import dataclass
+from math import floor
+
+from .clients import get_public_api
+from .public import get_instruments
+
+# 계약 정보를 다시 받는 주기 (초)
+INSTRUMENT_REFRESH_SEC = 3600
+
+
+@dataclass(frozen=True)
+class InstrumentSpec:
+    """OKX 무기한 스왑 계약 정보"""
+
+    instId: str
+    ct_val: float  # 계약 1개의 기초자산 수량 (BTC-USDT-SWAP은 0.01 BTC)
+    lot_sz: str  # 주문 수량 단위 (계약 수)
+    min_sz: float  # 최소 주문 수량 (계약 수)
+    tick_sz: str  # 가격 단위
+    max_lever: float
+
+    @staticmethod
+    def _decimals(step: str) -> int:
+        return len(step.rstrip("0").split(".")[1]) if "." in step.rstrip("0") else 0
+
+    def get_contract_size(self, notional_usdt: float, price: float) -> float:
+        """명목 금액(USDT)을 lotSz 단위로 내림한 계약 수 (최소 수량 미만이면 0)"""
+        lot = float(self.lot_sz)
+        contracts = notional_usdt / (price * self.ct_val)
+        size = round(floor(contracts / lot + 1e-9) * lot, self._decimals(self.lot_sz))
+        return size if size >= self.min_sz else 0.0
+
+    def format_size(self, size: float) -> str:
+        return f"{size:.{self._decimals(self.lot_sz)}f}"
+
+    def format_price(self, price: float) -> str:
+        """tickSz 단위로 반올림한 가격 문자열"""
+        tick = float(self.tick_sz)
+        return f"{round(price / tick) * tick:.{self._decimals(self.tick_sz)}f}"
+
+
+_specs = {}
+_state = {"client": None, "loaded_at": None}
+_lock = threading.Lock()
+
+
+def _load_instruments():
+    specs = {}
+    for item in get_instruments(instType="SWAP"):
+        specs[item["instId"]] = InstrumentSpec(
+            instId=item["instId"],
+            ct_val=float(item["ctVal"]),
+            lot_sz=item["lotSz"],
+            min_sz=float(item["minSz"]),
+            tick_sz=item["tickSz"],
+            max_lever=float(item["lever"]),
+        )
+    return specs
+
+
+def refresh_instruments(force: bool = False):
+    """계약 정보를 한 번에 받아 캐시 (INSTRUMENT_REFRESH_SEC가 지났거나 클라이언트가 바뀌면 다시)
+
+    다시 받다가 실패하면 이전 캐시를 그대로 쓴다.
+    """
+    client = get_public_api()
+    with _lock:
+        fresh = (
+            _state["client"] is client
+            and _state["loaded_at"] is not None
+            and time.monotonic() - _state["loaded_at"] < INSTRUMENT_REFRESH_SEC
+        )
+        if fresh and not force:
+            return _specs
+        try:
+            specs = _load_instruments()
+        except Exception as e:
+            if _state["client"] is not client or not _specs:
+                raise
+            print(f"⚠️  계약 정보 갱신 실패 (이전 정보 사용): {e}")
+            _state["loaded_at"] = time.monotonic()
+            return _specs
+        _specs.clear()
+        _specs.update(specs)
+        _state.update(client=client, loaded_at=time.monotonic())
+        return _specs
+
+
+def get_instrument(instId: str) -> InstrumentSpec:
+    specs = refresh_instruments()
+    if instId not in specs:
+        raise ValueError(f"Unknown instrument: {instId}")
+    return specs[instId]
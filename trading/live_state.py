@@ -0,0 +1,135 @@
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.interval_calendar import get_next_open_time
+
+SNAPSHOT_DIR = "trading/state"
+SNAPSHOT_VERSION = 1
+
+# 실거래 판단에 쓰는 최근 봉 수 (MACD/EMA 등 지표가 충분히 안정되는 길이)
+CANDLE_BUFFER_SIZE = 300
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+@dataclass
+class LiveState:
+    """실거래 러너의 재시작용 상태
+
+    최근 capacity개 봉(시작 시각 밀리초 + OHLCV 배열), 마지막으로 처리한 봉의 마감 시각,
+    이미 적용한 계정 설정, 러너가 알고 있는 포지션 방향을 .npz 한 파일로 저장/복원한다.
+    지표는 봉 버퍼에서 다시 계산한다 (수백 개 봉이라 수 밀리초).
+    """
+
+    ticker: str
+    timeframe: str
+    capacity: int = CANDLE_BUFFER_SIZE
+    open_times: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    ohlcv: np.ndarray = field(default_factory=lambda: np.empty((0, len(OHLCV_COLUMNS)), dtype=np.float64))
+    last_close_ms: Optional[int] = None
+    account_config: dict = field(default_factory=dict)
+    position_side: Optional[str] = None
+    last_action: Optional[str] = None
+    saved_at: Optional[float] = None
+
+    def __len__(self):
+        return len(self.open_times)
+
+    def append_candles(self, df: pd.DataFrame):
+        """get_basic_data 형식(timestamp 인덱스, OHLCV)의 봉을 붙이고 capacity개만 남김 (이미 있는 봉은 무시)"""
+        times = pd.DatetimeIndex(df.index).as_unit("ms").asi8
+        values = df[OHLCV_COLUMNS].to_numpy(dtype=np.float64)
+        if len(self.open_times):
+            new = times > self.open_times[-1]
+            times, values = times[new], values[new]
+        if len(times) == 0:
+            return 0
+        self.open_times = np.concatenate([self.open_times, times])[-self.capacity :]
+        self.ohlcv = np.concatenate([self.ohlcv, values])[-self.capacity :]
+        self.last_close_ms = get_next_open_time(self.timeframe, int(self.open_times[-1]))
+        return len(times)
+
+    def get_candles(self) -> pd.DataFrame:
+        """봉 버퍼를 get_basic_data와 같은 형식의 DataFrame으로"""
+        index = pd.DatetimeIndex(self.open_times.astype("datetime64[ms]"), name="timestamp")
+        return pd.DataFrame(self.ohlcv.copy(), index=index, columns=OHLCV_COLUMNS)
+
+    def update_position(self, action: Optional[str]):
+        """detect_data_and_trade 판단 결과로 알고 있는 포지션 방향 갱신
+
+        flip_unconfirmed는 청산 여부를 모르므로 방향을 바꾸지 않는다 (거래소 조회로 맞출 것).
+        """
+        if action is None:
+            return
+        self.last_action = action
+        if action in ("long", "short"):
+            self.position_side = action
+        elif action in ("tp", "exit"):
+            self.position_side = None
+        elif action == "flip":
+            self.position_side = "short" if self.position_side == "long" else "long"
+
+    def get_path(self, snapshot_dir: str = SNAPSHOT_DIR) -> str:
+        return os.path.join(snapshot_dir, f"{self.ticker}_{self.timeframe}.npz")
+
+    def save(self, snapshot_dir: str = SNAPSHOT_DIR) -> str:
+        """임시 파일에 쓴 뒤 교체해 저장 중 죽어도 이전 스냅샷이 남게 한다"""
+        os.makedirs(snapshot_dir, exist_ok=True)
+        self.saved_at = time.time()
+        meta = {
+            "version": SNAPSHOT_VERSION,
+            "ticker": self.ticker,
+            "timeframe": self.timeframe,
+            "capacity": self.capacity,
+            "last_close_ms": self.last_close_ms,
+            "account_config": self.account_config,
+            "position_side": self.position_side,
+            "last_action": self.last_action,
+            "saved_at": self.saved_at,
+        }
+        path = self.get_path(snapshot_dir)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                open_times=self.open_times,
+                ohlcv=self.ohlcv,
+                meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+            )
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, ticker: str, timeframe: str, snapshot_dir: str = SNAPSHOT_DIR) -> Optional["LiveState"]:
+        """스냅샷 복원 (없거나 읽을 수 없거나 다른 버전/종목이면 None)"""
+        path = cls(ticker, timeframe).get_path(snapshot_dir)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+                open_times = data["open_times"].astype(np.int64)
+                ohlcv = data["ohlcv"].astype(np.float64)
+        except Exception as e:
+            print(f"⚠️  상태 스냅샷을 읽을 수 없습니다 ({path}): {e}")
+            return None
+        if meta.get("version") != SNAPSHOT_VERSION or (meta["ticker"], meta["timeframe"]) != (ticker, timeframe):
+            print(f"⚠️  상태 스냅샷 형식이 맞지 않아 무시합니다 ({path})")
+            return None
+        return cls(
+            ticker=ticker,
+            timeframe=timeframe,
+            capacity=meta["capacity"],
+            open_times=open_times,
+            ohlcv=ohlcv,
+            last_close_ms=meta["last_close_ms"],
+            account_config=meta["account_config"],
+            position_side=meta["position_side"],
+            last_action=meta["last_action"],
+            saved_at=meta["saved_at"],
+        )
@@ -1,12 +1,41 @@
-import okx.MarketData as MarketData
-from .config import config
+import time
+
+from .clients import get_market_api
+
+# 캐시한 현재가를 그대로 쓰는 최대 시간 (초)
+PRICE_MAX_AGE_SEC = 2
+
+# instId별 (현재가, 받은 시각, 클라이언트), 클라이언트가 바뀌면 (다른 거래소/대역) 쓰지 않는다
+_last_prices = {}
+
+
+def __getattr__(name):
+    # 기존 trading.market.marketDataAPI 접근 호환 (처음 접근할 때 생성)
+    if name == "marketDataAPI":
+        return get_market_api()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-marketDataAPI = MarketData.MarketAPI(flag=config["flag"])
 
 def get_ticker(ticker="BTC-USDT-SWAP"):
-    result = marketDataAPI.get_ticker(instId=ticker)
+    result = get_market_api().get_ticker(instId=ticker)
     print(result)
-    return float(result['data'][0]['last'])
+    price = float(result['data'][0]['last'])
+    update_last_price(ticker, price)
+    return price
+
+
+def update_last_price(instId, price):
+    """다른 경로(시세 수신, 리플레이)로 알게 된 현재가를 캐시에 반영"""
+    _last_prices[instId] = (float(price), time.monotonic(), get_market_api())
+
+
+def get_last_price(instId="BTC-USDT-SWAP", max_age_sec=None):
+    """max_age_sec(기본 PRICE_MAX_AGE_SEC)보다 새로운 캐시가 있으면 그 값, 없으면 REST로 조회"""
+    max_age_sec = PRICE_MAX_AGE_SEC if max_age_sec is None else max_age_sec
+    cached = _last_prices.get(instId)
+    if cached is not None and cached[2] is get_market_api() and time.monotonic() - cached[1] <= max_age_sec:
+        return cached[0]
+    return get_ticker(ticker=instId)
 
 
 if __name__ == "__main__":
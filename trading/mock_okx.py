@@ -0,0 +1,456 @@
+import contextlib
+import random
+import threading
+import time
+from collections import defaultdict
+from itertools import count
+from typing import Callable, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+from .clients import use_client_factory
+
+# 종목별 계약 정보 (OKX 무기한 스왑과 같은 값)
+DEFAULT_INSTRUMENTS = {
+    "BTC-USDT-SWAP": {"ctVal": "0.01", "lotSz": "0.01", "minSz": "0.01", "tickSz": "0.1", "lever": "100"},
+    "ETH-USDT-SWAP": {"ctVal": "0.1", "lotSz": "0.01", "minSz": "0.01", "tickSz": "0.01", "lever": "100"},
+}
+DEFAULT_PRICES = {"BTC-USDT-SWAP": 60000.0, "ETH-USDT-SWAP": 3000.0}
+
+
+class MockOKXConfig(BaseModel):
+    """로컬 OKX 대역의 지연/체결 설정"""
+
+    initial_balance: float = Field(default=10000.0, description="시작 USDT 잔고")
+    latency: float = Field(default=0.0, description="API 호출마다 기다리는 시간 (초)")
+    latency_jitter: float = Field(default=0.0, description="지연에 더하는 0~jitter 초 균등 난수")
+    fill_ratio: float = Field(default=1.0, description="시장가 주문 중 체결되는 비율 (부분 체결)")
+    slippage_bps: float = Field(default=0.0, description="시장가 체결가 슬리피지 (bp, 불리한 방향)")
+    reject_rate: float = Field(default=0.0, description="주문 거부 확률")
+    taker_fee: float = Field(default=0.0005, description="시장가 수수료율")
+    seed: int = Field(default=0, description="지연/거부 난수 seed")
+
+
+def _ok(data):
+    return {"code": "0", "msg": "", "data": data}
+
+
+def _error(code: str, msg: str, data=None):
+    return {"code": code, "msg": msg, "data": data if data is not None else []}
+
+
+class MockOKXExchange:
+    """OKX API를 흉내 내는 프로세스 내부 거래소 (net 포지션 모드, 격리 마진)
+
+    trading 모듈이 쓰는 엔드포인트(잔고, 포지션, 최대 주문 가능 금액, 레버리지, 시장가 주문,
+    스톱 알고 주문, 포지션 종료, 티커)를 OKX와 같은 응답 형식으로 돌려준다.
+    set_price로 가격을 바꾸면 걸려 있는 스톱 주문이 체결된다.
+    """
+
+    def __init__(
+        self,
+        config: MockOKXConfig = None,
+        prices: Optional[Dict[str, float]] = None,
+        instruments: Optional[Dict[str, dict]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.config = config or MockOKXConfig()
+        self.prices = dict(DEFAULT_PRICES if prices is None else prices)
+        self.instruments = dict(DEFAULT_INSTRUMENTS if instruments is None else instruments)
+        self.balance = self.config.initial_balance
+        self.acct_lv = "2"
+        self.leverage = defaultdict(lambda: "1")
+        self.positions = {}
+        self.algo_orders = {}
+        self.fills = []
+        self.calls = defaultdict(int)
+        self.call_time = defaultdict(float)
+        self._ids = count(1)
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.RLock()
+        # 체결/포지션 시각 (리플레이에서는 재생 중인 봉 시각을 돌려주는 함수로 바꾼다)
+        self.clock = clock
+
+    # ---- 공통 ----
+    def _call(self, endpoint: str, func: Callable):
+        """지연을 흉내 낸 뒤 잠금 안에서 처리하고 엔드포인트별 호출 수/시간을 기록"""
+        start = time.perf_counter()
+        delay = self.config.latency
+        if self.config.latency_jitter > 0:
+            delay += self._rng.random() * self.config.latency_jitter
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            result = func()
+            self.calls[endpoint] += 1
+            self.call_time[endpoint] += time.perf_counter() - start
+        return result
+
+    def _next_id(self) -> str:
+        return str(next(self._ids))
+
+    def _ct_val(self, instId: str) -> float:
+        return float(self.instruments[instId]["ctVal"])
+
+    def _get_margin(self, pos) -> float:
+        return abs(pos["pos"]) * self._ct_val(pos["instId"]) * pos["avgPx"] / pos["lever"]
+
+    def _get_upl(self, pos) -> float:
+        return pos["pos"] * self._ct_val(pos["instId"]) * (self.prices[pos["instId"]] - pos["avgPx"])
+
+    def get_equity(self) -> float:
+        with self._lock:
+            return self.balance + sum(self._get_margin(p) + self._get_upl(p) for p in self.positions.values())
+
+    def client_factory(self, kind: str):
+        """trading.clients.set_client_factory에 넘기는 생성 함수"""
+        clients = {
+            "account": MockAccountAPI,
+            "trade": MockTradeAPI,
+            "market": MockMarketAPI,
+            "public": MockPublicAPI,
+        }
+        return clients[kind](self)
+
+    def use(self):
+        """with exchange.use(): 블록 안에서 trading 모듈이 이 거래소를 쓰게 한다"""
+        return use_client_factory(self.client_factory)
+
+    # ---- 체결 ----
+    def _fill(self, instId: str, side: str, sz: float, reduce_only: bool = False, source: str = "order", price=None):
+        """시장가 체결: 같은 방향이면 평균가 갱신, 반대면 줄이거나 뒤집기 (실현손익/수수료 반영)
+
+        source는 체결 경로 (order: 주문, close: 포지션 종료, stop: 스톱 주문), price를 주면 현재가 대신 그 가격에 체결한다.
+        """
+        price = self.prices[instId] if price is None else price
+        slip = self.config.slippage_bps / 10000
+        price *= 1 + slip if side == "buy" else 1 - slip
+        signed = sz if side == "buy" else -sz
+        ct_val = self._ct_val(instId)
+        lever = float(self.leverage[instId])
+        pos = self.positions.get(instId)
+        current = pos["pos"] if pos else 0.0
+        if reduce_only:
+            if current == 0 or (current > 0) == (signed > 0):
+                return None
+            signed = max(-abs(current), min(abs(current), signed))
+
+        fee = abs(signed) * ct_val * price * self.config.taker_fee
+        self.balance -= fee
+        if current != 0 and (current > 0) != (signed > 0):
+            # 반대 방향: 줄인 만큼 증거금 반환 + 실현손익
+            closed = min(abs(current), abs(signed))
+            direction = 1 if current > 0 else -1
+            self.balance += closed * ct_val * pos["avgPx"] / pos["lever"]
+            self.balance += direction * closed * ct_val * (price - pos["avgPx"])
+            remaining = current + signed
+            if abs(remaining) < 1e-12:
+                del self.positions[instId]
+                self._cancel_algos_on_close(instId)
+            elif (remaining > 0) == (current > 0):
+                pos["pos"] = remaining
+            else:
+                # 뒤집힘: 남은 수량으로 새 포지션
+                self.balance -= abs(remaining) * ct_val * price / lever
+                self.positions[instId] = self._new_position(instId, remaining, price, lever)
+        else:
+            self.balance -= abs(signed) * ct_val * price / lever
+            if pos is None:
+                self.positions[instId] = self._new_position(instId, signed, price, lever)
+            else:
+                total = current + signed
+                pos["avgPx"] = (current * pos["avgPx"] + signed * price) / total
+                pos["pos"] = total
+        fill = {"instId": instId, "side": side, "sz": abs(signed), "px": price, "fee": fee, "ts": self.clock(), "source": source}
+        self.fills.append(fill)
+        return fill
+
+    def _new_position(self, instId: str, pos: float, price: float, lever: float):
+        return {"instId": instId, "pos": pos, "avgPx": price, "lever": lever, "cTime": int(self.clock() * 1000)}
+
+    def _cancel_algos_on_close(self, instId: str):
+        for algo_id in [k for k, a in self.algo_orders.items() if a["instId"] == instId and a["cxlOnClosePos"]]:
+            del self.algo_orders[algo_id]
+
+    def set_price(self, instId: str, price: float, fill_at_trigger: bool = False):
+        """가격 변경 후 조건에 닿은 스톱 주문 체결
+
+        기본은 바뀐 가격(갭)에 체결하고, fill_at_trigger면 가격이 연속으로 움직였다고 보고 트리거 가격에 체결한다.
+        """
+        with self._lock:
+            self.prices[instId] = float(price)
+            for algo_id, algo in list(self.algo_orders.items()):
+                if algo_id not in self.algo_orders or algo["instId"] != instId:
+                    continue
+                trigger = algo["slTriggerPx"]
+                hit = price <= trigger if algo["side"] == "sell" else price >= trigger
+                if not hit:
+                    continue
+                del self.algo_orders[algo_id]
+                pos = self.positions.get(instId)
+                if pos is not None:
+                    fill_price = trigger if fill_at_trigger else None
+                    self._fill(instId, algo["side"], abs(pos["pos"]), reduce_only=True, source="stop", price=fill_price)
+
+    def replay_bar(self, instId: str, open_: float, high: float, low: float, close: float):
+        """봉 하나의 가격 경로를 흘려 스톱 주문 처리 (양봉은 시가→저가→고가→종가, 음봉은 시가→고가→저가→종가)"""
+        self.set_price(instId, open_)
+        path = (low, high) if close >= open_ else (high, low)
+        for price in (*path, close):
+            self.set_price(instId, price, fill_at_trigger=True)
+
+    # ---- 엔드포인트 ----
+    def get_account_config(self):
+        return self._call("get_account_config", lambda: _ok([{"acctLv": self.acct_lv, "posMode": "net_mode"}]))
+
+    def set_account_level(self, acctLv):
+        def handle():
+            self.acct_lv = str(acctLv)
+            return _ok([{"acctLv": self.acct_lv}])
+
+        return self._call("set_account_level", handle)
+
+    def get_account_balance(self):
+        def handle():
+            equity = self.get_equity()
+            return _ok(
+                [
+                    {
+                        "totalEq": str(equity),
+                        "details": [{"ccy": "USDT", "eq": str(equity), "availBal": str(self.balance), "cashBal": str(self.balance)}],
+                    }
+                ]
+            )
+
+        return self._call("get_account_balance", handle)
+
+    def get_leverage(self, instId, mgnMode):
+        return self._call(
+            "get_leverage",
+            lambda: _ok([{"instId": instId, "mgnMode": mgnMode, "lever": self.leverage[instId], "posSide": "net"}]),
+        )
+
+    def set_leverage(self, instId, lever, mgnMode):
+        def handle():
+            max_lever = float(self.instruments[instId]["lever"])
+            if not 1 <= float(lever) <= max_lever:
+                return _error("59102", f"Leverage exceeds the maximum ({max_lever})")
+            if instId in self.positions:
+                # 열린 포지션이 있으면 레버리지를 바꾸지 않는다 (격리 증거금 재계산 생략)
+                return _error("59000", "Position exists")
+            self.leverage[instId] = str(lever)
+            return _ok([{"instId": instId, "lever": str(lever), "mgnMode": mgnMode, "posSide": "net"}])
+
+        return self._call("set_leverage", handle)
+
+    def get_positions(self, instId=None):
+        def handle():
+            data = []
+            for pos in self.positions.values():
+                if instId is not None and pos["instId"] != instId:
+                    continue
+                fee = self.config.taker_fee
+                be_px = pos["avgPx"] * (1 + 2 * fee) if pos["pos"] > 0 else pos["avgPx"] * (1 - 2 * fee)
+                data.append(
+                    {
+                        "instId": pos["instId"],
+                        "posSide": "net",
+                        "mgnMode": "isolated",
+                        "pos": f"{pos['pos']:.8g}",
+                        "avgPx": str(pos["avgPx"]),
+                        "bePx": str(be_px),
+                        "lever": str(pos["lever"]),
+                        "margin": str(self._get_margin(pos)),
+                        "upl": str(self._get_upl(pos)),
+                        "last": str(self.prices[pos["instId"]]),
+                        "cTime": str(pos["cTime"]),
+                    }
+                )
+            return _ok(data)
+
+        return self._call("get_positions", handle)
+
+    def get_account_position_risk(self):
+        return self._call("get_account_position_risk", lambda: _ok([{"totalEq": str(self.get_equity())}]))
+
+    def get_max_avail_size(self, instId, tdMode):
+        # 격리 마진에서 새로 쓸 수 있는 USDT (trading.account.get_max_available_size가 USDT로 사용)
+        # 진입 수수료를 낼 수 있도록 레버리지만큼의 수수료를 남긴다
+        def handle():
+            avail = self.balance / (1 + float(self.leverage[instId]) * self.config.taker_fee)
+            return _ok([{"instId": instId, "availBuy": str(avail), "availSell": str(avail)}])
+
+        return self._call("get_max_avail_size", handle)
+
+    def place_order(self, instId, tdMode, side, ordType, sz, posSide="net", **kwargs):
+        def handle():
+            ord_id = self._next_id()
+            if self._rng.random() < self.config.reject_rate:
+                return _error("1", "Operation failed.", [{"ordId": "", "sCode": "51008", "sMsg": "Order failed. Insufficient margin"}])
+            size = float(sz)
+            lot = float(self.instruments[instId]["lotSz"])
+            filled = int(size * self.config.fill_ratio / lot + 1e-9) * lot
+            lever = float(self.leverage[instId])
+            notional = filled * self._ct_val(instId) * self.prices[instId]
+            needed = notional / lever + notional * self.config.taker_fee
+            reduce_only = bool(kwargs.get("reduceOnly"))
+            if not reduce_only and (filled < float(self.instruments[instId]["minSz"]) or needed > self.balance):
+                return _error("1", "Operation failed.", [{"ordId": "", "sCode": "51008", "sMsg": "Order failed. Insufficient margin"}])
+            self._fill(instId, side, filled, reduce_only=reduce_only)
+            return _ok([{"ordId": ord_id, "clOrdId": "", "sCode": "0", "sMsg": "Order placed", "accFillSz": f"{filled:.8g}"}])
+
+        return self._call("place_order", handle)
+
+    def place_algo_order(self, instId, tdMode, side, ordType, posSide="net", slTriggerPx=None, **kwargs):
+        def handle():
+            algo_id = self._next_id()
+            self.algo_orders[algo_id] = {
+                "instId": instId,
+                "side": side,
+                "ordType": ordType,
+                "slTriggerPx": float(slTriggerPx),
+                "cxlOnClosePos": bool(kwargs.get("cxlOnClosePos", False)),
+            }
+            return _ok([{"algoId": algo_id, "sCode": "0", "sMsg": ""}])
+
+        return self._call("place_algo_order", handle)
+
+    def close_positions(self, instId, mgnMode, posSide="net", **kwargs):
+        def handle():
+            pos = self.positions.get(instId)
+            if pos is None:
+                return _error("51023", "Position does not exist")
+            self._fill(instId, "sell" if pos["pos"] > 0 else "buy", abs(pos["pos"]), reduce_only=True, source="close")
+            return _ok([{"instId": instId, "posSide": posSide}])
+
+        return self._call("close_positions", handle)
+
+    def get_ticker(self, instId):
+        return self._call(
+            "get_ticker",
+            lambda: _ok([{"instId": instId, "last": str(self.prices[instId]), "ts": str(int(time.time() * 1000))}]),
+        )
+
+    def get_tickers(self, instType="SWAP", **kwargs):
+        return self._call(
+            "get_tickers",
+            lambda: _ok([{"instId": k, "last": str(v)} for k, v in self.prices.items()]),
+        )
+
+    def get_instruments(self, instType="SWAP", instFamily=None, instId=None, **kwargs):
+        def handle():
+            data = []
+            for inst_id, spec in self.instruments.items():
+                family = inst_id.rsplit("-", 1)[0]
+                if instFamily is not None and family != instFamily:
+                    continue
+                if instId is not None and inst_id != instId:
+                    continue
+                data.append({"instType": instType, "instId": inst_id, "instFamily": family, "settleCcy": "USDT", **spec})
+            return _ok(data)
+
+        return self._call("get_instruments", handle)
+
+    def get_stats(self):
+        """엔드포인트별 호출 수와 평균 처리 시간 (초)"""
+        return {
+            name: {"calls": n, "avg_sec": self.call_time[name] / n}
+            for name, n in sorted(self.calls.items())
+        }
+
+
+class _MockClient:
+    """OKX SDK 클라이언트처럼 쓰는 얇은 래퍼 (메서드는 거래소 객체로 넘김)"""
+
+    METHODS = ()
+
+    def __init__(self, exchange: MockOKXExchange):
+        self.exchange = exchange
+
+    def __getattr__(self, name):
+        if name in self.METHODS:
+            return getattr(self.exchange, name)
+        raise AttributeError(f"{type(self).__name__} has no endpoint {name!r}")
+
+
+class MockAccountAPI(_MockClient):
+    METHODS = (
+        "get_account_config",
+        "set_account_level",
+        "get_account_balance",
+        "get_leverage",
+        "set_leverage",
+        "get_positions",
+        "get_account_position_risk",
+        "get_max_avail_size",
+    )
+
+
+class MockTradeAPI(_MockClient):
+    METHODS = ("place_order", "place_algo_order", "close_positions")
+
+
+class MockMarketAPI(_MockClient):
+    METHODS = ("get_ticker", "get_tickers")
+
+
+class MockPublicAPI(_MockClient):
+    METHODS = ("get_tickers", "get_instruments")
+
+
+@contextlib.contextmanager
+def offline_order_path(exchange: MockOKXExchange, quiet: bool = True):
+    """대역 거래소로 trading.trade 주문 경로를 돌리는 구간
+
+    대역 거래소는 즉시 체결되므로 체결 대기를 없애고, 포지션 알림 메일을 끈다.
+    quiet면 주문 경로의 print 출력을 버린다.
+    """
+    import io
+
+    from . import trade
+
+    settle_sec, send_email = trade.ORDER_SETTLE_SEC, trade.SEND_EMAIL
+    trade.ORDER_SETTLE_SEC, trade.SEND_EMAIL = 0, False
+    output = contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+    try:
+        with exchange.use(), output:
+            yield
+    finally:
+        trade.ORDER_SETTLE_SEC, trade.SEND_EMAIL = settle_sec, send_email
+
+
+def benchmark_order_path(exchange: MockOKXExchange, cycles: int = 100, instId: str = "BTC-USDT-SWAP"):
+    """trading.trade의 진입(open_position_with_ratio)과 청산(close_position)을 cycles번 반복해 처리량 측정"""
+    from . import trade
+
+    entry_time = 0.0
+    exit_time = 0.0
+    with offline_order_path(exchange):
+        for _ in range(cycles):
+            start = time.perf_counter()
+            trade.open_position_with_ratio(instId=instId, ratio=0.5, leverage=5, sl=0.5)
+            entry_time += time.perf_counter() - start
+            start = time.perf_counter()
+            trade.close_position(instId=instId)
+            exit_time += time.perf_counter() - start
+    return {
+        "cycles": cycles,
+        "entries_per_sec": cycles / entry_time if entry_time > 0 else float("inf"),
+        "exits_per_sec": cycles / exit_time if exit_time > 0 else float("inf"),
+        "entry_avg_ms": entry_time / cycles * 1000,
+        "exit_avg_ms": exit_time / cycles * 1000,
+        "fills": len(exchange.fills),
+        "final_equity": exchange.get_equity(),
+        "endpoints": exchange.get_stats(),
+    }
+
+
+if __name__ == "__main__":
+    for latency in [0.0, 0.005, 0.05]:
+        exchange = MockOKXExchange(MockOKXConfig(latency=latency, latency_jitter=latency / 2))
+        result = benchmark_order_path(exchange, cycles=200 if latency < 0.01 else 20)
+        print(
+            f"지연 {latency * 1000:5.1f}ms | 진입 {result['entries_per_sec']:8.1f}회/초 ({result['entry_avg_ms']:7.2f}ms)"
+            f" | 청산 {result['exits_per_sec']:8.1f}회/초 ({result['exit_avg_ms']:7.2f}ms)"
+            f" | API 호출 {sum(s['calls'] for s in result['endpoints'].values())}회"
+        )
@@ -1,16 +1,23 @@
-from .config import config
-from okx.PublicData import PublicAPI
+from .clients import get_public_api
+
+
+def __getattr__(name):
+    # 기존 trading.public.publicDataAPI 접근 호환 (처음 접근할 때 생성)
+    if name == "publicDataAPI":
+        return get_public_api()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-publicDataAPI = PublicAPI(
-    config["api_key"], config["secret_key"], config["passphrase"], False, config["flag"]
-)
 
 def get_tickers():
-    return publicDataAPI.get_tickers()
+    return get_public_api().get_tickers()
 
-def get_instruments():
-    result = publicDataAPI.get_instruments(instType="SWAP", instFamily="BTC-USDT")
-    print(result['data'])
+def get_instruments(instType="SWAP", instFamily=None):
+    """계약 정보 목록 (instFamily가 없으면 instType 전체)"""
+    if instFamily is None:
+        result = get_public_api().get_instruments(instType=instType)
+    else:
+        result = get_public_api().get_instruments(instType=instType, instFamily=instFamily)
+    return result['data']
 
 if __name__ == "__main__":
-    get_instruments()
+    print(get_instruments(instFamily="BTC-USDT"))
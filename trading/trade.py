@@ -1,6 +1,4 @@
 import time
-from math import floor
-import okx.Trade as Trade
 
 from utils.mail import send_email
 from .config import config
@@ -13,12 +11,21 @@ from .account import (
     set_account_level_to_margin,
     set_leverage,
 )
-from .market import get_ticker
+from .clients import get_trade_api
+from .instruments import get_instrument
+from .market import get_last_price
+
+# 시장가 주문 후 포지션(bePx)이 조회될 때까지 기다리는 시간 (초)
+ORDER_SETTLE_SEC = 2
+# 포지션 오픈/종료 알림 메일 발송 여부
+SEND_EMAIL = True
 
-# Trade API 초기화
-tradeAPI = Trade.TradeAPI(
-    config["api_key"], config["secret_key"], config["passphrase"], False, config["flag"]
-)
+
+def __getattr__(name):
+    # 기존 trading.trade.tradeAPI 접근 호환 (처음 접근할 때 생성)
+    if name == "tradeAPI":
+        return get_trade_api()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def open_position(
@@ -38,6 +45,10 @@ def open_position(
     """
     try:
         print(f"open_position started! usdt_amount: {usdt_amount}, leverage: {leverage}")
+        spec = get_instrument(instId)
+        if leverage > spec.max_lever:
+            print(f"레버리지 {leverage}배가 {instId} 최대치를 넘어 {spec.max_lever:g}배로 낮춥니다")
+            leverage = int(spec.max_lever)
         # 1. 레버리지 설정
         print(f"레버리지를 {leverage}배로 설정합니다...")
         set_account_level_to_margin()
@@ -53,29 +64,32 @@ def open_position(
             )
             return
 
-        # 2. 포지션 크기 계산
+        # 2. 포지션 크기 계산 (계약 정보 캐시의 ctVal/lotSz/minSz, 캐시된 현재가)
         position_size_usdt = usdt_amount * leverage
-        current_btc_amount = get_ticker(ticker=instId)
-        position_size_btc = position_size_usdt / current_btc_amount
-        position_size_contract = floor(position_size_btc * 100 * 100) / 100
+        last_price = get_last_price(instId)
+        position_size_coin = position_size_usdt / last_price
+        position_size_contract = spec.get_contract_size(position_size_usdt, last_price)
         print(f"사용 금액: {usdt_amount} USDT")
         print(f"레버리지: {leverage}배")
-        print(f"포지션 크기:{position_size_btc} -> {position_size_contract} BTC")
+        print(f"포지션 크기:{position_size_coin} -> {position_size_contract} 계약 (계약당 {spec.ct_val})")
         print(f"⚠️  마진 요구사항: {position_size_usdt * 0.2:.1f} USDT 이상 필요")
+        if position_size_contract == 0:
+            print(f"최소 주문 수량({spec.min_sz} 계약)보다 작아 주문하지 않습니다.")
+            return
 
         # 3. BTC-USDT-SWAP 마켓에서 포지션 오픈
-        result = tradeAPI.place_order(
+        result = get_trade_api().place_order(
             instId=instId,
             tdMode=tdMode,
             side=side,
             posSide="net",
             ordType="market",
-            sz=str(position_size_contract),
+            sz=spec.format_size(position_size_contract),
         )
 
         print(f"포지션 오픈 결과: {result}")
 
-        time.sleep(2)
+        time.sleep(ORDER_SETTLE_SEC)
         setup_sl(instId=instId, tdMode=tdMode, sl=sl, leverage=leverage, side=side)
 
         return result
@@ -108,29 +122,31 @@ def open_position_with_ratio(
     )
 
     ## 메일 발송
-    send_email(
-        f"{instId} 포지션 오픈 알림",
-        f"""{instId} 포지션 오픈 알림
-        전체 잔고: {get_account_balance()} USDT
-        진입 금액: {usdt_amount} USDT
-        레버리지:{leverage}
-        비율:{ratio}
-        스톱로스:{sl}
-        """,
-        config["email_to"],
-    )
+    if SEND_EMAIL:
+        send_email(
+            f"{instId} 포지션 오픈 알림",
+            f"""{instId} 포지션 오픈 알림
+            전체 잔고: {get_account_balance()} USDT
+            진입 금액: {usdt_amount} USDT
+            레버리지:{leverage}
+            비율:{ratio}
+            스톱로스:{sl}
+            """,
+            config["email_to"],
+        )
     return position
 
 
 def close_position(instId="BTC-USDT-SWAP", tdMode="isolated"):
-    result = tradeAPI.close_positions(instId=instId, mgnMode=tdMode)
-    send_email(
-        f"{instId} 포지션 종료",
-        f"""{instId} 포지션 종료 알림
-        전체 잔고: {get_account_balance()} USDT
-        """,
-        config["email_to"],
-    )
+    result = get_trade_api().close_positions(instId=instId, mgnMode=tdMode)
+    if SEND_EMAIL:
+        send_email(
+            f"{instId} 포지션 종료",
+            f"""{instId} 포지션 종료 알림
+            전체 잔고: {get_account_balance()} USDT
+            """,
+            config["email_to"],
+        )
     return result
 
 
@@ -141,11 +157,15 @@ def setup_sl(instId="BTC-USDT-SWAP", tdMode="isolated", sl=0.5, leverage=5, side
     current_positions = get_positions(instId)
     breakeven_price = float(current_positions[0]["bePx"])
 
-    sl_trigger_price = breakeven_price * (1 - sl / leverage)
+    # 롱(buy)은 손익분기가 아래, 숏(sell)은 위에서 손절
+    if side == "buy":
+        sl_trigger_price = breakeven_price * (1 - sl / leverage)
+    else:
+        sl_trigger_price = breakeven_price * (1 + sl / leverage)
     print(f"sl_trigger_price: {sl_trigger_price}")
 
     # 4. 스톱 로스 오더 오픈 based on the result price
-    sl_result = tradeAPI.place_algo_order(
+    sl_result = get_trade_api().place_algo_order(
         instId=instId,
         tdMode=tdMode,
         side="sell" if side == "buy" else "buy",
@@ -154,7 +174,7 @@ def setup_sl(instId="BTC-USDT-SWAP", tdMode="isolated", sl=0.5, leverage=5, side
         closeFraction="1",
         reduceOnly=True,
         cxlOnClosePos=True,
-        slTriggerPx=str(sl_trigger_price),
+        slTriggerPx=get_instrument(instId).format_price(sl_trigger_price),
         slOrdPx="-1",
         slTriggerPxType="last",
     )
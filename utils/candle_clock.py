@@ -0,0 +1,131 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from utils.interval_calendar import floor_open_time, get_next_close_ms
+
+BINANCE_TIME_URL = "https://api.binance.com/api/v3/time"
+
+# 봉 마감 후 실행까지 기다리는 시간 (밀리초)
+CLOSE_DELAY_MS = 10
+
+
+def format_ms(ms: float) -> str:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+class ExchangeClock:
+    """거래소 서버 시각 추정 (로컬 시계 + 측정한 오프셋)
+
+    samples번 서버 시각을 받아 왕복 시간이 가장 짧은 측정으로 오프셋을 정하고
+    (서버 시각 - 요청/응답 중간 로컬 시각), resync_sec마다 다시 맞춘다.
+    측정에 실패하면 이전 오프셋(처음이면 0)을 그대로 쓴다.
+    """
+
+    def __init__(self, url: str = BINANCE_TIME_URL, samples: int = 5, resync_sec: float = 600, timeout: float = 5):
+        self.url = url
+        self.samples = samples
+        self.resync_sec = resync_sec
+        self.timeout = timeout
+        self.offset_ms = 0.0
+        self.rtt_ms = None
+        self.synced_at = None
+        self._lock = threading.Lock()
+
+    def fetch_server_ms(self) -> int:
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return int(response.json()["serverTime"])
+
+    def sync(self):
+        best = None
+        for _ in range(self.samples):
+            sent = time.time() * 1000
+            server = self.fetch_server_ms()
+            received = time.time() * 1000
+            rtt = received - sent
+            if best is None or rtt < best[0]:
+                best = (rtt, server - (sent + received) / 2)
+        with self._lock:
+            self.rtt_ms, self.offset_ms = best
+            self.synced_at = time.monotonic()
+        print(f"⏱️  거래소 시각 동기화: 오프셋 {self.offset_ms:+.1f}ms (왕복 {self.rtt_ms:.1f}ms)")
+        return self.offset_ms
+
+    def now_ms(self) -> float:
+        """거래소 기준 현재 시각 (밀리초)"""
+        if self.synced_at is None or time.monotonic() - self.synced_at > self.resync_sec:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"⚠️  거래소 시각 동기화 실패 (오프셋 {self.offset_ms:+.1f}ms 유지): {e}")
+                with self._lock:
+                    self.synced_at = time.monotonic()
+        return time.time() * 1000 + self.offset_ms
+
+    def sleep_until(self, target_ms: float):
+        """거래소 시각으로 target_ms까지 대기 (멀면 크게 자고 가까워지면 1ms 단위로)"""
+        while True:
+            remaining = target_ms - self.now_ms()
+            if remaining <= 0:
+                return
+            time.sleep(remaining / 1000 - 0.005 if remaining > 20 else 0.001)
+
+
+class CandleCloseScheduler:
+    """거래소 시각으로 봉이 마감될 때마다 delay_ms 뒤에 작업 실행
+
+    작업 함수는 마감 시각(밀리초, 방금 닫힌 봉의 끝 = 다음 봉의 시작)을 인자로 받는다.
+    같은 시각에 마감되는 타임프레임의 작업은 등록 순서대로 이어서 실행하고,
+    작업이 길어져 마감 시각을 지나친 경우에는 밀린 봉을 건너뛰고 다음 마감을 기다린다.
+    """
+
+    def __init__(self, clock: ExchangeClock = None, delay_ms: float = CLOSE_DELAY_MS, heartbeat_sec: float = 30):
+        self.clock = clock or ExchangeClock()
+        self.delay_ms = delay_ms
+        self.heartbeat_sec = heartbeat_sec
+        self.jobs = []
+        self._stopped = threading.Event()
+
+    def add_job(self, timeframe: str, func):
+        get_next_close_ms(timeframe, 0)  # 봉 경계를 계산할 수 없는 타임프레임이면 여기서 ValueError
+        self.jobs.append((timeframe, func))
+
+    def get_next_close_ms(self, now_ms: float) -> int:
+        return min(get_next_close_ms(timeframe, now_ms) for timeframe, _ in self.jobs)
+
+    def run_pending(self, close_ms: int):
+        """close_ms에 마감된 타임프레임의 작업 실행"""
+        for timeframe, func in self.jobs:
+            if floor_open_time(timeframe, close_ms) != close_ms:
+                continue
+            late_ms = self.clock.now_ms() - close_ms
+            print(f"🕯️  {timeframe} 봉 마감 {format_ms(close_ms)} (+{late_ms:.0f}ms)")
+            try:
+                func(close_ms)
+            except Exception as e:
+                print(f"❌ {timeframe} 작업 실패: {e}")
+
+    def start(self):
+        if not self.jobs:
+            raise ValueError("등록된 작업이 없습니다")
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            close_ms = self.get_next_close_ms(self.clock.now_ms())
+            target_ms = close_ms + self.delay_ms
+            # 긴 대기 중에도 살아 있음을 알리고 멈춤 요청을 확인
+            while not self._stopped.is_set():
+                remaining = target_ms - self.clock.now_ms()
+                if remaining <= self.heartbeat_sec * 1000:
+                    break
+                print(f"스케줄러 실행 중.. 다음 봉 마감 {format_ms(close_ms)}")
+                self._stopped.wait(self.heartbeat_sec)
+            if self._stopped.is_set():
+                break
+            self.clock.sleep_until(target_ms)
+            self.run_pending(close_ms)
+
+    def stop(self):
+        self._stopped.set()
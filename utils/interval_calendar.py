@@ -0,0 +1,112 @@
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+# Binance kline 인터벌 전체
+BINANCE_INTERVALS = ["1s", "1m", "3m", "5m", "15m", "30m", "1h", "2h", "4h", "6h", "8h", "12h", "1d", "3d", "1w", "1M"]
+
+UNIT_MS = {"s": 1000, "m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 7 * 86_400_000}
+
+# 1970-01-01은 목요일이고 주봉은 월요일 00:00 UTC에 시작한다
+WEEK_OFFSET_MS = 4 * 86_400_000
+
+# Binance klines 요청 한 번의 최대 봉 수
+MAX_KLINES_LIMIT = 1000
+
+
+def _check_interval(interval: str):
+    if interval not in BINANCE_INTERVALS:
+        raise ValueError(f"Invalid interval: {interval}")
+
+
+def is_fixed_length(interval: str) -> bool:
+    """봉 길이가 일정한 인터벌인지 (1M만 달마다 다르다)"""
+    _check_interval(interval)
+    return interval != "1M"
+
+
+def get_interval_ms(interval: str) -> int:
+    """봉 길이 (밀리초), 길이가 일정하지 않은 1M은 ValueError"""
+    if not is_fixed_length(interval):
+        raise ValueError(f"{interval} 봉은 길이가 일정하지 않습니다")
+    return int(interval[:-1]) * UNIT_MS[interval[-1]]
+
+
+def _month_start_ms(year: int, month: int) -> int:
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return int(datetime(year, month, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def floor_open_time(interval: str, ts_ms: int) -> int:
+    """ts_ms가 속한 봉의 시작 시각 (UTC 달력 기준)
+
+    1d 이하는 1970-01-01부터, 1w는 월요일, 1M은 매월 1일 기준이다.
+    3d는 경계 기준을 확인하지 않아 지원하지 않는다.
+    """
+    _check_interval(interval)
+    if interval == "1M":
+        t = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
+        return _month_start_ms(t.year, t.month)
+    if interval == "3d":
+        raise ValueError("3d 봉 경계는 지원하지 않습니다")
+    step = get_interval_ms(interval)
+    offset = WEEK_OFFSET_MS if interval == "1w" else 0
+    return (ts_ms - offset) // step * step + offset
+
+
+def get_next_open_time(interval: str, open_ms: int, count: int = 1) -> int:
+    """open_ms에서 시작하는 봉으로부터 count개 뒤 봉의 시작 시각"""
+    if interval == "1M":
+        t = datetime.fromtimestamp(open_ms / 1000, tz=timezone.utc)
+        return _month_start_ms(t.year, t.month + count)
+    return open_ms + count * get_interval_ms(interval)
+
+
+def ceil_open_time(interval: str, ts_ms: int) -> int:
+    """ts_ms 이후(같으면 포함) 처음 시작하는 봉의 시작 시각 (3d는 ts_ms 그대로)"""
+    if interval == "3d":
+        return ts_ms
+    open_ms = floor_open_time(interval, ts_ms)
+    return open_ms if open_ms == ts_ms else get_next_open_time(interval, open_ms)
+
+
+def get_last_close_ms(interval: str, now_ms: float) -> int:
+    """now_ms 시점에 마지막으로 마감된 봉의 마감 시각 (= 진행 중인 봉의 시작 시각)"""
+    return floor_open_time(interval, int(now_ms))
+
+
+def get_next_close_ms(interval: str, now_ms: float) -> int:
+    """now_ms 이후 처음 마감되는 봉의 마감 시각"""
+    return get_next_open_time(interval, floor_open_time(interval, int(now_ms)))
+
+
+def count_candles(interval: str, start_ms: int, end_ms: int) -> int:
+    """[start_ms, end_ms] 안에서 시작하는 봉 개수"""
+    if end_ms < start_ms:
+        return 0
+    if interval == "1M":
+        first = ceil_open_time(interval, start_ms)
+        a = datetime.fromtimestamp(first / 1000, tz=timezone.utc)
+        b = datetime.fromtimestamp(end_ms / 1000, tz=timezone.utc)
+        return max(0, (b.year - a.year) * 12 + b.month - a.month + 1) if first <= end_ms else 0
+    first = ceil_open_time(interval, start_ms)
+    if first > end_ms:
+        return 0
+    return (end_ms - first) // get_interval_ms(interval) + 1
+
+
+def plan_pages(interval: str, start_ms: int, end_ms: int, limit: int = MAX_KLINES_LIMIT) -> List[Tuple[int, int]]:
+    """[start_ms, end_ms] 구간을 겹치지 않는 klines 요청 구간 (startTime, endTime) 목록으로 나눔
+
+    각 구간은 첫 봉 시작 시각부터 limit개 봉 길이만큼이고 endTime은 다음 구간 시작 직전(-1ms)이라
+    봉이 두 구간에 같이 들어가지 않는다. 구간 수는 ceil(봉 개수 / limit)로 최소다.
+    """
+    if not 1 <= limit <= MAX_KLINES_LIMIT:
+        raise ValueError(f"limit은 1~{MAX_KLINES_LIMIT} 사이여야 합니다: {limit}")
+    pages = []
+    page_start = ceil_open_time(interval, start_ms)
+    while page_start <= end_ms:
+        next_start = get_next_open_time(interval, page_start, limit)
+        pages.append((page_start, min(next_start - 1, end_ms)))
+        page_start = next_start
+    return pages
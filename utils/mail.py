@@ -10,6 +10,9 @@ def send_email(subject: str, body: str, to:str):
     sender = os.getenv("GOOGLE_EMAIL_SENDER")
     receiver = to
     password = os.getenv("GOOGLE_EMAIL_PASSWORD")
+    if not sender or not password:
+        print(f"메일 설정이 없어 발송을 건너뜁니다: {subject}")
+        return
 
     message = MIMEMultipart()
     message['From'] = sender
@@ -1,14 +1,19 @@
+import contextlib
+import io
+
+from utils.interval_calendar import get_interval_ms
+
+
 def get_int_for_interval(interval: str):
-    if interval == "1m":
-        return 60
-    elif interval == "5m":
-        return 300
-    elif interval == "15m":
-        return 90
-    elif interval == "1h":
-        return 360
-    return 60
+    """봉 길이 (초)"""
+    return get_interval_ms(interval) // 1000
 
 
 def get_end_time(start_time: int, interval: str, limit: int):
-    return start_time + get_int_for_interval(interval) * limit * 1000
+    """start_time부터 limit개 봉을 담는 klines 요청의 endTime (다음 구간 시작 직전, 밀리초)"""
+    return start_time + get_interval_ms(interval) * limit - 1
+
+
+def quiet():
+    """블록 안의 print 출력을 버리는 컨텍스트 (측정·리플레이 중 백테스트 진행 출력 숨김)"""
+    return contextlib.redirect_stdout(io.StringIO())